@@ -0,0 +1,103 @@
+"""
+Benchmarks product_scraper against a local stand-in for the Digikala API.
+
+The stand-in serves /v1/search/?page=N and /v2/product/<id>/ with synthetic
+products and a fixed per-request latency (LATENCY), so the numbers reflect
+how well the scraper overlaps requests rather than Digikala's real speed.
+Everything is written to a temporary directory.
+
+Usage:
+    python benchmark_scraper.py
+"""
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import product_scraper
+
+# --- Configuration ---
+PRODUCTS = 1000          # products to scrape in the benchmark
+LATENCY = 0.05           # seconds the stand-in API waits before every answer
+WORKER_COUNTS = [1, 4, 16, 32]
+RATE_CAP = 1000          # requests/second; high enough that only latency and workers matter
+
+
+def fake_product(product_id):
+    return {
+        "id": product_id,
+        "title_en": f"Product {product_id}",
+        "title_fa": f"محصول {product_id}",
+        "rating": {"rate": product_id % 5, "count": product_id % 100},
+        "images": {
+            "main": {"url": [f"https://dkstatics-public.digikala.com/{product_id}/main.jpg"]},
+            "list": [{"url": [f"https://dkstatics-public.digikala.com/{product_id}/{i}.jpg"]} for i in range(3)],
+        },
+        "review": {"description": "توضیحات\nمحصول"},
+        "comments_overview": {"overview": "خلاصه نظرات"},
+    }
+
+
+class StandInApi(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(LATENCY)
+        parts = urlsplit(self.path)
+        if parts.path == "/v1/search/":
+            page = int(parse_qs(parts.query).get("page", ["1"])[0])
+            first = (page - 1) * product_scraper.PRODUCTS_PER_PAGE + 1
+            ids = range(first, first + product_scraper.PRODUCTS_PER_PAGE)
+            body = {"data": {"products": [{"id": i, "title_fa": f"محصول {i}"} for i in ids]}}
+        elif parts.path.startswith("/v2/product/"):
+            product_id = int(parts.path.strip("/").split("/")[-1])
+            body = {"data": {"product": fake_product(product_id)}}
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInApi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    product_scraper.API_BASE = f"http://127.0.0.1:{server.server_port}"
+    product_scraper.START_PAGE = 1
+    product_scraper.TARGET_PRODUCT_COUNT = PRODUCTS
+    product_scraper.PAGES_TO_SCRAPE = PRODUCTS // product_scraper.PRODUCTS_PER_PAGE
+    product_scraper.REQUESTS_PER_SECOND = RATE_CAP
+    print(f"📦 {PRODUCTS} products, {LATENCY * 1000:.0f} ms simulated latency per request")
+
+    for workers in WORKER_COUNTS:
+        product_scraper.DETAIL_WORKERS = workers
+        product_scraper.PREFETCH = workers * 4
+        with tempfile.TemporaryDirectory() as tmp:
+            product_scraper.OUTPUT_FILE = os.path.join(tmp, "products.csv")
+            product_scraper.CHECKPOINT_FILE = os.path.join(tmp, "products.checkpoint.json")
+            product_scraper.IMAGE_MANIFEST = os.path.join(tmp, "image_manifest.sqlite")
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                product_scraper.main()
+            elapsed = time.perf_counter() - start
+        projected = product_scraper.math.ceil(16000 / (PRODUCTS / elapsed))
+        print(f"{workers:>3} workers: {PRODUCTS / elapsed:7.1f} products/s "
+              f"(16k products in ~{projected // 60} min {projected % 60} s)")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
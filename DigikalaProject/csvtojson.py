@@ -1,40 +1,36 @@
-import csv
-import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.csv_to_json import convert_csv
 
 # --- Configuration ---
 CSV_FILE = "digikala_products.csv"
-JSON_FILE = "digikala_products.json"
+JSON_FILE = "digikala_products.json"  # ".jsonl" writes one product per line instead
+
+
+def summary_entry(row):
+    """Prefers the comments overview, then the introduction; rows with neither are dropped."""
+    if row['comments_overview'] != 'NULL':
+        summary, is_overview = row['comments_overview'], True
+    elif row['introduction'] != 'N/A':
+        summary, is_overview = row['introduction'], False
+    else:
+        return None
+    return {
+        "product_id": row['id'],
+        "title_fa": row['title_fa'],
+        "title_en": row['title_en'],
+        "summary": summary,
+        "is_overview": is_overview
+    }
+
 
 def create_json_from_csv():
-    """Reads digikala_general_products.csv, filters entries, and creates a JSON file."""
-    data = []
-    
-    with open(CSV_FILE, mode='r', encoding='utf-8-sig') as csv_file:
-        reader = csv.DictReader(csv_file)
-        for row in reader:
-            if row['comments_overview'] != 'NULL':
-                entry = {
-                    "product_id": row['id'],
-                    "title_fa": row['title_fa'],
-                    "title_en": row['title_en'],
-                    "summary": row['comments_overview'],
-                    "is_overview": True
-                }
-                data.append(entry)
-            elif row['introduction'] != 'N/A':
-                entry = {
-                    "product_id": row['id'],
-                    "title_fa": row['title_fa'],
-                    "title_en": row['title_en'],
-                    "summary": row['introduction'],
-                    "is_overview": False
-                }
-                data.append(entry)
-    
-    with open(JSON_FILE, mode='w', encoding='utf-8') as json_file:
-        json.dump(data, json_file, ensure_ascii=False, indent=2)
-    
-    print(f"Created {JSON_FILE} with {len(data)} entries.")
+    """Streams digikala_products.csv into the summary JSON, one row at a time."""
+    count = convert_csv(CSV_FILE, JSON_FILE, transform=summary_entry)
+    print(f"Created {JSON_FILE} with {count} entries.")
+
 
 if __name__ == "__main__":
     create_json_from_csv()
@@ -1,73 +1,146 @@
-import csv
+"""
+Downloads the product images listed in the image manifest (see image_manifest.py).
+
+Images are fetched concurrently through common.file_download: pooled
+keep-alive connections, bounded concurrency per host, `.part` files that are
+renamed into place only when complete, and Range-resume of partial files left
+by an interrupted run. A per-host bytes/second and failure report is printed
+at the end.
+
+Each distinct image body is stored once in IMAGE_STORE (common/image_store.py)
+and the per-product names in IMAGES_DIR are hard links to it. A URL shared by
+several products is downloaded once, and one already downloaded in an
+earlier run is linked without a request. For near-duplicates, run
+`python -m common.image_store DigikalaProject/images --near-duplicates`.
+
+With SHARDS_DIR set, every image is also decoded once, resized to the
+training resolution and appended to tar shards (common/image_shards.py), so
+the fine-tuning loader reads a few sequential files instead of thousands of
+full-size JPEGs. Images downloaded before the stage was enabled are added on
+the next run.
+"""
+
 import os
-import requests
-from urllib.parse import urlparse
+import sys
+from collections import defaultdict
+
 from tqdm import tqdm
-import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.file_download import DownloadStats, download_files
+from common.image_shards import ShardWriter
+from common.image_store import ImageStore
+from image_manifest import ImageManifest, image_filename
 
 # --- Configuration ---
-IMAGE_URLS_DIR = "image_urls"  # Folder containing image URL CSV files
+IMAGE_MANIFEST = "image_manifest.sqlite"  # Written by product_scraper.py
+LEGACY_IMAGE_URLS_DIR = "image_urls"      # Old per-product CSV folder, imported once if the manifest is empty
 IMAGES_DIR = "images"          # Folder to save downloaded images
+IMAGE_STORE = "image_store"    # Content-addressed copies (by SHA-256); files in IMAGES_DIR are hard links into it
 K = 3                          # Number of images to download per product
+MAX_CONCURRENCY = 32           # downloads in flight overall
+MAX_PER_HOST = 16              # downloads in flight against one image host
+REQUESTS_PER_SECOND = 20       # starting rate per host; adapts to 429/503
+COMMIT_EVERY = 200             # downloaded flags written to the manifest per transaction
+SHARDS_DIR = None              # e.g. "shards": also write 224x224 training shards (needs Pillow)
+
+
+def add_to_shards(shards, items):
+    """Normalizes downloaded (product_id, ordinal, sha256) images into the training shards."""
+    for product_id, ordinal, digest in items:
+        name = image_filename(product_id, ordinal, K)
+        key = os.path.splitext(name)[0]
+        if key in shards:
+            continue
+        try:
+            shards.add(key, os.path.join(IMAGES_DIR, name), digest)
+        except Exception as e:
+            tqdm.write(f"[WARN] Could not add {name} to the shards: {e}")
 
-def download_image(url, save_path):
-    """Downloads an image from the given URL and saves it to the specified path."""
-    try:
-        response = requests.get(url, stream=True, timeout=10)
-        response.raise_for_status()
-        with open(save_path, 'wb') as file:
-            for chunk in response.iter_content(chunk_size=8192):
-                file.write(chunk)
-        # print(f"Downloaded {save_path}")
-    except requests.exceptions.RequestException as e:
-        # print(f"Failed to download {url}: {e}")
-        return
 
-def process_image_csvs():
-    """Reads each CSV in image_urls folder, downloads up to K images per product, skipping if already exists."""
-    if not os.path.exists(IMAGE_URLS_DIR):
-        print(f"Error: {IMAGE_URLS_DIR} folder not found.")
+def save_progress(manifest, shards, done):
+    if shards is not None:
+        add_to_shards(shards, done)
+    manifest.mark_downloaded(done)
+
+
+def process_manifest():
+    """Downloads the images the manifest still lists as missing (up to K per product)."""
+    manifest = ImageManifest(IMAGE_MANIFEST)
+    if not len(manifest) and os.path.isdir(LEGACY_IMAGE_URLS_DIR):
+        imported = manifest.import_legacy_csvs(LEGACY_IMAGE_URLS_DIR)
+        print(f"Imported {imported} products from legacy folder {LEGACY_IMAGE_URLS_DIR} into {IMAGE_MANIFEST}.")
+
+    shards = ShardWriter(SHARDS_DIR) if SHARDS_DIR else None
+    if shards is not None:
+        backlog = [item for item in manifest.downloaded(K)
+                   if os.path.splitext(image_filename(item[0], item[1], K))[0] not in shards]
+        if backlog:
+            print(f"Adding {len(backlog)} previously downloaded images to {SHARDS_DIR}...")
+            add_to_shards(shards, tqdm(backlog, desc="Sharding images"))
+
+    missing = manifest.missing(K)
+    if not missing:
+        print(f"No missing images in {IMAGE_MANIFEST}.")
+        if shards is not None:
+            shards.close()
+        manifest.close()
         return
 
     if not os.path.exists(IMAGES_DIR):
         os.makedirs(IMAGES_DIR)
 
-    # Get all CSV files in image_urls folder
-    csv_files = [f for f in os.listdir(IMAGE_URLS_DIR) if f.endswith('_images.csv')]
-    if not csv_files:
-        print(f"No CSV files found in {IMAGE_URLS_DIR}.")
-        return
+    store = ImageStore(IMAGE_STORE)
+    known = manifest.known_digests(url for _, _, url in missing)
 
-    for csv_file in tqdm(csv_files, desc="Processing CSV files", total=len(csv_files)):
-        product_id = csv_file.replace('_images.csv', '')
-        # print(f"Processing images for product ID {product_id}...")
-        
-        csv_path = os.path.join(IMAGE_URLS_DIR, csv_file)
-        image_urls = []
-        
-        with open(csv_path, mode='r', encoding='utf-8-sig') as file:
-            reader = csv.reader(file)
-            for row in reader:
-                if row:  # Ensure row is not empty
-                    image_urls.append(row[0])  # Assuming each row has one URL
-        
-        # Download up to K images, skipping if file exists
-        for i in range(min(K+1, len(image_urls))):
-            if i == 0:
-                filename = f"{product_id}.jpg"
-            elif i == 1:
-                continue
-            else:
-                filename = f"{product_id}_{i-1}.jpg"
-            save_path = os.path.join(IMAGES_DIR, filename)
-            
-            if os.path.exists(save_path):
-                # print(f"Skipping {save_path} (already exists)")
+    # Completed files are only ever created by an atomic rename, so an existing file is a whole image
+    done = []
+    pending = defaultdict(list)  # url -> [(product_id, ordinal, save_path)], downloaded once per URL
+    for product_id, ordinal, url in missing:
+        save_path = os.path.join(IMAGES_DIR, image_filename(product_id, ordinal, K))
+        if os.path.exists(save_path):
+            done.append((product_id, ordinal, store.add(save_path)[0]))
+        elif url in known and known[url] in store:
+            store.link(known[url], save_path)
+            done.append((product_id, ordinal, known[url]))
+        else:
+            pending[url].append((product_id, ordinal, save_path))
+    if done:
+        print(f"{len(done)} images already on disk or in {IMAGE_STORE}, linked without downloading.")
+
+    jobs = [(url, url, targets[0][2]) for url, targets in pending.items()]
+    stats = DownloadStats()
+    failures = 0
+    saved = 0
+    results = download_files(jobs, max_concurrency=MAX_CONCURRENCY, max_per_host=MAX_PER_HOST,
+                             requests_per_second=REQUESTS_PER_SECOND, stats=stats)
+    try:
+        for url, _, save_path, error in tqdm(results, desc="Downloading images", total=len(jobs)):
+            if error is not None:
+                failures += len(pending[url])
+                # tqdm.write(f"Failed to download {url}: {error}")
                 continue
-            
-            download_image(image_urls[i], save_path)
-        
-        time.sleep(0.1)  # Polite delay
+            # Keep one copy per distinct body; every product name is a hard link to it
+            digest, nbytes = store.add(save_path)
+            saved += nbytes
+            for product_id, ordinal, path in pending[url]:
+                if path != save_path:
+                    saved += os.path.getsize(save_path) if store.link(digest, path) else 0
+                done.append((product_id, ordinal, digest))
+            if len(done) >= COMMIT_EVERY:
+                save_progress(manifest, shards, done)
+                done = []
+    finally:
+        save_progress(manifest, shards, done)
+        if shards is not None:
+            shards.close()
+
+    stats.report()
+    summary = manifest.stats()
+    print(f"{summary['downloaded']} of {summary['images']} image URLs downloaded ({failures} failed this run), "
+          f"{summary['unique']} distinct files in {IMAGE_STORE}, {saved / 1e6:.1f} MB saved by linking.")
+    manifest.close()
+
 
 if __name__ == "__main__":
-    process_image_csvs()
+    process_manifest()
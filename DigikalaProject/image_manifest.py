@@ -0,0 +1,160 @@
+"""
+Single SQLite manifest of product image URLs for the Digikala scraper.
+
+Replaces the old `image_urls/<id>_images.csv` files (one per product) with
+one `images` table of (product_id, ordinal, url, downloaded, sha256) rows:
+
+- product_scraper.py records every product's image URLs here as it goes;
+- image_downloader.py asks for the images that are still missing and marks
+  them downloaded, instead of listing and opening tens of thousands of files.
+  The SHA-256 of each downloaded body points into the content-addressed
+  image store (common/image_store.py), so a URL shared by many products is
+  downloaded once.
+
+Old CSV folders can be imported with import_legacy_csvs() (run automatically
+by image_downloader.py when the manifest is empty) or from the command line:
+
+    python image_manifest.py                 # summary
+    python image_manifest.py import image_urls
+"""
+
+import csv
+import os
+import sqlite3
+import sys
+import threading
+
+DEFAULT_PATH = "image_manifest.sqlite"
+
+
+def image_filename(product_id, ordinal, k):
+    """
+    File name an image is saved under, or None if it is not downloaded.
+
+    Ordinal 0 is the main image (<id>.jpg). Ordinal 1 repeats the main image in
+    the API's list and is skipped; ordinals 2..k become <id>_1.jpg .. <id>_{k-1}.jpg.
+    """
+    if ordinal == 0:
+        return f"{product_id}.jpg"
+    if 2 <= ordinal <= k:
+        return f"{product_id}_{ordinal - 1}.jpg"
+    return None
+
+
+class ImageManifest:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS images (
+                product_id TEXT NOT NULL,
+                ordinal INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                downloaded INTEGER NOT NULL DEFAULT 0,
+                sha256 TEXT,
+                PRIMARY KEY (product_id, ordinal)
+            )
+        """)
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(images)")]
+        if "sha256" not in columns:
+            self._db.execute("ALTER TABLE images ADD COLUMN sha256 TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS images_missing ON images(downloaded, ordinal)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS images_url ON images(url)")
+        self._db.commit()
+
+    def set_images(self, product_id, urls):
+        """Stores a product's image URLs in order; an unchanged URL keeps its downloaded flag."""
+        product_id = str(product_id)
+        urls = [url for url in urls if url and url != 'N/A']
+        with self._lock, self._db:
+            self._db.executemany("""
+                INSERT INTO images (product_id, ordinal, url) VALUES (?, ?, ?)
+                ON CONFLICT (product_id, ordinal) DO UPDATE
+                SET url = excluded.url,
+                    downloaded = CASE WHEN images.url = excluded.url THEN images.downloaded ELSE 0 END,
+                    sha256 = CASE WHEN images.url = excluded.url THEN images.sha256 ELSE NULL END
+            """, [(product_id, i, url) for i, url in enumerate(urls)])
+            self._db.execute("DELETE FROM images WHERE product_id = ? AND ordinal >= ?", (product_id, len(urls)))
+
+    def images(self, product_id):
+        """The product's image URLs in order."""
+        rows = self._db.execute("SELECT url FROM images WHERE product_id = ? ORDER BY ordinal",
+                                (str(product_id),)).fetchall()
+        return [url for url, in rows]
+
+    def missing(self, k):
+        """(product_id, ordinal, url) for every image image_downloader still has to fetch with this K."""
+        return self._db.execute("""
+            SELECT product_id, ordinal, url FROM images
+            WHERE downloaded = 0 AND (ordinal = 0 OR ordinal BETWEEN 2 AND ?)
+            ORDER BY product_id, ordinal
+        """, (k,)).fetchall()
+
+    def downloaded(self, k):
+        """(product_id, ordinal, sha256) for every downloaded image image_downloader keeps with this K."""
+        return self._db.execute("""
+            SELECT product_id, ordinal, sha256 FROM images
+            WHERE downloaded = 1 AND (ordinal = 0 OR ordinal BETWEEN 2 AND ?)
+            ORDER BY product_id, ordinal
+        """, (k,)).fetchall()
+
+    def mark_downloaded(self, items):
+        """Flags (product_id, ordinal, sha256) items as downloaded in one transaction; sha256 may be None."""
+        with self._lock, self._db:
+            self._db.executemany("UPDATE images SET downloaded = 1, sha256 = ? WHERE product_id = ? AND ordinal = ?",
+                                 [(sha256, str(product_id), ordinal) for product_id, ordinal, sha256 in items])
+
+    def known_digests(self, urls):
+        """{url: sha256} for the given URLs that were already downloaded under any product."""
+        urls = list(set(urls))
+        found = {}
+        for i in range(0, len(urls), 500):
+            batch = urls[i:i + 500]
+            found.update(self._db.execute(
+                f"SELECT url, sha256 FROM images WHERE sha256 IS NOT NULL AND url IN ({','.join('?' * len(batch))})",
+                batch).fetchall())
+        return found
+
+    def stats(self):
+        products, images, downloaded, unique = self._db.execute("""
+            SELECT COUNT(DISTINCT product_id), COUNT(*), COALESCE(SUM(downloaded), 0), COUNT(DISTINCT sha256)
+            FROM images
+        """).fetchone()
+        return {"products": products, "images": images, "downloaded": downloaded, "unique": unique}
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def import_legacy_csvs(self, directory):
+        """Loads an old image_urls/<id>_images.csv folder; returns the number of products imported."""
+        if not os.path.isdir(directory):
+            return 0
+        count = 0
+        for name in os.listdir(directory):
+            if not name.endswith('_images.csv'):
+                continue
+            with open(os.path.join(directory, name), mode='r', encoding='utf-8-sig') as file:
+                urls = [row[0] for row in csv.reader(file) if row]
+            self.set_images(name[:-len('_images.csv')], urls)
+            count += 1
+        return count
+
+    def close(self):
+        self._db.close()
+
+
+def main():
+    manifest = ImageManifest()
+    if len(sys.argv) == 3 and sys.argv[1] == "import":
+        print(f"Imported {manifest.import_legacy_csvs(sys.argv[2])} products from {sys.argv[2]}.")
+    stats = manifest.stats()
+    print(f"{manifest.path}: {stats['products']} products, {stats['images']} image URLs, "
+          f"{stats['downloaded']} downloaded ({stats['unique']} distinct files).")
+    manifest.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,65 @@
 import requests
 import csv
-import time
+import json
 import math
 import os
+import queue
+import sys
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.rate_limiter import ThrottledAdapter, get_limiter
+from image_manifest import ImageManifest
 
 # --- Configuration ---
+API_BASE = "https://api.digikala.com"  # point at a local stand-in (see benchmark_scraper.py) for testing
 PRODUCTS_PER_PAGE = 20
 TARGET_PRODUCT_COUNT = 16000
-START_PAGE = 550 # Default 1
+START_PAGE = 1  # Only used on a fresh run; afterwards the checkpoint decides where to resume
 PAGES_TO_SCRAPE = math.ceil(TARGET_PRODUCT_COUNT / PRODUCTS_PER_PAGE)
+DETAIL_WORKERS = 16        # product detail requests in flight at once
+REQUESTS_PER_SECOND = 30   # hard cap on API requests; backs off further on 429/503
+PREFETCH = DETAIL_WORKERS * 4  # products queued ahead of the writer
+
+# Harvesting mode: "search" pages through /v1/search/; "categories" splits the catalogue by
+# category (leaf categories of the tree saved by Workspace/main.py) and lists them in parallel
+HARVEST_MODE = "search"
+CATEGORY_TREE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Workspace", "category_tree.json")
+CATEGORY_WORKERS = 8       # category listings paged in parallel
+MAX_CATEGORY_PAGES = 100   # listing pages read per category at most
+
+# Refresh mode (or `python product_scraper.py --refresh`): re-list the same pages/categories and
+# fetch details only for products that are new or whose title/rating changed since the stored row
+REFRESH = False
 
 # Output file name
 OUTPUT_FILE = "digikala_products.csv"
-IMAGE_URLS_DIR = "image_urls"  # Folder for image CSV files
+CHECKPOINT_FILE = "digikala_products.checkpoint.json"  # last completed page/product, rewritten per product
+IMAGE_MANIFEST = "image_manifest.sqlite"  # image URLs of every product (see image_manifest.py)
+FIELDNAMES = ['id', 'title_en', 'title_fa', 'Rate', 'Rate_cnt', 'introduction', 'comments_overview']
+
+_local = threading.local()
+
+
+def get_session():
+    """One keep-alive session per worker thread, paced by the shared API rate limiter."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+        adapter = ThrottledAdapter(pool_connections=1, pool_maxsize=2)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+    return session
+
 
 def get_product_list(page):
     """Fetches a list of products from the generic search/listing page."""
-    url = f"https://api.digikala.com/v1/search/?page={page}"
+    url = f"{API_BASE}/v1/search/?page={page}"
     try:
-        response = requests.get(url)
+        response = get_session().get(url, timeout=15)
         response.raise_for_status()
         data = response.json()
         return data.get('data', {}).get('products', [])
@@ -27,11 +68,24 @@ def get_product_list(page):
         return []
 
 
+def get_category_products(slug, page):
+    """Fetches one listing page of a category."""
+    url = f"{API_BASE}/v1/categories/{slug}/search/?page={page}"
+    try:
+        response = get_session().get(url, timeout=15)
+        response.raise_for_status()
+        data = response.json()
+        return data.get('data', {}).get('products', [])
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching category {slug} page {page}: {e}")
+        return []
+
+
 def get_product_details(product_id):
     """Fetches detailed product information from the v2 product API."""
-    url = f"https://api.digikala.com/v2/product/{product_id}/"
+    url = f"{API_BASE}/v2/product/{product_id}/"
     try:
-        response = requests.get(url)
+        response = get_session().get(url, timeout=15)
         response.raise_for_status()
         data = response.json()
         return data.get('data', {}).get('product', {})
@@ -95,111 +149,394 @@ def extract_comments_overview(product_data):
         return 'NULL'
 
 
-def save_images_to_csv(product_id, image_urls):
-    """Saves all image URLs to a separate CSV file named after product_id in the image_urls folder."""
-    if not image_urls or all(url == 'N/A' for url in image_urls):
-        return
-    if not os.path.exists(IMAGE_URLS_DIR):
-        os.makedirs(IMAGE_URLS_DIR)
-    image_file = os.path.join(IMAGE_URLS_DIR, f"{product_id}_images.csv")
-    with open(image_file, mode='w', newline='', encoding='utf-8-sig') as file:
-        writer = csv.writer(file)
-        for url in image_urls:
-            writer.writerow([url])
+def build_row(product, product_detail):
+    """Returns (CSV row, image URLs) for a listed product, preferring its detail data."""
+    # Basic info from search (fallback)
+    title_en = product.get('title_en', 'N/A')
+    title_fa = product.get('title_fa', 'N/A')
+    rate = product.get('rating', {}).get('rate', 0)
+    rate_count = product.get('rating', {}).get('count', 0)
 
+    # Override with detail data if available
+    if product_detail:
+        title_en = product_detail.get('title_en', title_en)
+        title_fa = product_detail.get('title_fa', title_fa)
+        rate = product_detail.get('rating', {}).get('rate', rate)
+        rate_count = product_detail.get('rating', {}).get('count', rate_count)
+        image_list = get_product_images(product_detail)
+        description = extract_description(product_detail)
+        comments_overview = extract_comments_overview(product_detail)
+    else:
+        # Fallback to search data
+        image_list = get_product_images(product)
+        description = 'N/A'
+        comments_overview = 'NULL'
 
-def main():
-    """Main function to orchestrate the scraping process."""
-    all_products_data = []
-    print("=== Starting scrape for general products from digikala.com/search/ ===")
-    print(f"Aiming for ~{TARGET_PRODUCT_COUNT} products across {PAGES_TO_SCRAPE} pages.")
+    row = {
+        'id': product.get('id'),
+        'title_en': title_en,
+        'title_fa': title_fa,
+        'Rate': rate,
+        'Rate_cnt': rate_count,
+        'introduction': description,
+        'comments_overview': comments_overview
+    }
+    return row, image_list
 
-    current_product = 0
-    for page_num in range(START_PAGE, PAGES_TO_SCRAPE + 1):
-        if len(all_products_data) >= TARGET_PRODUCT_COUNT:
-            print(f"Target of {TARGET_PRODUCT_COUNT} products reached. Stopping.")
-            break
 
-        print(f"\nScraping general product page {page_num} of {PAGES_TO_SCRAPE}...")
-        products = get_product_list(page_num)
+def drop_partial_row(path):
+    """Cuts off a row left without its trailing newline by a crash, so appending continues cleanly."""
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def load_scraped_ids(path):
+    """Returns the product IDs already in the output CSV (dropping a partial last row first)."""
+    if not os.path.exists(path):
+        return set()
+    drop_partial_row(path)
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return {row['id'] for row in csv.DictReader(f) if row.get('id')}
 
+
+def load_stored_rows(path):
+    """{product ID: row} from the output CSV; when a product appears twice the later row wins."""
+    if not os.path.exists(path):
+        return {}
+    drop_partial_row(path)
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return {row['id']: row for row in csv.DictReader(f) if row.get('id')}
+
+
+LISTING_FIELD_TYPES = {'title_fa': str, 'Rate': float, 'Rate_cnt': int}
+
+
+def normalize_listing_value(field, value):
+    """
+    Canonical form of a listing field, so the API's 4 and a stored "4.0" compare equal:
+    float rate, int count, stripped title. Values that don't parse fall back to stripped text.
+    """
+    if value is None:
+        return None
+    text = str(value).strip()
+    kind = LISTING_FIELD_TYPES[field]
+    if kind is str:
+        return text
+    try:
+        number = float(text)
+    except ValueError:
+        return text
+    return int(number) if kind is int and number.is_integer() else number
+
+
+def listing_changed(product, row):
+    """True if the cheap listing fields (title, rating, rating count) differ from the stored row."""
+    rating = product.get('rating') or {}
+    listed = {'title_fa': product.get('title_fa'), 'Rate': rating.get('rate'), 'Rate_cnt': rating.get('count')}
+    # Fields missing from the listing say nothing about a change
+    return any(value is not None
+               and normalize_listing_value(field, value) != normalize_listing_value(field, row.get(field))
+               for field, value in listed.items())
+
+
+def compact_csv(path):
+    """
+    Rewrites the CSV with only the last row of every product (refreshed rows are appended).
+    Two streaming passes: the first finds each product's last row, the second copies those.
+    """
+    last = {}
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for number, row in enumerate(csv.DictReader(f)):
+            last[row['id']] = number
+    tmp = path + ".tmp"
+    with open(path, newline='', encoding='utf-8-sig') as src, \
+            open(tmp, 'w', newline='', encoding='utf-8-sig') as dst:
+        writer = csv.DictWriter(dst, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for number, row in enumerate(csv.DictReader(src)):
+            if last.get(row['id']) == number:
+                writer.writerow(row)
+    os.replace(tmp, path)
+    return len(last)
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[WARN] Ignoring unreadable checkpoint {path}: {e}")
+        return None
+
+
+def save_checkpoint(path, page_num, product_id, scraped):
+    """Atomically records the last page/product written to the CSV."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"page": page_num, "product_id": product_id, "scraped": scraped}, f)
+    os.replace(tmp, path)
+
+
+def iter_search_products(start_page, last_page, skip_ids=None):
+    """
+    Yields (page_num, product) for every product on the search pages, in page order.
+    Products in `skip_ids` are skipped, and every yielded ID is added to it.
+    """
+    skip_ids = set() if skip_ids is None else skip_ids
+    for page_num in range(start_page, last_page + 1):
+        print(f"\nScraping general product page {page_num} of {last_page}...")
+        products = get_product_list(page_num)
         if not products:
             print("No more products found. Stopping.")
-            break
-
+            return
         for product in products:
-            if len(all_products_data) >= TARGET_PRODUCT_COUNT:
-                break
+            product_id = str(product.get('id'))
+            # Rankings shift between pages, so the same product can show up twice
+            if product_id in skip_ids:
+                continue
+            skip_ids.add(product_id)
+            yield page_num, product
 
-            current_product += 1
+
+def load_category_slugs(path):
+    """Leaf categories of a Workspace/main.py snapshot: disjoint partitions of the catalogue."""
+    with open(path, "r", encoding="utf-8") as f:
+        categories = json.load(f).get("categories", {})
+    leaves = [slug for slug, entry in categories.items() if not entry.get("children")]
+    return leaves or list(categories)
+
+
+def iter_category_products(slugs, skip_ids=None, workers=None, max_pages=None):
+    """
+    Yields (label, product) from the listings of all `slugs`, paged by `workers` threads
+    in parallel (one category per thread at a time). A global ID set drops products
+    already scraped or already listed under another category, so no product detail is
+    fetched twice. The label is "<slug>:<page>". An unexpected error in a worker is
+    raised here, in the consumer.
+    """
+    skip_ids = set() if skip_ids is None else skip_ids
+    workers = workers or CATEGORY_WORKERS
+    max_pages = max_pages or MAX_CATEGORY_PAGES
+    todo = queue.Queue()
+    for slug in slugs:
+        todo.put(slug)
+    found = queue.Queue(maxsize=PREFETCH * 2)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                found.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def harvest():
+        try:
+            while not stop.is_set():
+                try:
+                    slug = todo.get_nowait()
+                except queue.Empty:
+                    break
+                for page in range(1, max_pages + 1):
+                    products = get_category_products(slug, page)
+                    if not products or not put((f"{slug}:{page}", products)):
+                        break
+        except Exception as e:
+            put(e)  # re-raised by the consumer instead of dying silently in this thread
+        finally:
+            put(None)  # always signal, or the consumer would wait for this worker forever
+
+    threads = [threading.Thread(target=harvest, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    finished = 0
+    try:
+        while finished < len(threads):
+            item = found.get()
+            if item is None:
+                finished += 1
+                continue
+            if isinstance(item, Exception):
+                raise item
+            label, products = item
+            for product in products:
+                product_id = str(product.get('id'))
+                if product_id in skip_ids:
+                    continue
+                skip_ids.add(product_id)
+                yield label, product
+    finally:
+        stop.set()
+
+
+def iter_listed_products(start_page=START_PAGE, skip_ids=None):
+    """
+    The (label, product) listing for HARVEST_MODE, or None if the category tree is missing.
+    Both sources skip `skip_ids` and never yield the same product twice.
+    """
+    if HARVEST_MODE == "categories":
+        if not os.path.exists(CATEGORY_TREE):
+            print(f"Category tree {CATEGORY_TREE} not found; run Workspace/main.py first.")
+            return None
+        slugs = load_category_slugs(CATEGORY_TREE)
+        print(f"Listing {len(slugs)} categories ({CATEGORY_WORKERS} in parallel).")
+        return iter_category_products(slugs, skip_ids)
+    return iter_search_products(start_page, PAGES_TO_SCRAPE, skip_ids)
+
+
+def fetch_details_in_order(products, workers=None, prefetch=None):
+    """
+    Fetches product details on a thread pool and yields (page_num, product, detail)
+    in the order of `products`. At most `prefetch` products are in flight, so the
+    search pages are only read as fast as the details are consumed.
+    """
+    workers = workers or DETAIL_WORKERS
+    prefetch = prefetch or PREFETCH
+    pending = deque()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for page_num, product in products:
             product_id = product.get('id')
             if not product_id:
                 continue
+            pending.append((page_num, product, executor.submit(get_product_details, product_id)))
+            while len(pending) >= prefetch or (pending and pending[0][2].done()):
+                page_num, product, future = pending.popleft()
+                yield page_num, product, future.result()
+        while pending:
+            page_num, product, future = pending.popleft()
+            yield page_num, product, future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def main():
+    """Main function to orchestrate the scraping process."""
+    if HARVEST_MODE == "categories":
+        print("=== Starting scrape for products by category from digikala.com ===")
+        print(f"Aiming for ~{TARGET_PRODUCT_COUNT} products.")
+    else:
+        print("=== Starting scrape for general products from digikala.com/search/ ===")
+        print(f"Aiming for ~{TARGET_PRODUCT_COUNT} products across {PAGES_TO_SCRAPE} pages.")
+    get_limiter(urlsplit(API_BASE).netloc, rate=REQUESTS_PER_SECOND, max_rate=REQUESTS_PER_SECOND)
+
+    scraped_ids = load_scraped_ids(OUTPUT_FILE)
+    checkpoint = load_checkpoint(CHECKPOINT_FILE)
+    # The checkpointed page may be only partly written; its finished products are skipped by ID
+    start_page = checkpoint["page"] if checkpoint and isinstance(checkpoint.get("page"), int) else START_PAGE
+    if scraped_ids:
+        where = "skipping them by ID" if HARVEST_MODE == "categories" else f"continuing from page {start_page}"
+        print(f"Resuming: {len(scraped_ids)} products already in {OUTPUT_FILE}, {where}.")
+    if len(scraped_ids) >= TARGET_PRODUCT_COUNT:
+        print(f"Target of {TARGET_PRODUCT_COUNT} products already reached. Nothing to do.")
+        return
 
-            # Basic info from search (fallback)
-            title_en = product.get('title_en', 'N/A')
+    products = iter_listed_products(start_page, set(scraped_ids))
+    if products is None:
+        return
+
+    write_header = not os.path.exists(OUTPUT_FILE) or os.path.getsize(OUTPUT_FILE) == 0
+    manifest = ImageManifest(IMAGE_MANIFEST)
+    file = open(OUTPUT_FILE, mode='a', newline='', encoding='utf-8-sig')
+    writer = csv.DictWriter(file, fieldnames=FIELDNAMES)
+    if write_header:
+        writer.writeheader()
+
+    current_product = len(scraped_ids)
+    new_products = 0
+    try:
+        for page_num, product, product_detail in fetch_details_in_order(products):
+            if current_product >= TARGET_PRODUCT_COUNT:
+                print(f"Target of {TARGET_PRODUCT_COUNT} products reached. Stopping.")
+                break
+
+            current_product += 1
+            product_id = product.get('id')
             title_fa = product.get('title_fa', 'N/A')
-            rate = product.get('rating', {}).get('rate', 0)
-            rate_count = product.get('rating', {}).get('count', 0)
-
-            print(f"  -> Fetching details for ID {product_id} (Product {current_product}/{TARGET_PRODUCT_COUNT}): {title_fa[:30]}...")
-            
-            # Fetch detailed product data
-            product_detail = get_product_details(product_id)
-            
-            # Override with detail data if available
+            print(f"  -> Details for ID {product_id} (Product {current_product}/{TARGET_PRODUCT_COUNT}, page {page_num}): {title_fa[:30]}...")
+            row, image_list = build_row(product, product_detail)
             if product_detail:
-                title_en = product_detail.get('title_en', title_en)
-                title_fa = product_detail.get('title_fa', title_fa)
-                rate = product_detail.get('rating', {}).get('rate', rate)
-                rate_count = product_detail.get('rating', {}).get('count', rate_count)
-                image_list = get_product_images(product_detail)
-                description = extract_description(product_detail)
-                comments_overview = extract_comments_overview(product_detail)
-                # print(f"    Review Description preview: {description[:100]}...")
-                # print(f"    Comments Overview preview: {comments_overview[:100]}...")
                 print(f"    Found {len(image_list)} image URLs.")
-            else:
-                # Fallback to search data
-                image_list = get_product_images(product)
-                description = 'N/A'
-                comments_overview = 'NULL'
-                # print(f"    Warning: No details fetched, using fallback. Description: {description[:50]}...")
-
-            all_products_data.append({
-                'id': product_id,
-                'title_en': title_en,
-                'title_fa': title_fa,
-                'Rate': rate,
-                'Rate_cnt': rate_count,
-                'introduction': description,
-                'comments_overview': comments_overview
-            })
-            
-            # Save all images to a separate CSV in the image_urls folder
-            save_images_to_csv(product_id, image_list)
-            
-            time.sleep(0.2)  # Polite delay
-
-    # --- Save data to CSV ---
-    if all_products_data:
-        print(f"\n✅ Scrape complete! Writing {len(all_products_data)} products to {OUTPUT_FILE}...")
-        if os.path.exists(OUTPUT_FILE):
-            # File exists, append without writing header
-            with open(OUTPUT_FILE, mode='a', newline='', encoding='utf-8-sig') as file:
-                writer = csv.DictWriter(file, fieldnames=['id', 'title_en', 'title_fa', 'Rate', 'Rate_cnt', 'introduction', 'comments_overview'])
-                writer.writerows(all_products_data)
-        else:
-            # File doesn't exist, write with header
-            with open(OUTPUT_FILE, mode='w', newline='', encoding='utf-8-sig') as file:
-                fieldnames = ['id', 'title_en', 'title_fa', 'Rate', 'Rate_cnt', 'introduction', 'comments_overview']
-                writer = csv.DictWriter(file, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(all_products_data)
+
+            # Record the image URLs in the shared manifest for image_downloader.py
+            manifest.set_images(product_id, image_list)
+            writer.writerow(row)
+            file.flush()
+            new_products += 1
+            save_checkpoint(CHECKPOINT_FILE, page_num, product_id, current_product)
+    finally:
+        file.close()
+        manifest.close()
+
+    if new_products:
+        print(f"\n✅ Scrape complete! Wrote {new_products} new products to {OUTPUT_FILE} ({current_product} in total).")
         print("🎉 Done!")
     else:
         print("No data was scraped.")
 
 
+def refresh():
+    """
+    Re-lists the catalogue and fetches details only for new products and products whose
+    listing fields changed. Their rows are appended to the CSV as they arrive (a crash
+    loses nothing), then the file is compacted back to one row per product.
+    """
+    print(f"=== Refreshing {OUTPUT_FILE} from digikala.com ===")
+    get_limiter(urlsplit(API_BASE).netloc, rate=REQUESTS_PER_SECOND, max_rate=REQUESTS_PER_SECOND)
+    stored = load_stored_rows(OUTPUT_FILE)
+    print(f"{len(stored)} products stored.")
+    listed = iter_listed_products()
+    if listed is None:
+        return
+
+    counts = Counter()
+
+    def new_or_changed():
+        for label, product in listed:
+            row = stored.get(str(product.get('id')))
+            if row is None:
+                counts['new'] += 1
+            elif listing_changed(product, row):
+                counts['changed'] += 1
+            else:
+                counts['unchanged'] += 1
+                continue
+            yield label, product
+
+    write_header = not os.path.exists(OUTPUT_FILE) or os.path.getsize(OUTPUT_FILE) == 0
+    manifest = ImageManifest(IMAGE_MANIFEST)
+    file = open(OUTPUT_FILE, mode='a', newline='', encoding='utf-8-sig')
+    writer = csv.DictWriter(file, fieldnames=FIELDNAMES)
+    if write_header:
+        writer.writeheader()
+    try:
+        for label, product, product_detail in fetch_details_in_order(new_or_changed()):
+            row, image_list = build_row(product, product_detail)
+            status = "changed" if str(row['id']) in stored else "new"
+            print(f"  -> {status} product {row['id']} ({label}): {str(row['title_fa'])[:30]}...")
+            manifest.set_images(row['id'], image_list)
+            writer.writerow(row)
+            file.flush()
+    finally:
+        file.close()
+        manifest.close()
+
+    fetched = counts['new'] + counts['changed']
+    if fetched:
+        total = compact_csv(OUTPUT_FILE)
+        print(f"Compacted {OUTPUT_FILE} to {total} products.")
+    print(f"\n✅ Refresh complete: {sum(counts.values())} products listed, {counts['unchanged']} unchanged, "
+          f"{counts['changed']} changed, {counts['new']} new; fetched {fetched} product details.")
+
+
 if __name__ == "__main__":
-    main()
+    if REFRESH or "--refresh" in sys.argv[1:]:
+        refresh()
+    else:
+        main()
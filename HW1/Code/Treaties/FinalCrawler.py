@@ -1,14 +1,34 @@
 import requests
 from bs4 import BeautifulSoup
-import json
-import time
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+from common.async_fetch import fetch_pages
+from common.canonical import canonicalize
+from common.http_cache import make_cached_session
+from common.infobox import TREATY_FIELDS, InfoboxIndex, apply_fields
+from common.jsonl_output import JsonlWriter, export_json
+from common.mediawiki_api import MediaWikiClient, title_from_url, url_from_title
+from common.pipeline import extract_pages
 
 BASE_URL = "https://fa.wikipedia.org"
+OUTPUT_JSONL = "iran_histroy_with_details.jsonl"  # one record per line, written as pages finish
+OUTPUT_FILE = "iran_histroy_with_details.json"    # pretty JSON array exported at the end
+EXPORT_JSON = True
+
+# --- Fetch configuration ---
+MAX_PER_HOST = 4          # Requests in flight to fa.wikipedia.org at any time
+REQUESTS_PER_SECOND = 10  # Hard cap per host; the adaptive limiter only backs off below it
+CACHE_MAX_AGE = 24 * 3600 # Seconds a cached page is reused before revalidating with the server
+LINK_BACKEND = "html"     # "html" parses rendered category pages, "api" uses the MediaWiki action API
+HTML_BACKEND = None       # "selectolax", "lxml" or "bs4"; None picks the fastest installed parser
+EXTRACT_WORKERS = os.cpu_count() or 2  # processes parsing pages while the next ones download
 list_urls = [
     "/wiki/رده:معاهده%E2%80%8Cهای_ایران",
     '/wiki/رده:ائتلاف%E2%80%8Cهای_نظامی_ایران',
     '/wiki/رده:پیمان%E2%80%8Cنامه%E2%80%8Cهای_شاهنشاهی_ساسانی',
-    '/wiki/رده:پیمان%E2%80%8Cهای_شاهنشahi_اشکانیان',
+    '/wiki/رده:پیمان%E2%80%8Cهای_شاهنشاهی_اشکانیان',
     '/wiki/رده:معاهده%E2%80%8Cهای_افشاریان',
     '/wiki/رده:معاهده%E2%80%8Cهای_دودمان_پهلوی',
     '/wiki/رده:معاهده%E2%80%8Cهای_سلسله_قاجاریان',
@@ -18,10 +38,13 @@ list_urls = [
     '/wiki/رده:معاهده%E2%80%8Cهای_هخامنشیان'
 ]
 
-def get_treaty_links(category_url):
-    resp = requests.get(category_url)
+def get_treaty_links(category_url, session=requests):
+    resp = session.get(category_url)
     resp.encoding = 'utf-8'
-    soup = BeautifulSoup(resp.text, 'html.parser')
+    return parse_treaty_links(resp.text)
+
+def parse_treaty_links(html):
+    soup = BeautifulSoup(html, 'html.parser')
     pages_section = soup.find('h2', string="صفحه‌ها")
     if pages_section:
         pages_div = pages_section.find_next('div', id="mw-pages")
@@ -32,8 +55,20 @@ def get_treaty_links(category_url):
             return [link['href'] for link in links]
     return []
 
-def extract_structured_data(soup):
-    for ref in soup.select('sup.reference'):
+def get_treaty_links_api(category_urls, session=None, api_url=None):
+    """Lists category members through the MediaWiki API, following continuation tokens."""
+    client = MediaWikiClient(api_url=api_url or BASE_URL + "/w/api.php", session=session)
+    for category_url in category_urls:
+        try:
+            titles = list(client.category_members(title_from_url(category_url)))
+        except Exception as e:
+            print(f"Error listing category {category_url}: {e}")
+            titles = []
+        yield category_url, [url_from_title(title, base_url="") for title in titles]
+
+def extract_structured_data(page):
+    """Extracts a treaty record from a parsed article (see common.html_backend.parse_html)."""
+    for ref in page.css('sup.reference'):
         ref.decompose()
 
     data = {
@@ -69,19 +104,16 @@ def extract_structured_data(soup):
     }
 
     # Extract title
-    title_tag = soup.find('h1', {'id': 'firstHeading'})
+    title_tag = page.css_first('h1#firstHeading')
     if title_tag:
-        data["title"] = title_tag.get_text(strip=True)
+        data["title"] = title_tag.text(strip=True)
 
     # Extract full text for keyword matching and fallback
-    content_div = soup.find('div', class_='mw-parser-output')
+    content_div = page.css_first('div.mw-parser-output')
     full_text = ""
     if content_div:
-        paragraphs = content_div.find_all('p')
-        for p in paragraphs:
-            for sup in p.find_all("sup", class_="reference"):
-                sup.decompose()
-            text = p.get_text(strip=True)
+        for p in content_div.css('p'):
+            text = p.text(strip=True)
             if text:
                 full_text += text + "\n"
     data["text"] = full_text.strip() if full_text.strip() else "<TBD>"
@@ -91,188 +123,106 @@ def extract_structured_data(soup):
     is_treaty = any(keyword in data["title"] or keyword in full_text for keyword in treaty_keywords)
 
     # Extract description
-    infobox = soup.find('table', {'class': 'infobox'})
+    infobox = page.css_first('table.infobox')
     description = ""
     if infobox:
-        next_sibling = infobox.find_next_sibling()
-        while next_sibling and next_sibling.name not in ['h2', 'h3']:
-            if next_sibling.name == 'p':
-                description += next_sibling.get_text(strip=True) + " "
-            next_sibling = next_sibling.find_next_sibling()
+        for sibling in infobox.next_siblings():
+            if sibling.tag in ['h2', 'h3']:
+                break
+            if sibling.tag == 'p':
+                description += sibling.text(strip=True) + " "
     data["description"] = description.strip() if description.strip() else "<TBD>"
 
-    # Extract period
-    try:
-        signature_date_tag = soup.find('th', text="تاریخ امضا")
-        creation_date_tag = soup.find('th', text="تاریخ ایجاد")
-        if signature_date_tag:
-            td = signature_date_tag.find_next('td')
-            if td:
-                data["period"]["start_year"] = td.get_text(strip=True).replace('–', '-').replace('—', '-')
-        elif creation_date_tag:
-            td = creation_date_tag.find_next('td')
-            if td:
-                data["period"]["start_year"] = td.get_text(strip=True).replace('–', '-').replace('—', '-')
-        else:
-            date_tag = soup.find('th', text="تاریخ")
-            if date_tag:
-                td = date_tag.find_next('td')
-                if td:
-                    date_data = td.get_text(strip=True).replace('–', '-').replace('—', '-')
-                    years = [y.strip() for y in date_data.split('-') if y.strip()]
-                    if len(years) == 2:
-                        data["period"]["start_year"], data["period"]["end_year"] = years
-                    elif len(years) == 1:
-                        data["period"]["start_year"] = data["period"]["end_year"] = years[0]
-        effective_date_tag = soup.find('th', text="تاریخ اجرا")
-        if effective_date_tag:
-            td = effective_date_tag.find_next('td')
-            if td:
-                data["period"]["end_year"] = td.get_text(strip=True).replace('–', '-').replace('—', '-')
-    except Exception as e:
-        print(f"Error processing dates: {e}")
-
-    # Extract belligerents
-    signatories_tag = soup.find('th', text="امضاکنندگان")
-    if signatories_tag:
-        td = signatories_tag.find_next('td')
-        if td:
-            for hr in td.find_all('hr'):
-                hr.replace_with('، ')
-            for br in td.find_all('br'):
-                br.replace_with('، ')
-            belligerents = [a.get_text(strip=True) for a in td.find_all('a') if 'title' in a.attrs and not a['href'].startswith('/wiki/پرونده:')]
-            for belligerent in belligerents:
-                data["belligerents"].append({"name": belligerent.strip()})
-    else:
-        belligerents_tag = soup.find('th', text="طرف‌ها")
-        if belligerents_tag:
-            belligerents_data = belligerents_tag.find_next('td').get_text(strip=True)
-            belligerents = belligerents_data.replace('،', 'و').split('و')
-            for belligerent in belligerents:
-                belligerent = belligerent.strip()
-                if belligerent:
-                    data["belligerents"].append({"name": belligerent})
-
-    # Extract result
-    result_tag = soup.find('th', text="نتیجه")
-    if result_tag:
-        result_data = result_tag.find_next('td').get_text(strip=True)
-        data["result"] = result_data if result_data else "<TBD>"
-
-    # Extract impact
-    try:
-        results_tag = soup.find('th', string="نتایج")
-        if results_tag:
-            results_td = results_tag.find_next('td')
-            if results_td:
-                for ref in results_td.find_all("sup", class_="reference"):
-                    ref.decompose()
-                p_tag = results_td.find('p')
-                if p_tag:
-                    p_text = p_tag.get_text(strip=True)
-                    if p_text:
-                        data["impact"].append(p_text)
-                for li in results_td.find_all('li'):
-                    li_text = li.get_text(strip=True)
-                    if li_text:
-                        data["impact"].append(li_text)
-    except:
-        pass
-
-    # Extract location
-    try:
-        signature_location_tag = soup.find('th', text="مکان امضا")
-        if signature_location_tag:
-            location_td = signature_location_tag.find_next('td')
-            if location_td:
-                for ref in location_td.find_all("sup", class_="reference"):
-                    ref.decompose()
-                for br in location_td.find_all("br"):
-                    br.replace_with(", ")
-                location_text = location_td.get_text(strip=True)
-                data["location"]["position"] = location_text if location_text else "<TBD>"
-        else:
-            location_tag = soup.find('th', string="موقعیت")
-            if location_tag:
-                location_td = location_tag.find_next('td')
-                if location_td:
-                    for ref in location_td.find_all("sup", class_="reference"):
-                        ref.decompose()
-                    location_text = location_td.get_text(strip=True)
-                    data["location"]["position"] = location_text if location_text else "<TBD>"
-    except Exception as e:
-        print(f"Error processing location: {e}")
+    # Extract infobox fields (period, belligerents, result, impact, location) in one pass
+    apply_fields(data, InfoboxIndex(page), TREATY_FIELDS)
 
     # Extract historical significance
-    impact_tag = soup.find('span', text="اهمیت تاریخی")
+    impact_tag = page.find_by_text('span', "اهمیت تاریخی")
     if impact_tag:
-        impact_data = impact_tag.find_parent().get_text(strip=True)
+        impact_data = impact_tag.parent.text(strip=True)
         data["historical_significance"] = impact_data if impact_data else "<TBD>"
 
     # Extract references
-    references = soup.find_all('cite')
-    for ref in references[:5]:
-        ref_title = ref.find('a')
+    for ref in page.css('cite')[:5]:
+        ref_title = ref.css_first('a')
         if ref_title:
             data["references"].append({
-                "title": ref_title.get_text(strip=True),
-                "author": ref.get_text(strip=True),
+                "title": ref_title.text(strip=True),
+                "author": ref.text(strip=True),
                 "year": "Unknown"
             })
 
     # Extract source
+    canonical = page.css_first('link[rel=canonical]')
     data["source"]["title"] = data["title"]
     data["source"]["author"] = "Wikipedia"
     data["source"]["publication_date"] = "Unknown"
-    data["source"]["url"] = soup.find('link', {'rel': 'canonical'})['href'] if soup.find('link', {'rel': 'canonical'}) else "<TBD>"
+    data["source"]["url"] = canonical.get('href') if canonical else "<TBD>"
 
     return data, is_treaty
 
-# Collect unique treaty links from all category URLs
-unique_hrefs = set()
-for category_url in list_urls:
-    full_category_url = BASE_URL + category_url
-    links = get_treaty_links(full_category_url)
-    for link in links:
-        unique_hrefs.add(link)
-    print(f"Found {len(links)} treaty links in {category_url}")
-
-results = []
-
-for idx, href in enumerate(unique_hrefs, 1):
-    full_url = BASE_URL + href
-    print(f"[{idx}] Processing: {full_url}")
-    try:
-        detail_resp = requests.get(full_url)
-        detail_resp.encoding = 'utf-8'
-        detail_soup = BeautifulSoup(detail_resp.text, 'html.parser')
-
-        structured_data, is_treaty = extract_structured_data(detail_soup)
+def main():
+    session = make_cached_session(max_age=CACHE_MAX_AGE, pool_size=MAX_PER_HOST * 4)
+
+    # Collect unique treaty links from all category URLs, keeping discovery order.
+    # Keys are canonical URLs, so the same treaty linked under two spellings is fetched once.
+    unique_urls = {}
+    if LINK_BACKEND == "api":
+        for category_url, links in get_treaty_links_api(list_urls, session):
+            for link in links:
+                unique_urls.setdefault(canonicalize(BASE_URL + link), None)
+            print(f"Found {len(links)} treaty links in {category_url}")
+    else:
+        category_urls = [BASE_URL + category_url for category_url in list_urls]
+        for category_url, html, error in fetch_pages(category_urls, max_per_host=MAX_PER_HOST, requests_per_second=REQUESTS_PER_SECOND, session=session):
+            if error:
+                print(f"Error fetching category {category_url}: {error}")
+                continue
+            links = parse_treaty_links(html)
+            for link in links:
+                unique_urls.setdefault(canonicalize(BASE_URL + link), None)
+            print(f"Found {len(links)} treaty links in {category_url}")
+
+    # Records stream to OUTPUT_JSONL; pages finished in an earlier run are skipped
+    writer = JsonlWriter(OUTPUT_JSONL)
+    detail_urls = [url for url in unique_urls if url not in writer]
+    if len(detail_urls) < len(unique_urls):
+        print(f"Resuming: {len(unique_urls) - len(detail_urls)} pages already done, {writer.records} treaties saved")
+
+    # Pages are downloaded concurrently and parsed on EXTRACT_WORKERS processes; records arrive in order
+    pages = extract_pages(detail_urls, extract_structured_data, backend=HTML_BACKEND, workers=EXTRACT_WORKERS,
+                          max_per_host=MAX_PER_HOST, requests_per_second=REQUESTS_PER_SECOND, session=session)
+    for idx, (full_url, record, error) in enumerate(pages, 1):
+        print(f"[{idx}] Processing: {full_url}")
+        if error:
+            print(f"   ❌ Error processing {full_url}: {error}")
+            continue
+        structured_data, is_treaty = record
 
         # Only skip if it's explicitly not a treaty based on keyword check
         if not is_treaty:
             print(f"   ⚠️ Skipping: {structured_data['title']} does not appear to be a treaty based on keyword check.")
+            writer.write(full_url)
             continue
 
-        results.append(structured_data)
+        writer.write(full_url, structured_data)
         print(f"   ✅ Successfully processed: {structured_data['title']}")
+    writer.close()
+    print(f"Collected {writer.records} treaties with detailed info.")
 
-    except Exception as e:
-        print(f"   ❌ Error processing {full_url}: {e}")
-        continue
+    # Log missing entries; they are retried on the next run
+    missing = sum(1 for url in unique_urls if url not in writer)
+    if missing:
+        print(f"Warning: {missing} pages failed and will be retried on the next run.")
 
-    time.sleep(1)  # Increased delay to be polite to Wikipedia servers
+    # Optional pretty JSON array for the downstream QA/preprocess scripts
+    if EXPORT_JSON:
+        try:
+            export_json(OUTPUT_JSONL, OUTPUT_FILE)
+        except Exception as e:
+            print(f"Error writing to JSON file: {e}")
+    print(f"HTTP cache: {session.cache.stats()}")
 
-# Save final result
-try:
-    with open("iran_histroy_with_details.json", "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
-    print(f"Collected {len(results)} treaties with detailed info.")
-except Exception as e:
-    print(f"Error writing to JSON file: {e}")
 
-# Log missing entries
-expected_count = len(unique_hrefs)
-if len(results) < expected_count:
-    print(f"Warning: Expected {expected_count} treaties, but only {len(results)} were processed.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,32 @@
-import requests
 from bs4 import BeautifulSoup
-import json
-import time
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+from common.canonical import canonicalize
+from common.http_cache import make_cached_session
+from common.infobox import WAR_FIELDS, InfoboxIndex, apply_fields
+from common.jsonl_output import JsonlWriter, export_json
+from common.pipeline import extract_pages
 
 BASE_URL = "https://fa.wikipedia.org"
 MAIN_URL = BASE_URL + "/wiki/فهرست_جنگ‌های_ایران"
+OUTPUT_JSONL = "iran_wars_with_details.jsonl"  # one record per line, written as pages finish
+OUTPUT_FILE = "iran_wars_with_details.json"    # pretty JSON array exported at the end
+EXPORT_JSON = True
+
+# --- Fetch configuration ---
+MAX_PER_HOST = 4          # Requests in flight to fa.wikipedia.org at any time
+REQUESTS_PER_SECOND = 10  # Hard cap per host; the adaptive limiter only backs off below it
+CACHE_MAX_AGE = 24 * 3600 # Seconds a cached page is reused before revalidating with the server
+HTML_BACKEND = None       # "selectolax", "lxml" or "bs4"; None picks the fastest installed parser
+EXTRACT_WORKERS = os.cpu_count() or 2  # processes parsing pages while the next ones download
 
 
-def extract_structured_data(soup):
+def extract_structured_data(page):
+    """Extracts a war record from a parsed article (see common.html_backend.parse_html)."""
     # Remove reference superscripts (e.g. [1], [2])
-    for ref in soup.select('sup.reference'):
+    for ref in page.css('sup.reference'):
         ref.decompose()
 
     # Template for storing extracted data
@@ -31,121 +48,40 @@ def extract_structured_data(soup):
     }
 
     # ====================== Extract title ======================
-    title_tag = soup.find('h1', {'id': 'firstHeading'})
+    title_tag = page.css_first('h1#firstHeading')
     if title_tag:
-        data["title"] = title_tag.get_text(strip=True)
+        data["title"] = title_tag.text(strip=True)
 
     # ====================== Extract description ======================
     print(f"Working on description ...")
-    infobox = soup.find('table', {'class': 'infobox'})
+    infobox = page.css_first('table.infobox')
     description = ""
     if infobox:
-        next_sibling = infobox.find_next_sibling()
-        while next_sibling and next_sibling.name not in ['h2', 'h3']:
-            if next_sibling.name == 'p':
-                description += next_sibling.get_text(strip=True) + " "
-            next_sibling = next_sibling.find_next_sibling()
+        for sibling in infobox.next_siblings():
+            if sibling.tag in ['h2', 'h3']:
+                break
+            if sibling.tag == 'p':
+                description += sibling.text(strip=True) + " "
     if description:
         data["description"] = description.strip()
 
-    # ====================== Extract period (date) ======================
-    print(f"Working on period ...")
-    try:
-        date_tag = soup.find('th', text="تاریخ")
-        if date_tag:
-            td = date_tag.find_next('td')
-            if td:
-                date_data = td.get_text(strip=True).replace('–', '-').replace('—', '-')
-                is_bc = 'پ.م' in date_data or 'پیش' in date_data
-                years = [y.strip() for y in date_data.split('-') if y.strip()]
-                if len(years) == 2:
-                    data["period"]["start_year"], data["period"]["end_year"] = years
-                elif len(years) == 1:
-                    data["period"]["start_year"] = data["period"]["end_year"] = years[0]
-    except:
-        pass
-
-    # ====================== Extract location ======================
-    try:
-        location_tag = soup.find('th', string="موقعیت")
-        if location_tag:
-            location_td = location_tag.find_next('td')
-            for ref in location_td.find_all("sup", class_="reference"):
-                ref.decompose()
-            data["location"]["position"] = location_td.get_text(strip=True)
-    except:
-        pass
-    
-    # ====================== Extract belligerents ======================
-    belligerents_tag = soup.find('th', text="طرف‌ها")
-    if belligerents_tag:
-        belligerents_data = belligerents_tag.find_next('td').get_text(strip=True)
-        belligerents = belligerents_data.split('و')
-        for i, belligerent in enumerate(belligerents[:2]):
-            data["belligerents"][i]["name"] = belligerent.strip()
-
-    # ====================== Extract result ======================
-    result_tag = soup.find('th', text="نتیجه")
-    if result_tag:
-        data["result"] = result_tag.find_next('td').get_text(strip=True)
-
-    # ====================== Extract impact ("نتایج") ======================
-    try:
-        results_tag = soup.find('th', string="نتایج")
-        if results_tag:
-            results_td = results_tag.find_next('td')
-            for ref in results_td.find_all("sup", class_="reference"):
-                ref.decompose()
-            p_tag = results_td.find('p')
-            if p_tag:
-                data["impact"].append(p_tag.get_text(strip=True))
-            for li in results_td.find_all('li'):
-                data["impact"].append(li.get_text(strip=True))
-    except:
-        pass
-
-    # ====================== Extract commanders ("فرماندهان و رهبران") ======================
-    try:
-        commanders_tag = soup.find('th', string="فرماندهان و رهبران")
-        if commanders_tag:
-            commanders_td = commanders_tag.find_next('td')
-            for ref in commanders_td.find_all("sup", class_="reference"):
-                ref.decompose()
-            commanders = [c.strip() for c in commanders_td.get_text(separator="|", strip=True).split('|')]
-            for i, commander in enumerate(commanders[:2]):
-                data["belligerents"][i]["leader"] = commander
-    except:
-        pass
-
-    # ====================== Extract casualties ("تلفات و خسارات") ======================
-    try:
-        casualties_tag = soup.find('th', string="تلفات و خسارات")
-        if casualties_tag:
-            casualties_td = casualties_tag.find_next('td')
-            for ref in casualties_td.find_all("sup", class_="reference"):
-                ref.decompose()
-            casualties = [c.strip() for c in casualties_td.get_text(separator="|", strip=True).split('|')]
-            if len(casualties) == 2:
-                data["casualties"]["side_1"] = casualties[0]
-                data["casualties"]["side_2"] = casualties[1]
-            else:
-                data["casualties"]["summary"] = " - ".join(casualties)
-    except:
-        pass
+    # ====================== Extract infobox fields ======================
+    print(f"Working on infobox ...")
+    apply_fields(data, InfoboxIndex(page), WAR_FIELDS)
 
     # ====================== Extract historical significance ======================
-    impact_tag = soup.find('span', text="اهمیت تاریخی")
+    impact_tag = page.find_by_text('span', "اهمیت تاریخی")
     if impact_tag:
-        data["historical_significance"] = impact_tag.find_parent().get_text(strip=True)
+        data["historical_significance"] = impact_tag.parent.text(strip=True)
 
     # ====================== Extract references ======================
     citation = 0
-    for ref in soup.find_all('cite'):
-        ref_title = ref.find('a')
+    for ref in page.css('cite'):
+        ref_title = ref.css_first('a')
         if ref_title:
             data["references"].append({
-                "title": ref_title.get_text(strip=True),
-                "author": ref.get_text(strip=True),
+                "title": ref_title.text(strip=True),
+                "author": ref.text(strip=True),
                 "year": "Unknown"
             })
             
@@ -154,10 +90,11 @@ def extract_structured_data(soup):
             break
 
     # ====================== Extract source ======================
+    canonical = page.css_first('link[rel=canonical]')
     data["source"]["title"] = data["title"]
     data["source"]["author"] = "Wikipedia"
     data["source"]["publication_date"] = "Unknown"
-    data["source"]["url"] = soup.find('link', {'rel': 'canonical'})['href'] if soup.find('link', {'rel': 'canonical'}) else MAIN_URL
+    data["source"]["url"] = canonical.get('href') if canonical else MAIN_URL
 
     # ====================== Normalize missing fields ======================
     for key, value in data.items():
@@ -167,42 +104,65 @@ def extract_structured_data(soup):
     return data
 
 
+def extract_article(page):
+    """Structured data plus the full article text (for LLM or NLP purposes); runs in a worker process."""
+    data = extract_structured_data(page)
+    content_div = page.css_first('div.mw-parser-output')
+    if content_div:
+        data['text'] = "\n".join(tag.text(strip=True) for tag in content_div.css('p, h2, h3') if tag.text(strip=True))
+    return data
+
+
 # ====================== Main execution ======================
-resp = requests.get(MAIN_URL)
-resp.encoding = 'utf-8'
-soup = BeautifulSoup(resp.text, 'html.parser')
-
-# Get table of wars
-table = soup.find('table', {'class': 'wikitable'})
-headers = [th.text.strip() for th in table.find_all('tr')[0].find_all('th')]
-
-results = []
-
-# Iterate through table rows
-for idx, row in enumerate(table.find_all('tr')[1:], 1):
-    cells = row.find_all(['td', 'th'])
-    if len(cells) != len(headers):
-        continue
-
-    item = {}
-    for i, header in enumerate(headers):
-        text = cells[i].get_text(strip=True)
-        link_tag = cells[i].find('a')
-        item[header] = text
-        if i == 0 and link_tag and link_tag.get('href'):
-            item['link'] = BASE_URL + link_tag['href']
-
-    print(f"[{idx}] Processing: {item.get(headers[0], 'Unknown')}")
-    if 'link' in item:
+def main():
+    session = make_cached_session(max_age=CACHE_MAX_AGE, pool_size=MAX_PER_HOST * 4)
+    resp = session.get(MAIN_URL)
+    resp.encoding = 'utf-8'
+    soup = BeautifulSoup(resp.text, 'html.parser')
+
+    # Get table of wars
+    table = soup.find('table', {'class': 'wikitable'})
+    headers = [th.text.strip() for th in table.find_all('tr')[0].find_all('th')]
+
+    # Collect table rows first so every detail page can be fetched concurrently
+    rows = []
+    for idx, row in enumerate(table.find_all('tr')[1:], 1):
+        cells = row.find_all(['td', 'th'])
+        if len(cells) != len(headers):
+            continue
+
+        item = {}
+        for i, header in enumerate(headers):
+            text = cells[i].get_text(strip=True)
+            link_tag = cells[i].find('a')
+            item[header] = text
+            if i == 0 and link_tag and link_tag.get('href'):
+                item['link'] = canonicalize(BASE_URL + link_tag['href'])
+        rows.append((idx, item, cells))
+
+    # Records stream to OUTPUT_JSONL; wars finished in an earlier run are skipped
+    writer = JsonlWriter(OUTPUT_JSONL)
+    done = sum(1 for _, item, _ in rows if item.get('link') in writer)
+    if done:
+        print(f"Resuming: {done} wars already done, {writer.records} records saved")
+    rows = [(idx, item, cells) for idx, item, cells in rows if item.get('link') not in writer]
+
+    links = [item['link'] for _, item, _ in rows if 'link' in item]
+    # Pages are downloaded concurrently and parsed on EXTRACT_WORKERS processes
+    pages = extract_pages(links, extract_article, backend=HTML_BACKEND, workers=EXTRACT_WORKERS,
+                          max_per_host=MAX_PER_HOST, requests_per_second=REQUESTS_PER_SECOND, session=session)
+
+    # Iterate through table rows; pages arrive in the same order as `links`
+    for idx, item, cells in rows:
+        print(f"[{idx}] Processing: {item.get(headers[0], 'Unknown')}")
+        if 'link' not in item:
+            continue
+
+        _, structured_data, error = next(pages)
         try:
             print(f"   ↪ Fetching details from: {item['link']}")
-            detail_resp = requests.get(item['link'])
-            detail_resp.encoding = 'utf-8'
-            detail_soup = BeautifulSoup(detail_resp.text, 'html.parser')
-            for ref in detail_soup.select('sup.reference'):
-                ref.decompose()
-
-            structured_data = extract_structured_data(detail_soup)
+            if error:
+                raise error
 
             # Override result with summary from table (4th column)
             if len(cells) >= 4:
@@ -221,24 +181,26 @@ for idx, row in enumerate(table.find_all('tr')[1:], 1):
                 if result_text:
                     structured_data["result"] = result_text
 
-            # Extract full article text for LLM or NLP purposes
-            content_div = detail_soup.find('div', {'class': 'mw-parser-output'})
-            if content_div:
-                structured_data['text'] = "\n".join(tag.get_text(strip=True) for tag in content_div.find_all(['p', 'h2', 'h3']) if tag.get_text(strip=True))
-
-            results.append(structured_data)
+            writer.write(item['link'], structured_data)
 
         except Exception as e:
             print(f"   ❌ Error fetching detail page: {e}")
 
-        time.sleep(0.2)
-
         # Limit for testing (can remove for full scrape)
-        # if len(results) > 10:
+        # if writer.records > 10:
         #     break
+    writer.close()
+
+    # ====================== Export pretty JSON array ======================
+    if EXPORT_JSON:
+        try:
+            export_json(OUTPUT_JSONL, OUTPUT_FILE)
+        except Exception as e:
+            print(f"Error writing to JSON file: {e}")
+
+    print(f"Collected {writer.records} wars with detailed info.")
+    print(f"HTTP cache: {session.cache.stats()}")
 
-# ====================== Save results to JSON ======================
-with open("iran_wars_with_details.json", "w", encoding="utf-8") as f:
-    json.dump(results, f, ensure_ascii=False, indent=2)
 
-print(f"Collected {len(results)} wars with detailed info.")
+if __name__ == "__main__":
+    main()
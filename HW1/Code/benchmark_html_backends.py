@@ -0,0 +1,105 @@
+"""
+Benchmarks the HTML parser backends on recorded fawiki article pages.
+
+For every available backend (selectolax, lxml, bs4) this parses each page
+and runs both HW1 extractors on it, reports pages/second, and checks that
+every backend produces the same records as the BeautifulSoup fallback.
+
+Pages come from PAGES_DIR (*.html files) if it exists, otherwise from the
+shared HTTP cache that the crawlers fill (common/http_cache.py). With an
+empty cache it falls back to the sample articles in FIXTURE_DIR, which the
+test suite also checks for backend parity (tests/test_html_backends.py).
+
+Usage:
+    python HW1/Code/benchmark_html_backends.py
+"""
+
+import contextlib
+import glob
+import io
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", ".."))
+sys.path.insert(0, os.path.join(HERE, "Treaties"))
+sys.path.insert(0, os.path.join(HERE, "War"))
+from common.html_backend import available_backends, parse_html
+from common.http_cache import HttpCache
+import FinalCrawler
+import WarCrawlerv3
+
+PAGES_DIR = "recorded_pages"           # directory of saved article .html files
+FIXTURE_DIR = os.path.normpath(os.path.join(HERE, "..", "..", "tests", "fixtures", "fawiki_pages"))
+CACHE_URL_PREFIX = "https://fa.wikipedia.org/wiki/"
+MAX_PAGES = 500
+ROUNDS = 3                              # best of N timings per backend
+
+EXTRACTORS = {
+    "treaty": FinalCrawler.extract_structured_data,
+    "war": WarCrawlerv3.extract_structured_data,
+}
+
+
+def read_pages(directory):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html")))[:MAX_PAGES]:
+        with open(path, "r", encoding="utf-8") as f:
+            pages.append(f.read())
+    return pages
+
+
+def load_pages():
+    if os.path.isdir(PAGES_DIR):
+        return read_pages(PAGES_DIR)
+    cache = HttpCache()
+    pages = []
+    for url in cache.urls(CACHE_URL_PREFIX):
+        entry = cache.get(url)
+        if entry and "html" in (entry["content_type"] or ""):
+            pages.append(entry["body"].decode(entry["encoding"] or "utf-8", errors="replace"))
+            if len(pages) >= MAX_PAGES:
+                break
+    cache.close()
+    if not pages:
+        print(f"[INFO] No recorded pages in the HTTP cache; using the sample articles in {FIXTURE_DIR}")
+        pages = read_pages(FIXTURE_DIR)
+    return pages
+
+
+def run_extractor(extract, html, backend):
+    """Parses and extracts one page; extractor errors count as that page's result."""
+    try:
+        return extract(parse_html(html, backend))
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+
+def main():
+    pages = load_pages()
+    if not pages:
+        print(f"No pages found in {PAGES_DIR}/, the HTTP cache or {FIXTURE_DIR}.")
+        return
+    print(f"📄 {len(pages)} pages, backends: {', '.join(available_backends())}")
+
+    reference = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, extract in EXTRACTORS.items():
+            reference[name] = [run_extractor(extract, html, "bs4") for html in pages]
+
+    for backend in available_backends():
+        for name, extract in EXTRACTORS.items():
+            best = float("inf")
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(ROUNDS):
+                    start = time.perf_counter()
+                    results = [run_extractor(extract, html, backend) for html in pages]
+                    best = min(best, time.perf_counter() - start)
+            mismatches = sum(1 for a, b in zip(results, reference[name]) if a != b)
+            print(f"{backend:>10} | {name:<6} | {len(pages) / best:8.1f} pages/s | "
+                  f"{mismatches} records differ from bs4")
+
+
+if __name__ == "__main__":
+    main()
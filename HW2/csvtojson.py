@@ -1,11 +1,13 @@
-import pandas as pd
+import os
+import sys
 
-# Load CSV file with UTF-8 encoding
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.csv_to_json import convert_csv
+
+# Streamed row by row; numeric columns come out as numbers and empty cells as null
 csv_file = "product_summaries.csv"
-df = pd.read_csv(csv_file, encoding="utf-8")
+json_file = "product_summaries.json"  # ".jsonl" writes one record per line instead
 
-# Convert to JSON and save with UTF-8 encoding
-json_file = "product_summaries.json"
-df.to_json(json_file, orient="records", force_ascii=False, indent=4)
+convert_csv(csv_file, json_file, typed=True, indent=4)
 
 print(f"Converted {csv_file} to {json_file}")
@@ -0,0 +1,287 @@
+"""
+Resolves Digikala product image URLs for the HW3 image scrapers.
+
+Images are read from the v2 product API first (the same JSON
+DigikalaProject/product_scraper.py uses), on a thread pool of keep-alive,
+rate-limited sessions. Only products the API cannot answer fall back to
+headless Chrome, and those share a pool of BROWSERS reusable drivers that
+wait for the gallery element explicitly instead of sleeping a fixed time.
+
+Resolved images are downloaded concurrently (common/file_download.py) and
+added to the content-addressed store and, optionally, the training shards.
+
+Usage:
+    counts = fetch_product_images(ids, "product_images", GALLERY_SELECTORS, 3,
+                                  lambda pid, i, ext: f"{pid}_{i}{ext}", ImageStore("image_store"))
+"""
+
+import os
+import queue
+import sys
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from urllib.parse import urlsplit
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from tqdm import tqdm
+from webdriver_manager.chrome import ChromeDriverManager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "DigikalaProject"))
+import product_scraper
+from common.file_download import download_files
+from common.image_store import IMAGE_EXTENSIONS
+from common.rate_limiter import get_limiter
+
+API_WORKERS = 16      # product API requests in flight (paced by product_scraper's rate limit)
+BROWSERS = 2          # headless Chrome instances for products the API cannot resolve
+PAGE_TIMEOUT = 15     # seconds to wait for the gallery to appear
+DOWNLOAD_CONCURRENCY = 16
+CHUNK_SIZE = 200      # resolved products downloaded per batch
+PRODUCT_URL = "https://www.digikala.com/product/dkp-{}/"
+
+
+def clean_url(url):
+    """Drops the resize/crop query so the full-size image is downloaded."""
+    return url.split('?')[0]
+
+
+def resolve_from_api(product_id, limit):
+    """Up to `limit` distinct image URLs from the product API (main image first), [] if unavailable."""
+    detail = product_scraper.get_product_details(product_id)
+    urls = []
+    for url in product_scraper.get_product_images(detail):
+        url = clean_url(url)
+        if url not in urls:
+            urls.append(url)
+    return urls[:limit]
+
+
+def make_driver():
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--window-size=1920,1080")
+    # Prevents the "DevTools listening on..." message
+    chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])
+    service = Service(ChromeDriverManager().install())
+    return webdriver.Chrome(service=service, options=chrome_options)
+
+
+class BrowserPool:
+    """Up to `size` headless drivers, started on first use and reused for every page."""
+
+    def __init__(self, size=BROWSERS):
+        self.size = size
+        self._idle = queue.Queue()
+        self._all = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def driver(self):
+        try:
+            driver = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                start = len(self._all) < self.size
+                if start:
+                    self._all.append(None)  # reserve the slot while Chrome starts
+            if start:
+                try:
+                    driver = make_driver()
+                except Exception:
+                    with self._lock:
+                        self._all.remove(None)
+                    raise
+                with self._lock:
+                    self._all[self._all.index(None)] = driver
+            else:
+                driver = self._idle.get()
+        try:
+            yield driver
+        finally:
+            self._idle.put(driver)
+
+    def close(self):
+        for driver in self._all:
+            if driver is not None:
+                driver.quit()
+        self._all = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def resolve_from_browser(product_id, browsers, selectors, limit):
+    """Loads the product page and returns up to `limit` image URLs from the first selector that matches."""
+    with browsers.driver() as driver:
+        driver.get(PRODUCT_URL.format(product_id))
+        try:
+            WebDriverWait(driver, PAGE_TIMEOUT).until(
+                lambda d: any(d.find_elements(By.CSS_SELECTOR, selector) for selector in selectors)
+            )
+        except TimeoutException:
+            return []
+        for selector in selectors:
+            urls = [clean_url(img.get_attribute('src')) for img in driver.find_elements(By.CSS_SELECTOR, selector)
+                    if img.get_attribute('src')]
+            if urls:
+                return urls[:limit]
+    return []
+
+
+def resolve_images(product_ids, browsers, selectors, limit, api_workers=API_WORKERS):
+    """
+    Yields (product_id, urls, source) in the order of `product_ids`, where source is
+    "api", "browser" or None (no images found either way). Every product is resolved
+    ahead in parallel; an API miss goes to the browser pool as soon as it is known.
+    """
+    api_host = urlsplit(product_scraper.API_BASE).netloc
+    get_limiter(api_host, rate=product_scraper.REQUESTS_PER_SECOND, max_rate=product_scraper.REQUESTS_PER_SECOND)
+    with ThreadPoolExecutor(max_workers=api_workers) as api, \
+            ThreadPoolExecutor(max_workers=browsers.size) as pages:
+
+        def resolve(product_id):
+            """A future of (urls, source): the API answer, or the browser's if the API has none."""
+            resolved = Future()
+
+            def from_browser(future):
+                try:
+                    urls = future.result()
+                except Exception:
+                    urls = []
+                resolved.set_result((urls, "browser" if urls else None))
+
+            def from_api(future):
+                try:
+                    urls = future.result()
+                except Exception:
+                    urls = []
+                if urls:
+                    resolved.set_result((urls, "api"))
+                    return
+                try:
+                    fallback = pages.submit(resolve_from_browser, product_id, browsers, selectors, limit)
+                except RuntimeError:  # the consumer stopped early and the browser pool is shut down
+                    resolved.set_result(([], None))
+                    return
+                fallback.add_done_callback(from_browser)
+
+            api.submit(resolve_from_api, product_id, limit).add_done_callback(from_api)
+            return resolved
+
+        pending = deque((product_id, resolve(product_id)) for product_id in product_ids)
+        while pending:
+            product_id, resolved = pending.popleft()
+            urls, source = resolved.result()
+            yield product_id, urls, source
+
+
+class CompletedIndex:
+    """
+    Append-only file of product IDs whose images are saved, held in memory as a set.
+
+    Skip checks are set lookups instead of one directory glob per product. Each ID
+    is appended as one small write and flushed, so a crash can at most leave a
+    partial last line, which is dropped on load. When the file does not exist yet it
+    is built from a single listing of `folder`, using `product_of(file name)`.
+    """
+
+    def __init__(self, path, folder=None, product_of=None):
+        self.path = path
+        self.ids = set()
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            if data and not data.endswith(b"\n"):
+                data = data[:data.rfind(b"\n") + 1]
+                with open(path, "r+b") as f:
+                    f.truncate(len(data))
+            self.ids = {line.decode("utf-8") for line in data.split(b"\n") if line}
+        elif folder and product_of and os.path.isdir(folder):
+            self.ids = {product_of(name) for name in os.listdir(folder)
+                        if name.lower().endswith(IMAGE_EXTENSIONS)} - {None}
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write("".join(f"{product_id}\n" for product_id in sorted(self.ids)).encode("utf-8"))
+            os.replace(tmp, path)
+        self._file = open(path, "ab")
+
+    def __contains__(self, product_id):
+        return str(product_id) in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, product_id):
+        product_id = str(product_id)
+        if product_id in self.ids:
+            return
+        self._file.write(f"{product_id}\n".encode("utf-8"))
+        self._file.flush()
+        self.ids.add(product_id)
+
+    def close(self):
+        self._file.close()
+
+
+def fetch_product_images(product_ids, save_folder, selectors, limit, filename, store, shards=None,
+                         browsers=BROWSERS, chunk_size=CHUNK_SIZE, completed=None):
+    """
+    Resolves and downloads up to `limit` images per product into `save_folder`.
+
+    `filename(product_id, index, extension)` names each file. Resolved products are
+    downloaded in chunks while the API keeps resolving the rest. Every saved file is
+    added to `store` (and `shards` if given). A product is added to `completed` only
+    once all of its images are saved, so a partly failed product is retried next run.
+    Returns a Counter of outcomes.
+    """
+    counts = Counter()
+    progress = tqdm(total=len(product_ids), desc="Scraping Product Images")
+    with BrowserPool(browsers) as pool:
+        resolved = resolve_images(product_ids, pool, selectors, limit)
+        while True:
+            chunk = list(islice(resolved, chunk_size))
+            if not chunk:
+                break
+            jobs = []
+            remaining = {}  # product -> images still to save before it counts as complete
+            for product_id, urls, source in chunk:
+                counts[source or "not found"] += 1
+                if not urls:
+                    tqdm.write(f"  ❌ Could not find any images for product ID: {product_id}")
+                remaining[product_id] = len(urls)
+                for index, url in enumerate(urls):
+                    file_extension = os.path.splitext(url)[-1] or '.jpg'
+                    jobs.append((product_id, url, os.path.join(save_folder, filename(product_id, index, file_extension))))
+
+            for product_id, url, image_path, error in download_files(jobs, max_concurrency=DOWNLOAD_CONCURRENCY,
+                                                            max_per_host=DOWNLOAD_CONCURRENCY):
+                if error is not None:
+                    counts["failed downloads"] += 1
+                    remaining[product_id] = None  # retried on the next run
+                    tqdm.write(f"    ❌ Failed to download {url}: {error}")
+                    continue
+                # Shared images (placeholders, brand banners) are stored once; this name becomes a hard link
+                digest, _ = store.add(image_path)
+                if shards is not None:
+                    # Decode and resize once into the 224x224 training shards
+                    shards.add(os.path.splitext(os.path.basename(image_path))[0], image_path, digest)
+                counts["images"] += 1
+                if remaining[product_id] is not None:
+                    remaining[product_id] -= 1
+                    if remaining[product_id] == 0 and completed is not None:
+                        completed.add(product_id)
+            progress.update(len(chunk))
+    progress.close()
+    return counts
@@ -1,95 +1,75 @@
 import json
-import requests
-from bs4 import BeautifulSoup
 import os
-import time
-import glob
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.options import Options
+import sys
 
-def get_product_images(json_file_path, save_folder):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.image_shards import ShardWriter
+from common.image_store import ImageStore
+from image_resolver import BROWSERS, CompletedIndex, fetch_product_images
+
+# Main image on the product page, used only when the API has no images
+MAIN_IMAGE_SELECTORS = [
+    'img.w-full.rounded-large.overflow-hidden.inline-block',
+    'img.w-full.object-contain'
+]
+
+
+def main_image_product_id(file_name):
+    """"12345.jpg" -> "12345"; None for gallery files ("12345_0.jpg")."""
+    stem = os.path.splitext(file_name)[0]
+    return None if '_' in stem else stem
+
+
+def get_product_images(json_file_path, save_folder, store_folder='image_store', shards_folder=None,
+                       browsers=BROWSERS, completed_file='main_images_done.txt'):
     """
-    Checks if an image exists first. If not, uses Selenium to load the page,
-    scrapes the main image, and saves it.
+    Checks if an image exists first. If not, resolves the main image from the product
+    API (falling back to a pool of headless browsers for API misses) and saves it.
     """
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--window-size=1920,1080")
-    
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    print("Selenium WebDriver initialized.")
-    
     if not os.path.exists(save_folder):
         os.makedirs(save_folder)
         print(f"Created directory: {save_folder}")
+    store = ImageStore(store_folder)
 
     try:
         with open(json_file_path, 'r', encoding='utf-8') as f:
             products = json.load(f)
     except Exception as e:
         print(f"Error reading JSON file: {e}")
-        driver.quit()
         return
 
+    # Products with a "product_id.jpg" file, built from one folder listing on first use
+    completed = CompletedIndex(completed_file, save_folder, main_image_product_id)
+    product_ids = []
     for product in products:
-        try:
-            product_id = product.get('product_id')
-            if not product_id:
-                print("Skipping entry missing a 'product_id'.")
-                continue
-
-            search_pattern = os.path.join(save_folder, f"{product_id}.*")
-            
-            if glob.glob(search_pattern):
-                print(f"Image for product ID {product_id} already exists. Skipping.")
-                continue
-
-            url = f"https://www.digikala.com/product/dkp-{product_id}/"
-            print(f"Processing product ID: {product_id} at {url}")
+        product_id = product.get('product_id')
+        if not product_id:
+            print("Skipping entry missing a 'product_id'.")
+            continue
+        if product_id in completed:
+            continue
+        product_ids.append(product_id)
+    print(f"{len(products) - len(product_ids)} products already have an image; {len(product_ids)} to scrape.")
 
-            driver.get(url)
-            time.sleep(3) 
-            
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            
-            possible_selectors = [
-                'img.w-full.rounded-large.overflow-hidden.inline-block',
-                'img.w-full.object-contain'
-            ]
-
-            image_tag = None
-            for selector in possible_selectors:
-                image_tag = soup.select_one(selector)
-                if image_tag:
-                    break
-
-            if image_tag and image_tag.get('src'):
-                image_url = image_tag['src']
-                print(f"  Downloading image from: {image_url}")
-
-                image_response = requests.get(image_url)
-                image_response.raise_for_status()
-
-                file_extension = os.path.splitext(image_url.split('?')[0])[-1] or '.jpg'
-                image_path = os.path.join(save_folder, f"{product_id}{file_extension}")
-                
-                with open(image_path, 'wb') as f:
-                    f.write(image_response.content)
-                print(f"  Successfully saved image to {image_path}\n")
-            else:
-                print(f"  Could not find the main image for product ID: {product_id}\n")
-
-        except Exception as e:
-            print(f"  An unexpected error occurred for product ID {product_id}: {e}\n")
-
-    driver.quit()
-    print("WebDriver closed.")
+    shards = ShardWriter(shards_folder) if shards_folder else None
+    try:
+        counts = fetch_product_images(product_ids, save_folder, MAIN_IMAGE_SELECTORS, 1,
+                                      lambda product_id, index, ext: f"{product_id}{ext}",
+                                      store, shards, browsers, completed=completed)
+    finally:
+        completed.close()
+        if shards is not None:
+            shards.close()
+    print(f"Done: {counts['images']} images saved; products resolved via API: {counts['api']}, "
+          f"via browser: {counts['browser']}, not found: {counts['not found']}; "
+          f"failed downloads: {counts['failed downloads']}.")
 
 
 json_path = 'products.json'
 output_folder = 'product_images'
+store_folder = 'image_store'  # content-addressed copies; files in output_folder are hard links into it
+shards_folder = None  # e.g. 'shards': also pack 224x224 copies into tar shards for training (needs Pillow)
+browsers = BROWSERS   # headless Chrome instances for products the API cannot resolve
+completed_file = 'main_images_done.txt'  # IDs of finished products, appended as they complete
 
-get_product_images(json_path, output_folder)
+get_product_images(json_path, output_folder, store_folder, shards_folder, browsers, completed_file)
@@ -1,38 +1,32 @@
 import json
-import requests
-from bs4 import BeautifulSoup
 import os
-import time
-import glob
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.options import Options
-from tqdm import tqdm
+import sys
 
-def get_product_images(json_file_path, save_folder):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.image_shards import ShardWriter
+from common.image_store import ImageStore
+from image_resolver import BROWSERS, CompletedIndex, fetch_product_images
+
+# Gallery thumbnails on the product page, used only when the API has no images
+GALLERY_SELECTORS = ['div[data-cro-id="pdp-album-open"] img']
+
+
+def gallery_product_id(file_name):
+    """"12345_0.jpg" -> "12345"; None for files this script does not write."""
+    stem = os.path.splitext(file_name)[0]
+    return stem.rsplit('_', 1)[0] if '_' in stem else None
+
+
+def get_product_images(json_file_path, save_folder, store_folder='image_store', shards_folder=None,
+                       browsers=BROWSERS, completed_file='gallery_images_done.txt'):
     """
-    Uses Selenium to load a product page, scrapes up to three gallery
-    images using the thumbnail selector, and saves them.
+    Resolves up to three gallery images per product from the product API (falling
+    back to a pool of headless browsers for API misses) and saves them.
     """
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--window-size=1920,1080")
-    
-    # Prevents the "DevTools listening on..." message
-    chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])
-    
-    try:
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        print("✅ Selenium WebDriver initialized.")
-    except Exception as e:
-        print(f"❌ Failed to initialize WebDriver: {e}")
-        return
-
     if not os.path.exists(save_folder):
         os.makedirs(save_folder)
         print(f"Created directory: {save_folder}")
+    store = ImageStore(store_folder)
 
     try:
         with open(json_file_path, 'r', encoding='utf-8') as f:
@@ -41,71 +35,40 @@ def get_product_images(json_file_path, save_folder):
         products.sort(key=lambda p: int(p.get('product_id', 0)))
     except Exception as e:
         print(f"❌ Error reading or sorting JSON file: {e}")
-        driver.quit()
         return
 
-    for product in tqdm(products, desc="Scraping Product Images"):
-        try:
-            product_id = product.get('product_id')
-            if not product_id:
-                tqdm.write("Skipping entry missing 'product_id'.")
-                continue
-
-            # Checks for files like "product_id_0.jpg" to see if we've processed it.
-            search_pattern = os.path.join(save_folder, f"{product_id}_*")
-            if glob.glob(search_pattern):
-                tqdm.write(f"🖼️ Images for product ID {product_id} already exist. Skipping.")
-                continue
-
-            url = f"https://www.digikala.com/product/dkp-{product_id}/"
-            
-            tqdm.write(f"Processing product ID: {product_id}")
-
-            driver.get(url)
-            
-            time.sleep(4) 
-            
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            
-            # This now targets the img tag inside the specific thumbnail divs.
-            image_tags = soup.select('div[data-cro-id="pdp-album-open"] img')
-            
-            if image_tags:
-                tqdm.write(f"  Found {len(image_tags)} thumbnail images for {product_id}. Downloading up to 3...")
-                
-                # Loop through the first 3 images found.
-                for index, image_tag in enumerate(image_tags[:3]):
-                    if image_tag.get('src'):
-                        image_url = image_tag['src'].split('?')[0] # Clean URL
-                        tqdm.write(f"    Downloading image {index + 1} from: {image_url}")
-
-                        try:
-                            image_response = requests.get(image_url, timeout=10)
-                            image_response.raise_for_status()
-
-                            file_extension = os.path.splitext(image_url)[-1] or '.jpg'
-                            
-                            # Append an index to each filename (e.g., "12345_0.jpg")
-                            image_path = os.path.join(save_folder, f"{product_id}_{index}{file_extension}")
-                            
-                            with open(image_path, 'wb') as f:
-                                f.write(image_response.content)
-                            tqdm.write(f"    ✅ Successfully saved image to {image_path}")
-
-                        except requests.exceptions.RequestException as req_err:
-                             tqdm.write(f"    ❌ Failed to download image {index + 1}: {req_err}")
-
-            else:
-                tqdm.write(f"  ❌ Could not find any thumbnail images for product ID: {product_id}")
-
-        except Exception as e:
-            tqdm.write(f"  ❌ An unexpected error occurred for product ID {product_id}: {e}")
-
-    driver.quit()
-    print("👍 WebDriver closed. Process complete.")
+    # Products with a "product_id_N.jpg" file, built from one folder listing on first use
+    completed = CompletedIndex(completed_file, save_folder, gallery_product_id)
+    product_ids = []
+    for product in products:
+        product_id = product.get('product_id')
+        if not product_id:
+            print("Skipping entry missing 'product_id'.")
+            continue
+        if product_id in completed:
+            continue
+        product_ids.append(product_id)
+    print(f"🖼️ {len(products) - len(product_ids)} products already have images; {len(product_ids)} to scrape.")
+
+    shards = ShardWriter(shards_folder) if shards_folder else None
+    try:
+        counts = fetch_product_images(product_ids, save_folder, GALLERY_SELECTORS, 3,
+                                      lambda product_id, index, ext: f"{product_id}_{index}{ext}",
+                                      store, shards, browsers, completed=completed)
+    finally:
+        completed.close()
+        if shards is not None:
+            shards.close()
+    print(f"👍 Process complete: {counts['images']} images saved; products resolved via API: {counts['api']}, "
+          f"via browser: {counts['browser']}, not found: {counts['not found']}; "
+          f"failed downloads: {counts['failed downloads']}.")
 
 
 json_path = 'products.json'
 output_folder = 'product_images'
+store_folder = 'image_store'  # content-addressed copies; files in output_folder are hard links into it
+shards_folder = None  # e.g. 'shards': also pack 224x224 copies into tar shards for training (needs Pillow)
+browsers = BROWSERS   # headless Chrome instances for products the API cannot resolve
+completed_file = 'gallery_images_done.txt'  # IDs of finished products, appended as they complete
 
-get_product_images(json_path, output_folder)
+get_product_images(json_path, output_folder, store_folder, shards_folder, browsers, completed_file)
@@ -1,12 +1,16 @@
 import os
 import sys
 import subprocess
-import urllib.parse
 from tqdm import tqdm
 import json
 import time
 from API import ApiClient
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.canonical import canonicalize, resolve_redirects
+from common.http_cache import make_cached_session
+from common.mediawiki_api import MediaWikiClient, title_from_url
+
 # Try to import wikipedia, install if missing
 try:
     import wikipedia
@@ -38,40 +42,81 @@ INPUT_FILE = f"./part_5to7.txt"
 OUTPUT_FILE = "./Dataset/part_5to7.json"
 DATASET_DIR = "./Dataset/Dataset_part_5to7"
 
+WIKI_API_URL = "https://fa.wikipedia.org/w/api.php"
+CACHE_MAX_AGE = 7 * 24 * 3600  # article text rarely changes between classification runs
+RESOLVE_REDIRECTS = False  # also merge redirect pages into their targets (one API call per 50 urls)
+
 os.makedirs(DATASET_DIR, exist_ok=True)
+SESSION = make_cached_session(max_age=CACHE_MAX_AGE)
 
 # ---------------------------
 # Helper functions
 # ---------------------------
-def load_existing():
-    if os.path.exists(OUTPUT_FILE):
+def load_stored_results():
+    """
+    Entries of OUTPUT_FILE with their urls rewritten to canonical form, one per url.
+    Older files may hold raw or percent-encoded urls; a url stored in several forms
+    keeps the last decided (non-null) answer.
+    """
+    if not os.path.exists(OUTPUT_FILE):
+        return []
+    try:
         with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
-            return {r["url"]: r["is_related"] for r in json.load(f)}
-    return {}
+            stored = json.load(f)
+    except (json.JSONDecodeError, ValueError):
+        return []  # Corrupted file; start fresh
+
+    merged = {}
+    for r in stored:
+        url = canonicalize(r["url"])
+        if url not in merged or r.get("is_related") is not None:
+            merged[url] = dict(r, url=url)
+    return list(merged.values())
+
+def load_existing():
+    return {r["url"]: r["is_related"] for r in load_stored_results()}
 
 def save_results(new_results):
-    existing_results = []
-    if os.path.exists(OUTPUT_FILE):
-        try:
-            with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
-                existing_results = json.load(f)
-        except (json.JSONDecodeError, ValueError):
-            pass  # Corrupted file; start fresh
+    existing_results = load_stored_results()
 
     # Merge: Update or append new_results (assuming new_results is full list)
     url_to_idx = {r["url"]: i for i, r in enumerate(existing_results)}
     for nr in new_results:
+        nr = dict(nr, url=canonicalize(nr["url"]))
         if nr["url"] in url_to_idx:
             existing_results[url_to_idx[nr["url"]]] = nr  # Update
         else:
+            url_to_idx[nr["url"]] = len(existing_results)
             existing_results.append(nr)  # Append
 
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
         json.dump(existing_results, f, ensure_ascii=False, indent=2)
 
+def fetch_page_extract(title: str) -> str:
+    """Fetch the plain-text extract of a page through the shared HTTP cache."""
+    params = {
+        "action": "query",
+        "prop": "extracts",
+        "explaintext": 1,
+        "redirects": 1,
+        "format": "json",
+        "formatversion": 2,
+        "titles": title,
+    }
+    try:
+        resp = SESSION.get(WIKI_API_URL, params=params, timeout=15)
+        resp.raise_for_status()
+        pages = resp.json().get("query", {}).get("pages", [])
+    except Exception:
+        return ""
+    for page in pages:
+        if page.get("extract"):
+            return page["extract"]
+    return ""
+
 def fetch_wikipedia_content(url: str) -> str:
     """Try to extract and fetch page content from a Farsi Wikipedia URL."""
-    page_title = urllib.parse.unquote(url.split("/wiki/")[1].replace("_", " "))
+    page_title = title_from_url(url)
     page_title_clean = page_title.replace(" (شاهنشاه هخامنشی)", "")
     search_queries = [
         page_title,
@@ -83,12 +128,20 @@ def fetch_wikipedia_content(url: str) -> str:
         ),
     ]
 
+    # Exact title first: served from the cache on reruns, no search round trip
+    content = fetch_page_extract(page_title)
+    if content:
+        return content
+
     wikipedia.set_lang("fa")
     for query in search_queries:
         try:
             wikipedia.set_lang("fa")
             results = wikipedia.search(query)
             if results:
+                content = fetch_page_extract(results[0])
+                if content:
+                    return content
                 page = wikipedia.page(results[0])
                 return page.content
         except Exception:
@@ -141,14 +194,11 @@ def main():
     with open(INPUT_FILE, "r", encoding="utf-8") as f:
         urls = [line.strip() for line in f if line.strip()]
 
-    # Deduplicate while preserving order
-    seen = set()
-    unique_urls = []
-    for u in urls:
-        if u not in seen:
-            seen.add(u)
-            unique_urls.append(u)
-    urls = unique_urls
+    # Deduplicate by canonical url while preserving order
+    urls = list(dict.fromkeys(canonicalize(u) for u in urls))
+    if RESOLVE_REDIRECTS:
+        targets = resolve_redirects(urls, MediaWikiClient(api_url=WIKI_API_URL, session=SESSION))
+        urls = list(dict.fromkeys(targets[u] for u in urls))
 
     results = [{"url": url, "is_related": processed.get(url, None)} for url in urls]
 
@@ -192,6 +242,7 @@ def main():
             pbar.update(1)
 
     save_results(results)
+    print(f"HTTP cache: {SESSION.cache.stats()}")
 
 
 if __name__ == "__main__":
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 """
-Iranian-wars Wikipedia crawler — writes every unique link to a file immediately.
+Iranian-wars Wikipedia crawler — writes every unique link to a file as it is discovered.
 
 Usage:
     python crawler.py
@@ -8,15 +8,32 @@ Usage:
 Features:
 - START_URLS: add your initial pages here
 - MAX_DEPTH: how deep to follow links (0 = only the start pages)
-- OUTPUT_FILE: each unique url is appended immediately as discovered
-- Safe to stop/restart: existing links are loaded from OUTPUT_FILE on start
+- OUTPUT_FILE: each unique url is appended as discovered (written in batches)
+- FRONTIER_FILE: pending pages and their depth, checkpointed in SQLite
+- Every url is canonicalized (encoding, ZWNJ, ي/ی, mirrors) before dedup
+- VISITED_FILE: memory-mapped 64-bit URL-hash table, so RSS stays flat
+- Safe to stop/restart: visited links persist in VISITED_FILE and the
+  crawl resumes from FRONTIER_FILE without re-expanding finished pages
+- NUM_WORKERS > 1: hash-sharded crawl across worker processes that share
+  SHARD_STORE (global dedup, per-host politeness across all workers)
+- Pages are kept in the shared on-disk HTTP cache, so reruns only revalidate them
+- Requests are paced by an adaptive per-host limiter that honours Retry-After
+  and maxlag instead of a fixed delay
 """
 
-import requests
 from bs4 import BeautifulSoup
-from collections import deque
-import time
 import os
+import sys
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.canonical import canonicalize, resolve_redirects
+from common.frontier import Frontier
+from common.http_cache import make_cached_session
+from common.visited import UrlHashSet
+from common.mediawiki_api import MAX_TITLES, MediaWikiClient
+from common.rate_limiter import get_limiter
+from common.shard_crawl import run_sharded
 
 # -------------------------
 # CONFIG
@@ -29,7 +46,7 @@ START_URLS = [
     f'https://fa.wikipedia.org/wiki/رده:معاهده%E2%80%8Cهای_ایران',
     f'https://fa.wikipedia.org/wiki/رده:ائتلاف%E2%80%8Cهای_نظامی_ایران',
     f'https://fa.wikipedia.org/wiki/رده:پیمان%E2%80%8Cنامه%E2%80%8Cهای_شاهنشاهی_ساسانی',
-    f'https://fa.wikipedia.org/wiki/رده:پیمان%E2%80%8Cهای_شاهنشahi_اشکانیان',
+    f'https://fa.wikipedia.org/wiki/رده:پیمان%E2%80%8Cهای_شاهنشاهی_اشکانیان',
     f'https://fa.wikipedia.org/wiki/رده:معاهده%E2%80%8Cهای_افشاریان',
     f'https://fa.wikipedia.org/wiki/رده:معاهده%E2%80%8Cهای_دودمان_پهلوی',
     f'https://fa.wikipedia.org/wiki/رده:معاهده%E2%80%8Cهای_سلسله_قاجاریان',
@@ -58,29 +75,64 @@ print(START_URLS[:5])  # preview first 5
 # =============================================
 
 OUTPUT_FILE = "links_v2.txt"
+FRONTIER_FILE = "frontier_v2.sqlite"
+VISITED_FILE = "visited_v2.bin"
+COMMIT_EVERY = 500  # frontier updates per group commit (and output-file flush)
 MAX_DEPTH = 1
-REQUEST_DELAY = 0.5  # seconds between requests
+LINK_BACKEND = "html"  # "html" parses each rendered page, "api" asks the MediaWiki API for 50 pages at once
+RESOLVE_REDIRECTS = False  # map discovered links to their redirect targets (one API call per 50 links)
+
+# Sharded mode (NUM_WORKERS > 1) keeps its own state under SHARD_STATE_DIR
+NUM_WORKERS = 1
+SHARD_STORE = "crawl_shared_v2.sqlite"  # put on shared storage to add workers from other machines
+SHARD_STATE_DIR = "crawl_shards_v2"
+LOCAL_SHARDS = None  # shard ids to run on this machine, e.g. range(0, 4); None = all
 HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; IranWarsCrawler/1.0)"}
+CACHE_MAX_AGE = 24 * 3600  # seconds a cached page is reused before revalidating
+REQUESTS_PER_SECOND = 10  # Hard cap per process on fa.wikipedia.org; the adaptive limiter only backs off below it
+
+_session = None
+_session_pid = None
+
+def get_session():
+    """
+    This process's cached session. Created on first use rather than at import, so
+    sharded workers each open their own SQLite cache connection instead of
+    inheriting the parent's across fork.
+    """
+    global _session, _session_pid, _api_client
+    if _session is None or _session_pid != os.getpid():
+        _session = make_cached_session(max_age=CACHE_MAX_AGE)
+        _session_pid = os.getpid()
+        get_limiter(urlsplit(BASE_URL).netloc, rate=REQUESTS_PER_SECOND, max_rate=REQUESTS_PER_SECOND)
+        _api_client = None
+    return _session
 
 # -------------------------
 # Helpers
 # -------------------------
-def load_existing_links(path):
-    """Load already-saved links from OUTPUT_FILE into a set."""
-    if not os.path.exists(path):
-        return set()
-    with open(path, "r", encoding="utf-8") as f:
-        return set(line.strip() for line in f if line.strip())
+def load_existing_links(path, visited_path):
+    """Open the on-disk visited set, seeding it from OUTPUT_FILE the first time."""
+    visited = UrlHashSet(visited_path)
+    if len(visited) == 0 and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    visited.add(canonicalize(line.strip()))
+    return visited
 
-def append_link_to_file(path, url):
-    """Append a single url to the output file and flush."""
+def append_links_to_file(path, urls):
+    """Append a batch of urls to the output file in one write, synced to disk."""
+    if not urls:
+        return
     with open(path, "a", encoding="utf-8") as f:
-        f.write(url.rstrip() + "\n")
-        f.flush()  # ensure it's written to disk right away
+        f.write("".join(url.rstrip() + "\n" for url in urls))
+        f.flush()
+        os.fsync(f.fileno())
 
 def normalize_and_filter_href(href):
     """
-    Normalize hrefs encountered in pages to absolute URLs.
+    Normalize hrefs encountered in pages to absolute, canonical URLs.
     Returns None if href should be skipped (files, categories, anchors, etc).
     """
     if not href:
@@ -106,17 +158,16 @@ def normalize_and_filter_href(href):
 
     # if href is already absolute, return it; else prefix with BASE_URL
     if href.startswith("http://") or href.startswith("https://"):
-        # remove fragments
-        return href.split("#", 1)[0]
+        return canonicalize(href)
     elif href.startswith("/wiki/"):
-        return BASE_URL + href.split("#", 1)[0]
+        return canonicalize(BASE_URL + href)
     else:
         return None
 
 def get_links_from_url(url):
     """Fetch a page and return all normalized internal wiki links (set)."""
     try:
-        r = requests.get(url, headers=HEADERS, timeout=15)
+        r = get_session().get(url, headers=HEADERS, timeout=15)
         r.raise_for_status()
     except Exception as e:
         print(f"[WARN] Failed to fetch {url}: {e}")
@@ -130,43 +181,121 @@ def get_links_from_url(url):
             found.add(normalized)
     return found
 
+def get_links_from_urls_api(client, urls):
+    """Fetch the article links of many pages via the MediaWiki API (MAX_TITLES per request)."""
+    try:
+        return client.links_for_urls(urls)
+    except Exception as e:
+        print(f"[WARN] API batch failed for {len(urls)} pages: {e}")
+        return {url: set() for url in urls}
+
+_api_client = None
+
+def get_api_client():
+    global _api_client
+    session = get_session()
+    if _api_client is None:
+        _api_client = MediaWikiClient(session=session)
+    return _api_client
+
+def resolve_found_redirects(found):
+    """Replace every discovered link with its redirect target, batching the API lookups."""
+    all_links = {link for links in found.values() for link in links}
+    try:
+        targets = resolve_redirects(all_links, get_api_client())
+    except Exception as e:
+        print(f"[WARN] Redirect resolution failed: {e}")
+        return found
+    return {url: {targets.get(link, link) for link in links} for url, links in found.items()}
+
+def report_cache_stats(shard):
+    """Run by each sharded worker when it finishes: its own cache hits and misses."""
+    if _session is not None and _session_pid == os.getpid():
+        print(f"[shard {shard}] HTTP cache: {_session.cache.stats()}")
+
+def fetch_links_batch(urls):
+    """Canonical links of a batch of pages using the configured LINK_BACKEND."""
+    if LINK_BACKEND == "api":
+        found = get_links_from_urls_api(get_api_client(), urls)
+        found = {url: {canonicalize(link) for link in links} for url, links in found.items()}
+    else:
+        found = {url: get_links_from_url(url) for url in urls}
+    if RESOLVE_REDIRECTS:
+        found = resolve_found_redirects(found)
+    return found
+
 # -------------------------
 # Main crawling loop
 # -------------------------
 def main():
-    visited = load_existing_links(OUTPUT_FILE)
-    print(f"[INFO] Loaded {len(visited)} existing links from {OUTPUT_FILE!r}")
-
-    q = deque()
-    # seed queue with start urls (depth 0)
-    for s in START_URLS:
-        if s not in visited:
-            visited.add(s)
-            append_link_to_file(OUTPUT_FILE, s)
+    batch_size = MAX_TITLES if LINK_BACKEND == "api" else 1
+
+    if NUM_WORKERS > 1:
+        print(f"[INFO] Sharded crawl with {NUM_WORKERS} workers, store {SHARD_STORE!r}")
+        run_sharded([canonicalize(s) for s in START_URLS], fetch_links_batch, NUM_WORKERS, SHARD_STORE, SHARD_STATE_DIR,
+                    OUTPUT_FILE, MAX_DEPTH, batch_size=batch_size,
+                    local_shards=LOCAL_SHARDS, on_finish=report_cache_stats)
+        print(f"\n[DONE] Sharded crawl finished. All discovered urls are in: {OUTPUT_FILE}")
+        return
+
+    visited = load_existing_links(OUTPUT_FILE, VISITED_FILE)
+    print(f"[INFO] Loaded {len(visited)} existing links from {VISITED_FILE!r}")
+
+    frontier = Frontier(FRONTIER_FILE, batch_size=COMMIT_EVERY)
+    new_links = {}  # discovered since the last group commit, in discovery order
+
+    def is_new(link):
+        return link not in new_links and link not in visited
+
+    def before_commit():
+        # new links are on disk before their pages are marked done, so a crash
+        # can only repeat lines in OUTPUT_FILE (deduped on load), never lose them
+        append_links_to_file(OUTPUT_FILE, new_links)
+
+    def on_commit():
+        # VISITED_FILE only after the commit: a link whose frontier push was lost
+        # in a crash is rediscovered as new when its page is re-expanded
+        for link in new_links:
+            visited.add(link)
+        new_links.clear()
+
+    frontier.before_commit = before_commit
+    frontier.on_commit = on_commit
+
+    # seed frontier with start urls (depth 0); already-expanded ones stay done
+    for s in dict.fromkeys(canonicalize(s) for s in START_URLS):
+        if is_new(s):
+            new_links[s] = None
             print(f"[ADD start] {s}")
-        q.append((s, 0))
-
-    while q:
-        url, depth = q.popleft()
-        # if we've reached the max depth, don't expand this node
-        if depth >= MAX_DEPTH:
-            continue
-
-        print(f"[CRAWL depth={depth}] {url}")
-        links = get_links_from_url(url)
-        time.sleep(REQUEST_DELAY)
-
-        for link in links:
-            if link not in visited:
-                visited.add(link)
-                append_link_to_file(OUTPUT_FILE, link)
-                print(f"  [NEW depth={depth+1}] {link}")
-                # enqueue for further crawling if we haven't reached next depth
-                if depth + 1 < MAX_DEPTH:
-                    q.append((link, depth + 1))
+        frontier.push(s, 0)
+    print(f"[INFO] {frontier.pending()} pages pending in {FRONTIER_FILE!r}")
+
+    while True:
+        # if we've reached the max depth, don't expand the node
+        batch = frontier.pop_batch(batch_size, max_depth=MAX_DEPTH)
+        if not batch:
+            break
+
+        # The session paces requests with the shared adaptive limiter (common/rate_limiter.py)
+        found = fetch_links_batch([url for url, _ in batch])
+
+        for url, depth in batch:
+            print(f"[CRAWL depth={depth}] {url}")
+            for link in found.get(url, set()):
+                if is_new(link):
+                    new_links[link] = None
+                    print(f"  [NEW depth={depth+1}] {link}")
+                    # enqueue for further crawling if we haven't reached next depth
+                    if depth + 1 < MAX_DEPTH:
+                        frontier.push(link, depth + 1)
+            frontier.mark_done(url)
+
+    frontier.close()
+    visited.close()
 
     print(f"\n[DONE] Crawling finished. Total unique links: {len(visited)}")
     print(f"All discovered urls are in: {OUTPUT_FILE}")
+    print(f"[INFO] HTTP cache: {get_session().cache.stats()}")
 
 if __name__ == "__main__":
     main()
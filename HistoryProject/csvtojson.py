@@ -1,9 +1,9 @@
-import pandas as pd
+import os
+import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.csv_to_json import convert_csv
 
-df = pd.read_csv("./Pairs/Texts.csv")
 
-df = df[["id", "text"]]
-df = df.rename(columns={"text": "summary"})
-
-df.to_json("./Pairs/Texts.json", orient="records", force_ascii=False, indent=4)
+convert_csv("./Pairs/Texts.csv", "./Pairs/Texts.json", columns=["id", "text"], rename={"text": "summary"},
+            typed=True, indent=4)
@@ -1,40 +1,172 @@
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
 import requests
-from typing import List
 
-def get_sub_categories(slug: str) -> List[str]:
-    """Fetches sub-categories for a given category slug."""
-    url = f"https://api.digikala.com/v1/categories/{slug}/"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.rate_limiter import ThrottledAdapter, get_limiter
+
+# --- Configuration ---
+API_BASE = "https://api.digikala.com"
+# Parent/child edges plus validators of every category listing; next to this script, where
+# DigikalaProject/product_scraper.py (HARVEST_MODE = "categories") looks for it
+SNAPSHOT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "category_tree.json")
+WORKERS = 16                # category requests in flight
+REQUESTS_PER_SECOND = 30    # hard cap on API requests; backs off further on 429/503
+MAX_AGE = 6 * 3600          # seconds a snapshot entry is trusted without asking the server again
+
+
+def make_category_session(workers=WORKERS):
+    """Keep-alive session shared by the crawler threads, paced by the API's rate limiter."""
+    session = requests.Session()
+    adapter = ThrottledAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_sub_categories(slug: str, session=None, cached: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Fetches sub-categories for a given category slug.
+
+    With a `cached` snapshot entry the request is conditional (If-None-Match /
+    If-Modified-Since); a 304 returns the cached entry unchanged. Returns the
+    entry dict (children, validators, digest) or None on errors.
+    """
+    url = f"{API_BASE}/v1/categories/{slug}/"
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
     try:
-        response = requests.get(url)
+        response = (session or requests).get(url, headers=headers, timeout=15)
+        if response.status_code == 304 and cached:
+            return dict(cached, fetched_at=time.time())
         response.raise_for_status()
         data = response.json()
-        # Assume the structure is data['data']['category']['child_categories'] 
+        # Assume the structure is data['data']['category']['child_categories']
         # Each child is a dict with 'code' or 'slug', or extract from 'url'['uri']
         # Adjust based on actual structure; here assuming 'child_categories' is list of dicts with 'code' as slug
         child_categories = data.get('data', {}).get('category', {}).get('child_categories', [])
         sub_slugs = [child['code'] for child in child_categories if 'code' in child]
-        return sub_slugs
+        return {
+            "children": sub_slugs,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            # Digest of the listing body, to tell real changes from re-sent identical listings
+            "digest": hashlib.sha256(response.content).hexdigest(),
+            "fetched_at": time.time(),
+        }
     except requests.exceptions.RequestException as e:
         print(f"Error fetching categories for {slug}: {e}")
-        return []
-    except KeyError:
+        return None
+    except (KeyError, TypeError, ValueError):
         print(f"Unexpected JSON structure for {slug}")
-        return []
+        return None
+
+
+def load_snapshot(path: str = SNAPSHOT_FILE) -> Dict:
+    if not os.path.exists(path):
+        return {"roots": [], "categories": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_snapshot(snapshot: Dict, path: str = SNAPSHOT_FILE):
+    """Writes the snapshot atomically (temp file + rename)."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
 
 
-def get_all_categories(main_slugs: List[str]) -> List[str]:
-    """Recursively gets all category slugs starting from main slugs."""
-    all_slugs = []
-    to_process = main_slugs[:]
-    
-    while to_process:
-        current = to_process.pop(0)
-        if current not in all_slugs:
-            all_slugs.append(current)
-            sub_slugs = get_sub_categories(current)
-            to_process.extend(sub_slugs)
-    
-    return all_slugs
+def crawl_category_tree(main_slugs: List[str], snapshot: Optional[Dict] = None, workers: int = WORKERS,
+                        max_age: float = MAX_AGE) -> Dict:
+    """
+    Walks the category tree breadth-first with `workers` concurrent requests.
+
+    Categories fetched within `max_age` seconds are reused from `snapshot` without a
+    request; older ones are revalidated conditionally, so only listings that changed
+    are downloaded and parsed again. Returns the new snapshot:
+        {"roots", "crawled_at", "order", "changed",
+         "categories": {slug: {"parents", "children", "etag", "last_modified", "digest", "fetched_at", "changed_at"}}}
+    """
+    previous = (snapshot or {}).get("categories", {})
+    session = make_category_session(workers)
+    get_limiter(urlsplit(API_BASE).netloc, rate=REQUESTS_PER_SECOND, max_rate=REQUESTS_PER_SECOND)
+
+    categories = {}
+    order = []
+    changed = []
+    seen = set(main_slugs)
+    frontier = deque(dict.fromkeys(main_slugs))
+    parents = {slug: [] for slug in main_slugs}
+    now = time.time()
+
+    def visit(slug, entry):
+        order.append(slug)
+        entry["parents"] = parents[slug]
+        categories[slug] = entry
+        for child in entry["children"]:
+            parents.setdefault(child, [])
+            if slug not in parents[child]:
+                parents[child].append(slug)
+            if child not in seen:
+                seen.add(child)
+                frontier.append(child)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        while frontier or pending:
+            while frontier and len(pending) < workers * 2:
+                slug = frontier.popleft()
+                cached = previous.get(slug)
+                if cached and now - cached.get("fetched_at", 0) < max_age:
+                    visit(slug, dict(cached))
+                    continue
+                pending[executor.submit(get_sub_categories, slug, session, cached)] = slug
+            if not pending:
+                continue
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                slug = pending.pop(future)
+                cached = previous.get(slug)
+                entry = future.result()
+                if entry is None:
+                    if not cached:
+                        continue
+                    entry = dict(cached)  # keep the last known subtree rather than losing it
+                elif not cached or entry.get("digest") != cached.get("digest"):
+                    entry["changed_at"] = entry["fetched_at"]
+                    changed.append(slug)
+                else:
+                    entry["changed_at"] = cached.get("changed_at", entry["fetched_at"])
+                visit(slug, entry)
+
+    return {
+        "roots": list(main_slugs),
+        "crawled_at": time.time(),
+        "order": order,
+        "changed": changed,
+        "categories": categories,
+    }
+
+
+def get_all_categories(main_slugs: List[str], snapshot_file: str = SNAPSHOT_FILE) -> List[str]:
+    """Gets all category slugs starting from main slugs, refreshing the snapshot on disk."""
+    snapshot = crawl_category_tree(main_slugs, load_snapshot(snapshot_file))
+    save_snapshot(snapshot, snapshot_file)
+    print(f"[INFO] {len(snapshot['order'])} categories, {len(snapshot['changed'])} new or changed since the last run.")
+    return snapshot["order"]
 
 
 # List of main category slugs (compiled from sources)
@@ -53,12 +185,18 @@ main_slugs = [
     "dk-ds-gift-card"
 ]
 
-# Get all categories
-all_categories = get_all_categories(main_slugs)
 
-# Print the list
-print("All available category slugs:")
-for slug in all_categories:
-    print(slug)
+def main():
+    # Get all categories
+    all_categories = get_all_categories(main_slugs)
+
+    # Print the list
+    print("All available category slugs:")
+    for slug in all_categories:
+        print(slug)
+
+    # Now you can use these slugs to fetch products, e.g., https://api.digikala.com/v1/categories/{slug}/search/?page={page}
+
 
-# Now you can use these slugs to fetch products, e.g., https://api.digikala.com/v1/categories/{slug}/search/?page={page}
\ No newline at end of file
+if __name__ == "__main__":
+    main()
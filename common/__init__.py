@@ -0,0 +1 @@
+"""Helpers shared by the crawling and scraping scripts in this repository."""
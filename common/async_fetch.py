@@ -0,0 +1,126 @@
+"""
+Concurrent page fetcher for the Wikipedia crawlers.
+
+Pages are downloaded on a background asyncio loop with a bounded number of
+in-flight requests per host. Sessions from make_session() pace every request
+through the host's shared adaptive limiter (common/rate_limiter.py), which
+backs off on 429/503/maxlag and ramps up while the server is healthy.
+Results are handed back in the same order as the input URLs, so the
+scripts that consume them produce deterministic output.
+
+Usage:
+    for url, html, error in fetch_pages(urls, max_per_host=4, requests_per_second=10):
+        ...
+"""
+
+import asyncio
+import queue
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlsplit
+
+import requests
+
+from common.rate_limiter import DEFAULT_RATE, ThrottledAdapter, get_limiter
+
+HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; IranWarsCrawler/1.0)"}
+
+
+def make_session(pool_size=16, session=None):
+    """Configures (or creates) a keep-alive, rate-limited session whose pool fits `pool_size` parallel requests."""
+    if session is None:
+        session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = ThrottledAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+async def _fetch_one(idx, url, session, executor, host_slots, timeout, out):
+    loop = asyncio.get_running_loop()
+    async with host_slots[urlsplit(url).netloc]:
+        try:
+            resp = await loop.run_in_executor(executor, partial(session.get, url, timeout=timeout))
+            resp.raise_for_status()
+            resp.encoding = 'utf-8'
+            out.put((idx, (url, resp.text, None)))
+        except Exception as e:
+            out.put((idx, (url, None, e)))
+
+
+async def _fetch_into(urls, out, window, stop, session, max_per_host, timeout):
+    host_slots = defaultdict(lambda: asyncio.Semaphore(max_per_host))
+    hosts = len({urlsplit(u).netloc for u in urls}) or 1
+    tasks = []
+    with ThreadPoolExecutor(max_workers=max_per_host * hosts + 1) as executor:
+        for idx, url in enumerate(urls):
+            # Never run more than `window` pages ahead of the consumer
+            await asyncio.to_thread(window.acquire)
+            if stop.is_set():
+                break
+            tasks.append(asyncio.create_task(
+                _fetch_one(idx, url, session, executor, host_slots, timeout, out)
+            ))
+        await asyncio.gather(*tasks)
+
+
+def fetch_pages(urls, max_per_host=4, requests_per_second=10, window=64, session=None, timeout=15):
+    """
+    Fetches `urls` concurrently and yields (url, html, error) tuples in input order.
+
+    Args:
+        urls (list): Absolute URLs to download.
+        max_per_host (int): Maximum number of requests in flight to a single host.
+        requests_per_second (float): Hard ceiling on each host's request rate; the adaptive
+            limiter starts there and only backs off below it on 429/503/maxlag.
+        window (int): How many pages may be fetched ahead of the consumer.
+        session (requests.Session): Optional session to reuse (e.g. a cached one).
+        timeout (float): Per-request timeout in seconds.
+
+    Yields:
+        tuple: (url, html, error) where exactly one of html/error is None.
+    """
+    urls = list(urls)
+    if not urls:
+        return
+    if session is None:
+        session = make_session(pool_size=max_per_host * 4)
+    for host in {urlsplit(u).netloc for u in urls}:
+        rate = requests_per_second or DEFAULT_RATE
+        get_limiter(host, rate, max_rate=rate)
+
+    out = queue.Queue()
+    window_slots = threading.Semaphore(window)
+    stop = threading.Event()
+
+    def run():
+        try:
+            asyncio.run(_fetch_into(urls, out, window_slots, stop, session, max_per_host, timeout))
+        except Exception as e:
+            # Make sure the consumer never waits forever on a crashed loop
+            for idx, url in enumerate(urls):
+                out.put((idx, (url, None, e)))
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+
+    ready = {}
+    try:
+        for next_idx in range(len(urls)):
+            while next_idx not in ready:
+                idx, item = out.get()
+                ready.setdefault(idx, item)
+            yield ready.pop(next_idx)
+            window_slots.release()
+    finally:
+        stop.set()
+        for _ in range(window):
+            window_slots.release()
+
+
+def fetch_all(urls, **kwargs):
+    """Fetches every URL and returns the list of (url, html, error) tuples in input order."""
+    return list(fetch_pages(urls, **kwargs))
@@ -0,0 +1,109 @@
+"""
+URL canonicalization for Wikipedia links.
+
+The same article shows up under many spellings: raw Unicode vs
+percent-encoded paths, underscores vs spaces, Arabic vs Persian letter
+variants (ي/ی, ك/ک), stray ZWJ / doubled ZWNJ, /w/index.php?title=...,
+the mobile site and the fa.wikipedia-on-ipfs.org mirror. canonicalize()
+maps all of them to one https://fa.wikipedia.org/wiki/<Title> form, which
+every crawler and check_relevant.py use as their dedup and cache key.
+
+resolve_redirects() optionally goes one step further and maps redirect
+pages to their targets, 50 titles per MediaWiki API request.
+"""
+
+import re
+from urllib.parse import parse_qsl, quote, unquote, urlencode, urlsplit, urlunsplit
+
+from common.mediawiki_api import TITLE_SAFE_CHARS, title_from_url, url_from_title
+
+CANONICAL_HOST = "fa.wikipedia.org"
+MIRROR_HOSTS = {
+    "fa.wikipedia.org",
+    "fa.m.wikipedia.org",
+    "www.fa.wikipedia.org",
+    "fa.wikipedia-on-ipfs.org",
+}
+
+ZWNJ = "\u200c"
+CHAR_MAP = str.maketrans({
+    "ي": "ی",        # Arabic yeh
+    "ى": "ی",        # alef maksura
+    "ك": "ک",        # Arabic kaf
+    "٤": "۴", "٥": "۵", "٦": "۶",  # Arabic-Indic digits that differ from Persian ones
+    "\u200d": None,  # ZWJ
+    "\u200e": None,  # LRM
+    "\u200f": None,  # RLM
+    "\u00ad": None,  # soft hyphen
+    "\u00a0": " ",   # no-break space
+    "_": " ",
+})
+_ZWNJ_RUN_RE = re.compile(ZWNJ + "{2,}")
+_ZWNJ_SPACE_RE = re.compile(rf"\s*{ZWNJ}\s+|\s+{ZWNJ}\s*")
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize_title(title):
+    """Normalizes letter variants, ZWNJ/ZWJ and whitespace in a page title."""
+    title = unquote(title).translate(CHAR_MAP)
+    title = _ZWNJ_RUN_RE.sub(ZWNJ, title)
+    title = _ZWNJ_SPACE_RE.sub(" ", title)
+    title = _SPACES_RE.sub(" ", title).strip(" " + ZWNJ)
+    if title:
+        # MediaWiki treats the first letter as upper case
+        title = title[0].upper() + title[1:]
+    return title
+
+
+def canonicalize(url):
+    """
+    Returns the canonical form of `url`.
+
+    Wikipedia article URLs become https://fa.wikipedia.org/wiki/<Title> with a
+    normalized, MediaWiki-style percent-encoded title and no fragment. Other
+    URLs get lower-cased scheme/host, consistent percent-encoding and sorted
+    query parameters.
+    """
+    url = url.strip()
+    if url.startswith("//"):
+        url = "https:" + url
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+
+    if host in MIRROR_HOSTS:
+        title = None
+        if parts.path.startswith("/wiki/"):
+            title = parts.path[len("/wiki/"):]
+        elif parts.path in ("/w/index.php", "/wiki") and "title=" in parts.query:
+            query = dict(parse_qsl(parts.query))
+            if set(query) == {"title"}:
+                title = query["title"]
+        if title is not None:
+            title = normalize_title(title.split("#", 1)[0])
+            return f"https://{CANONICAL_HOST}/wiki/{quote(title.replace(' ', '_'), safe=TITLE_SAFE_CHARS)}"
+
+    path = quote(unquote(parts.path), safe="/:@!$&'()*+,;=-._~")
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower() or "https", host, path or "/", query, ""))
+
+
+def resolve_redirects(urls, client):
+    """
+    Maps each canonical article URL to the canonical URL of its redirect target.
+
+    Args:
+        urls (iterable): Article URLs (any spelling).
+        client (MediaWikiClient): Used for batched lookups, 50 titles per request.
+
+    Returns:
+        dict: canonicalize(url) -> canonical target URL; missing pages map to themselves.
+    """
+    canon = list(dict.fromkeys(canonicalize(u) for u in urls))
+    titles = {url: title_from_url(url) for url in canon if "/wiki/" in url}
+    resolved = {url: url for url in canon}
+    pages = client.pages(list(titles.values()), props=("info",))
+    for url, title in titles.items():
+        page = pages.get(title)
+        if page:
+            resolved[url] = canonicalize(url_from_title(page["title"]))
+    return resolved
@@ -0,0 +1,170 @@
+"""
+Streaming CSV -> JSON / JSONL conversion for the csvtojson.py scripts.
+
+Rows are read one at a time with csv.DictReader, shaped (column selection,
+renaming, filters or a custom mapping) and written straight to the output,
+so converting a multi-GB export uses constant memory. Output is either
+JSONL (one record per line) or a pretty JSON array with the same layout as
+json.dump(records, indent=...); the format follows the output extension
+unless given. The array is written to a temp file and renamed, so readers
+never see half a document.
+
+Usage:
+    convert_csv("products.csv", "products.jsonl", columns=["id", "text"], rename={"text": "summary"},
+                where=lambda row: row["text"] != "N/A")
+
+    python -m common.csv_to_json products.csv products.json --columns id,text --rename text=summary \
+        --where "text!=N/A" --typed
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.jsonl_output import write_json_array
+
+# Large text columns (descriptions, article bodies) overflow csv's 128 KiB default
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+# ASCII-only number syntax: Persian/Arabic digits, "1_000" and padded values stay text
+INT_RE = re.compile(r"[+-]?[0-9]+")
+FLOAT_RE = re.compile(r"[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?")
+
+
+def infer_column_types(csv_path, encoding="utf-8-sig"):
+    """
+    {column: int, float or str}, one type per column like pd.read_csv infers: int if
+    every cell is an ASCII integer, float if every cell is an ASCII number or empty,
+    else str. Unlike pandas, only empty cells count as missing ("NULL", "N/A" stay
+    text). This is an extra streaming pass over the file, not an in-memory load.
+    """
+    kinds = {}
+    with open(csv_path, newline="", encoding=encoding) as f:
+        reader = csv.DictReader(f)
+        for name in reader.fieldnames or []:
+            kinds[name] = int
+        for row in reader:
+            for name, value in row.items():
+                kind = kinds.get(name)
+                if kind is str or name is None:
+                    continue
+                if value is None or value == "":
+                    kinds[name] = float  # a missing cell turns an integer column into floats
+                elif INT_RE.fullmatch(value):
+                    continue
+                elif FLOAT_RE.fullmatch(value):
+                    kinds[name] = float
+                else:
+                    kinds[name] = str
+    return kinds
+
+
+def iter_records(csv_path, columns=None, rename=None, where=None, transform=None, typed=False,
+                 encoding="utf-8-sig"):
+    """
+    Yields one dict per CSV row that passes `where(row)`.
+
+    `transform(row)` builds the record itself (returning None drops the row); otherwise
+    the record keeps `columns` (all by default, in that order) renamed by `rename`.
+    With `typed`, numeric columns (see infer_column_types()) become numbers and empty
+    cells None; `where` still sees the raw strings. `typed` needs column records, not
+    `transform`.
+    """
+    if typed and transform is not None:
+        raise ValueError("typed conversion applies to column records; convert inside transform instead")
+    kinds = infer_column_types(csv_path, encoding) if typed else None
+    return _records(csv_path, columns, rename or {}, where, transform, kinds, encoding)
+
+
+def _records(csv_path, columns, rename, where, transform, kinds, encoding):
+    with open(csv_path, newline="", encoding=encoding) as f:
+        for row in csv.DictReader(f):
+            if where is not None and not where(row):
+                continue
+            if transform is not None:
+                record = transform(row)
+                if record is None:
+                    continue
+            else:
+                keep = columns or [name for name in row if name is not None]
+                if kinds is not None:
+                    record = {rename.get(name, name): convert_value(row.get(name), kinds.get(name, str))
+                              for name in keep}
+                else:
+                    record = {rename.get(name, name): row.get(name) for name in keep}
+            yield record
+
+
+def convert_value(text, kind):
+    if text is None or text == "":
+        return None
+    return text if kind is str else kind(text)
+
+
+def write_jsonl(records, jsonl_path):
+    """Writes one JSON record per line; returns the record count."""
+    count = 0
+    tmp = jsonl_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    os.replace(tmp, jsonl_path)
+    return count
+
+
+def convert_csv(csv_path, out_path, columns=None, rename=None, where=None, transform=None, typed=False,
+                fmt=None, indent=2, encoding="utf-8-sig"):
+    """
+    Streams `csv_path` into `out_path` as "jsonl" or "json" (array; default unless the
+    output ends in .jsonl). See iter_records() for the row options. Returns the record count.
+    """
+    fmt = fmt or ("jsonl" if out_path.endswith(".jsonl") else "json")
+    records = iter_records(csv_path, columns, rename, where, transform, typed, encoding)
+    if fmt == "jsonl":
+        return write_jsonl(records, out_path)
+    if fmt == "json":
+        return write_json_array(records, out_path, indent)
+    raise ValueError(f"Unknown output format {fmt!r} (expected 'json' or 'jsonl')")
+
+
+def parse_condition(text):
+    """"col!=value" / "col=value" -> predicate on a CSV row."""
+    if "!=" in text:
+        column, value = text.split("!=", 1)
+        return lambda row: row.get(column) != value
+    column, value = text.split("=", 1)
+    return lambda row: row.get(column) == value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a CSV file into JSON or JSONL.")
+    parser.add_argument("csv_path")
+    parser.add_argument("out_path")
+    parser.add_argument("--columns", help="comma-separated columns to keep, in order")
+    parser.add_argument("--rename", action="append", default=[], metavar="OLD=NEW")
+    parser.add_argument("--where", action="append", default=[], metavar="COL=VALUE|COL!=VALUE",
+                        help="keep rows matching every condition")
+    parser.add_argument("--format", choices=["json", "jsonl"], help="default: from the output extension")
+    parser.add_argument("--indent", type=int, default=2)
+    parser.add_argument("--typed", action="store_true",
+                        help="numeric columns as numbers, empty cells as null (type inferred per column)")
+    args = parser.parse_args()
+
+    conditions = [parse_condition(text) for text in args.where]
+    count = convert_csv(
+        args.csv_path, args.out_path,
+        columns=args.columns.split(",") if args.columns else None,
+        rename=dict(pair.split("=", 1) for pair in args.rename),
+        where=(lambda row: all(condition(row) for condition in conditions)) if conditions else None,
+        typed=args.typed, fmt=args.format, indent=args.indent,
+    )
+    print(f"Converted {args.csv_path} to {args.out_path} ({count} records).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Concurrent, resumable bulk file downloader (product images and the like).
+
+Files are downloaded on a background asyncio loop, like common/async_fetch.py:
+
+- at most `max_concurrency` downloads run at once, and at most `max_per_host`
+  of them against a single host;
+- one keep-alive session (make_session) pools connections per host and
+  paces every request through the host's adaptive limiter;
+- each file is written to `<path>.part` and only renamed onto `<path>`
+  (os.replace, atomic) once the body is complete, so an existing `<path>` is
+  always a whole file;
+- a `.part` left by an interrupted run is resumed with a `Range` request
+  (restarted from scratch if the server ignores the range).
+
+Results come back as they finish, and DownloadStats keeps files, bytes,
+resumes and failures per host for the final report.
+
+Usage:
+    stats = DownloadStats()
+    for key, url, path, error in download_files([(key, url, path), ...], stats=stats):
+        ...
+    stats.report()
+"""
+
+import asyncio
+import os
+import queue
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlsplit
+
+from common.async_fetch import make_session
+from common.rate_limiter import DEFAULT_RATE, MAX_RATE, get_limiter
+
+CHUNK_SIZE = 64 * 1024
+PART_SUFFIX = ".part"
+
+
+class IncompleteDownload(Exception):
+    pass
+
+
+class DownloadStats:
+    """Thread-safe per-host counters of a download run."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self.hosts = defaultdict(lambda: {"files": 0, "bytes": 0, "resumed": 0, "failed": 0})
+
+    def record(self, host, nbytes=0, resumed=False, failed=False):
+        with self._lock:
+            entry = self.hosts[host]
+            entry["bytes"] += nbytes
+            entry["resumed"] += int(resumed)
+            if failed:
+                entry["failed"] += 1
+            else:
+                entry["files"] += 1
+
+    def report(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        for host, entry in sorted(self.hosts.items()):
+            print(f"[INFO] {host}: {entry['files']} files, {entry['bytes'] / 1e6:.1f} MB "
+                  f"({entry['bytes'] / elapsed / 1e6:.2f} MB/s), {entry['resumed']} resumed, "
+                  f"{entry['failed']} failed")
+
+
+def _range_total(resp):
+    """Total size from a 'Content-Range: bytes a-b/total' header, or None."""
+    match = re.search(r"/(\d+)\s*$", resp.headers.get("Content-Range", ""))
+    return int(match.group(1)) if match else None
+
+
+def download_file(session, url, path, timeout=30, chunk_size=CHUNK_SIZE):
+    """
+    Downloads `url` to `path` via `<path>.part`, resuming a previous partial download.
+
+    Returns (bytes transferred, resumed). Raises on HTTP errors and on short
+    bodies; the .part file is kept so the next attempt can resume it.
+    """
+    part = path + PART_SUFFIX
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    # Byte offsets only line up with an unencoded body
+    headers = {"Accept-Encoding": "identity"}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as resp:
+        if resp.status_code == 416 and offset:
+            if _range_total(resp) == offset:
+                os.replace(part, path)  # the previous run got every byte but stopped before renaming
+                return 0, True
+            os.remove(part)
+            return download_file(session, url, path, timeout, chunk_size)
+        resp.raise_for_status()
+
+        resumed = offset > 0 and resp.status_code == 206
+        if not resumed:
+            offset = 0  # server ignored the range (or nothing to resume): start over
+        expected = resp.headers.get("Content-Length")
+        expected = offset + int(expected) if expected is not None else None
+
+        written = 0
+        with open(part, "ab" if resumed else "wb") as f:
+            for chunk in resp.raw.stream(chunk_size, decode_content=False):
+                f.write(chunk)
+                written += len(chunk)
+
+    if expected is not None and offset + written < expected:
+        raise IncompleteDownload(f"{url}: got {offset + written} of {expected} bytes")
+    os.replace(part, path)
+    return written, resumed
+
+
+async def _download_one(item, session, executor, slots, host_slots, timeout, stats, out):
+    key, url, path = item
+    host = urlsplit(url).netloc
+    loop = asyncio.get_running_loop()
+    try:
+        async with host_slots[host]:
+            nbytes, resumed = await loop.run_in_executor(executor, partial(download_file, session, url, path, timeout))
+        stats.record(host, nbytes, resumed)
+        out.put((key, url, path, None))
+    except Exception as e:
+        stats.record(host, failed=True)
+        out.put((key, url, path, e))
+    finally:
+        slots.release()
+
+
+async def _download_into(items, out, stop, session, max_concurrency, max_per_host, timeout, stats):
+    slots = asyncio.Semaphore(max_concurrency)
+    host_slots = defaultdict(lambda: asyncio.Semaphore(max_per_host))
+    tasks = set()
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        for item in items:
+            await slots.acquire()
+            if stop.is_set():
+                break
+            task = asyncio.create_task(
+                _download_one(item, session, executor, slots, host_slots, timeout, stats, out)
+            )
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+
+def download_files(items, max_concurrency=32, max_per_host=8, requests_per_second=None, session=None,
+                   timeout=30, stats=None):
+    """
+    Downloads (key, url, path) items concurrently and yields (key, url, path, error) as each finishes.
+
+    Args:
+        items (iterable): (key, url, path) tuples; `key` is passed through untouched.
+        max_concurrency (int): Downloads in flight overall.
+        max_per_host (int): Downloads in flight against a single host.
+        requests_per_second (float): Starting rate of each new host limiter (None = DEFAULT_RATE).
+        session (requests.Session): Optional session to reuse; make_session() otherwise.
+        timeout (float): Per-request timeout in seconds.
+        stats (DownloadStats): Collects per-host bytes, resumes and failures.
+
+    Yields:
+        tuple: (key, url, path, error); error is None when `path` is complete on disk.
+    """
+    items = list(items)
+    if not items:
+        return
+    if session is None:
+        session = make_session(pool_size=max_per_host)
+    if stats is None:
+        stats = DownloadStats()
+    rate = requests_per_second or DEFAULT_RATE
+    for host in {urlsplit(url).netloc for _, url, _ in items}:
+        get_limiter(host, rate, max(rate, MAX_RATE))
+
+    out = queue.Queue()
+    stop = threading.Event()
+
+    def run():
+        try:
+            asyncio.run(_download_into(items, out, stop, session, max_concurrency, max_per_host, timeout, stats))
+        except Exception as e:
+            out.put(e)
+        out.put(None)
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    try:
+        while True:
+            result = out.get()
+            if result is None:
+                break
+            if isinstance(result, Exception):
+                raise result
+            yield result
+    finally:
+        stop.set()
@@ -0,0 +1,106 @@
+"""
+Durable BFS frontier for the link crawlers.
+
+The queue of pages still to expand lives in SQLite as (url, depth, done)
+rows, so an interrupted crawl resumes exactly where it stopped, depth
+information included, and pages that were already expanded are never
+expanded again.
+
+Writes are group-committed: pushes and "done" marks are buffered and written
+in one transaction every `batch_size` operations (WAL mode, synchronous=
+NORMAL), instead of paying an fsync per discovered link. A crash loses at
+most the last uncommitted group, which is simply re-expanded on restart.
+
+`before_commit` runs ahead of each group transaction: callers persist the
+links that group discovered there, so a page is never marked done while
+its links exist only in memory. `on_commit` runs once the group is durable.
+"""
+
+import sqlite3
+
+
+class Frontier:
+    def __init__(self, path, batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        self.before_commit = None  # optional callback run before every group commit
+        self.on_commit = None  # optional callback run after every group commit
+
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS frontier (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL UNIQUE,
+                depth INTEGER NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._db.commit()
+
+        self._pushes = []
+        self._done = []
+        self._cursor = 0  # highest row id handed out by pop_batch in this session
+
+    def push(self, url, depth):
+        """Queues `url` for expansion; URLs already in the frontier keep their state."""
+        self._pushes.append((url, depth))
+        self._maybe_commit()
+
+    def mark_done(self, url):
+        """Records that `url` has been fully expanded."""
+        self._done.append((url,))
+        self._maybe_commit()
+
+    def pop_batch(self, n=1, max_depth=None):
+        """
+        Returns up to `n` (url, depth) pairs in BFS order that are not done yet.
+
+        Popped pages stay pending on disk until mark_done() is committed, so a
+        crash mid-batch puts them back in the queue.
+        """
+        rows = self._select(n, max_depth)
+        if len(rows) < n and self._pushes:
+            # Buffered pushes are always newer than committed rows
+            self.commit()
+            rows += self._select(n - len(rows), max_depth)
+        return [(url, depth) for _, url, depth in rows]
+
+    def _select(self, n, max_depth):
+        query = "SELECT id, url, depth FROM frontier WHERE done = 0 AND id > ?"
+        args = [self._cursor]
+        if max_depth is not None:
+            query += " AND depth < ?"
+            args.append(max_depth)
+        query += " ORDER BY id LIMIT ?"
+        args.append(n)
+        rows = self._db.execute(query, args).fetchall()
+        if rows:
+            self._cursor = rows[-1][0]
+        return rows
+
+    def pending(self):
+        return self._db.execute("SELECT COUNT(*) FROM frontier WHERE done = 0").fetchone()[0] + len(self._pushes)
+
+    def _maybe_commit(self):
+        if len(self._pushes) + len(self._done) >= self.batch_size:
+            self.commit()
+
+    def commit(self):
+        """Writes all buffered pushes and done marks in a single transaction."""
+        if self.before_commit:
+            self.before_commit()
+        with self._db:
+            if self._pushes:
+                self._db.executemany("INSERT OR IGNORE INTO frontier (url, depth) VALUES (?, ?)", self._pushes)
+            if self._done:
+                self._db.executemany("UPDATE frontier SET done = 1 WHERE url = ?", self._done)
+        self._pushes.clear()
+        self._done.clear()
+        if self.on_commit:
+            self.on_commit()
+
+    def close(self):
+        self.commit()
+        self._db.close()
@@ -0,0 +1,301 @@
+"""
+Pluggable HTML parser backend for the article extractors.
+
+`parse_html(html, backend)` returns a small, backend-neutral node API that
+covers what the extractors need: CSS selection (`css`, `css_first`),
+BeautifulSoup-style text (`text(separator, strip)`), sibling and
+document-order navigation (`next_siblings`, `find_next`, `parent`) and
+in-place edits (`decompose`, `replace_with`).
+
+Backends, fastest first:
+    "selectolax"  Lexbor engine (pip install selectolax)
+    "lxml"        libxml2 HTML parser (pip install lxml)
+    "bs4"         BeautifulSoup + html.parser, the compatibility fallback
+
+`<script>` and `<style>` elements are dropped at parse time, which matches
+what BeautifulSoup's get_text() already ignores, so every backend returns
+the same text for the same page.
+"""
+
+import re
+
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+BACKENDS = ("selectolax", "lxml", "bs4")
+DROPPED_TAGS = ("script", "style")
+
+
+def available_backends():
+    """Backends whose parser is importable, fastest first."""
+    found = []
+    if LexborHTMLParser is not None:
+        found.append("selectolax")
+    if lxml is not None:
+        found.append("lxml")
+    found.append("bs4")
+    return found
+
+
+def default_backend():
+    return available_backends()[0]
+
+
+def parse_html(html, backend=None):
+    """Parses `html` with `backend` (default: fastest available) and returns the document node."""
+    backend = backend or default_backend()
+    if backend not in available_backends():
+        raise ValueError(f"HTML backend {backend!r} is not available (have: {available_backends()})")
+    if backend == "selectolax":
+        tree = LexborHTMLParser(html)
+        for node in tree.css(",".join(DROPPED_TAGS)):
+            node.decompose()
+        return SelectolaxNode(tree.root)
+    if backend == "lxml":
+        root = lxml.html.document_fromstring(html)
+        for el in root.xpath(" | ".join("//" + tag for tag in DROPPED_TAGS)):
+            _drop(el)
+        return LxmlNode(root)
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup.find_all(DROPPED_TAGS):
+        tag.decompose()
+    return SoupNode(soup)
+
+
+class Node:
+    """Backend-neutral element wrapper; subclasses implement the primitives."""
+
+    __slots__ = ("_node",)
+
+    def __init__(self, node):
+        self._node = node
+
+    def __eq__(self, other):
+        return isinstance(other, Node) and self._node is other._node
+
+    def __hash__(self):
+        return id(self._node)
+
+    def css_first(self, selector):
+        found = self.css(selector)
+        return found[0] if found else None
+
+    def has_attr(self, name):
+        return self.get(name) is not None
+
+    def find_by_text(self, tag, text):
+        """First `tag` element whose stripped text equals `text` (like soup.find(tag, string=text))."""
+        for node in self.css(tag):
+            if node.text(strip=True) == text:
+                return node
+        return None
+
+
+# -------------------------
+# selectolax (Lexbor)
+# -------------------------
+_TEXT_SEP = "\x1f"  # unit separator, never present in article text
+
+
+class SelectolaxNode(Node):
+    __slots__ = ()
+
+    @property
+    def tag(self):
+        return self._node.tag
+
+    def get(self, name, default=None):
+        return self._node.attributes.get(name, default)
+
+    def text(self, separator="", strip=False):
+        if not strip:
+            return self._node.text(deep=True, separator=separator)
+        parts = self._node.text(deep=True, separator=_TEXT_SEP).split(_TEXT_SEP)
+        return separator.join(p for p in (p.strip() for p in parts) if p)
+
+    def css(self, selector):
+        return [SelectolaxNode(n) for n in self._node.css(selector)]
+
+    @property
+    def parent(self):
+        parent = self._node.parent
+        return SelectolaxNode(parent) if parent is not None else None
+
+    def next_siblings(self):
+        node = self._node.next
+        while node is not None:
+            if not node.tag.startswith(("-", "_")):
+                yield SelectolaxNode(node)
+            node = node.next
+
+    def find_next(self, tag):
+        """First `tag` element after this one in document order (descendants included)."""
+        node = self._node
+        while node is not None:
+            if node.child is not None:
+                node = node.child
+            else:
+                while node is not None and node.next is None:
+                    node = node.parent
+                if node is None:
+                    return None
+                node = node.next
+            if node.tag == tag:
+                return SelectolaxNode(node)
+        return None
+
+    def decompose(self):
+        self._node.decompose()
+
+    def replace_with(self, text):
+        self._node.replace_with(text)
+
+
+# -------------------------
+# lxml
+# -------------------------
+_COMPOUND_RE = re.compile(r"([\w*-]+)?((?:[#.][\w-]+|\[[\w-]+(?:=[\"']?[^\"'\]]*[\"']?)?\])*)$")
+_PART_RE = re.compile(r"([#.])([\w-]+)|\[([\w-]+)(?:=[\"']?([^\"'\]]*)[\"']?)?\]")
+_xpath_cache = {}
+
+
+def css_to_xpath(selector):
+    """
+    Translates the simple CSS the extractors use (tag, .class, #id, [attr],
+    [attr=value], descendant combinator, comma groups) into a relative XPath.
+    """
+    groups = []
+    for group in selector.split(","):
+        steps = []
+        for compound in group.split():
+            m = _COMPOUND_RE.match(compound)
+            if not m:
+                raise ValueError(f"Unsupported CSS selector: {selector!r}")
+            predicates = []
+            for kind, name, attr, value in _PART_RE.findall(m.group(2)):
+                if kind == "#":
+                    predicates.append(f"@id='{name}'")
+                elif kind == ".":
+                    predicates.append(f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')")
+                elif value:
+                    predicates.append(f"@{attr}='{value}'")
+                else:
+                    predicates.append(f"@{attr}")
+            step = "descendant::" + (m.group(1) or "*")
+            steps.append(step + "".join(f"[{p}]" for p in predicates))
+        groups.append("/".join(steps))
+    return " | ".join(groups)
+
+
+def _compiled_xpath(expr):
+    compiled = _xpath_cache.get(expr)
+    if compiled is None:
+        compiled = _xpath_cache[expr] = etree.XPath(expr)
+    return compiled
+
+
+def _drop(el):
+    """Removes `el`; unlike drop_tree(), its tail stays a separate string, as in the other backends."""
+    if not el.tail:
+        el.drop_tree()
+        return
+    # drop_tree() would glue the tail onto the preceding text, so strip=True could no
+    # longer trim the two apart; an empty bare <span> keeps the tail on its own
+    el.clear(keep_tail=True)
+    el.tag = "span"
+
+
+class LxmlNode(Node):
+    __slots__ = ()
+
+    @property
+    def tag(self):
+        return self._node.tag
+
+    def get(self, name, default=None):
+        return self._node.get(name, default)
+
+    def text(self, separator="", strip=False):
+        parts = self._node.itertext()
+        if strip:
+            parts = (p for p in (p.strip() for p in parts) if p)
+        return separator.join(parts)
+
+    def css(self, selector):
+        return [LxmlNode(el) for el in _compiled_xpath(css_to_xpath(selector))(self._node)]
+
+    @property
+    def parent(self):
+        parent = self._node.getparent()
+        return LxmlNode(parent) if parent is not None else None
+
+    def next_siblings(self):
+        for el in self._node.itersiblings():
+            if isinstance(el.tag, str):
+                yield LxmlNode(el)
+
+    def find_next(self, tag):
+        """First `tag` element after this one in document order (descendants included)."""
+        found = _compiled_xpath(f"(descendant::{tag} | following::{tag})[1]")(self._node)
+        return LxmlNode(found[0]) if found else None
+
+    def decompose(self):
+        _drop(self._node)
+
+    def replace_with(self, text):
+        # lxml has no standalone text nodes; a bare <span> keeps `text` a separate
+        # string so strip=True trims it on its own, as the other backends do
+        el = self._node
+        el.clear(keep_tail=True)
+        el.tag = "span"
+        el.text = text
+
+
+# -------------------------
+# BeautifulSoup
+# -------------------------
+class SoupNode(Node):
+    __slots__ = ()
+
+    @property
+    def tag(self):
+        return self._node.name
+
+    def get(self, name, default=None):
+        value = self._node.get(name, default)
+        return " ".join(value) if isinstance(value, list) else value
+
+    def text(self, separator="", strip=False):
+        return self._node.get_text(separator=separator, strip=strip)
+
+    def css(self, selector):
+        return [SoupNode(t) for t in self._node.select(selector)]
+
+    @property
+    def parent(self):
+        parent = self._node.parent
+        return SoupNode(parent) if parent is not None else None
+
+    def next_siblings(self):
+        for sibling in self._node.find_next_siblings():
+            yield SoupNode(sibling)
+
+    def find_next(self, tag):
+        found = self._node.find_next(tag)
+        return SoupNode(found) if found is not None else None
+
+    def decompose(self):
+        self._node.decompose()
+
+    def replace_with(self, text):
+        self._node.replace_with(text)
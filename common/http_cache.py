@@ -0,0 +1,287 @@
+"""
+Persistent on-disk HTTP cache shared by every Wikipedia consumer in the repo.
+
+Responses are keyed by their canonical URL. Bodies are stored zlib-compressed
+under the SHA-256 of their content, so the same article reached through two
+URLs is only stored once. Entries remember their ETag / Last-Modified headers
+and are revalidated with If-None-Match / If-Modified-Since, which means a rerun
+after an extractor fix costs a 304 per page instead of a full download.
+
+The cache is bounded by `max_bytes` (compressed size) and evicts the least
+recently used entries first. The running size lives in the index itself, so
+several processes sharing one cache directory evict against the same total.
+`stats()` reports this process's hits, revalidations and misses.
+
+Usage:
+    session = make_cached_session(max_age=24 * 3600)
+    resp = session.get(url)
+    print(session.cache.stats())
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from common.async_fetch import make_session
+from common.canonical import canonicalize
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "WIKI_HTTP_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".http_cache"),
+)
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GiB of compressed bodies
+
+
+class HttpCache:
+    """SQLite index plus compressed, content-addressed body files."""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.directory, "index.sqlite"),
+                                   check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                content_type TEXT,
+                encoding TEXT,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_access);
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS totals (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                bytes INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO totals (id, bytes) SELECT 0, COALESCE(SUM(size), 0) FROM blobs;
+        """)
+        self._db.commit()
+
+        self.hits = 0          # served from disk without touching the network
+        self.revalidated = 0   # server answered 304 Not Modified
+        self.misses = 0        # full download
+        self.evictions = 0
+
+    @property
+    def total_bytes(self):
+        """Compressed size of all stored bodies, across every process using this cache."""
+        return self._db.execute("SELECT bytes FROM totals WHERE id = 0").fetchone()[0]
+
+    def _add_bytes(self, size):
+        self._db.execute("UPDATE totals SET bytes = bytes + ? WHERE id = 0", (size,))
+
+    # -------------------------
+    # Storage
+    # -------------------------
+    def _blob_path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest + ".z")
+
+    def get(self, url):
+        """Returns the cached entry for `url` as a dict (body included), or None."""
+        key = canonicalize(url)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, digest, etag, last_modified, content_type, encoding, stored_at "
+                "FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            try:
+                with open(self._blob_path(row[1]), "rb") as f:
+                    body = zlib.decompress(f.read())
+            except (OSError, zlib.error):
+                self._delete(key, row[1])
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        return {
+            "url": row[0], "body": body, "etag": row[2], "last_modified": row[3],
+            "content_type": row[4], "encoding": row[5], "stored_at": row[6],
+        }
+
+    def put(self, url, body, etag=None, last_modified=None, content_type=None, encoding=None):
+        """Stores a response body for `url`, replacing any previous entry."""
+        key = canonicalize(url)
+        digest = hashlib.sha256(body).hexdigest()
+        now = time.time()
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone() is None:
+                data = zlib.compress(body, 6)
+                path = self._blob_path(digest)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+                # Another process may have stored the same body meanwhile; count it once
+                if self._db.execute("INSERT OR IGNORE INTO blobs (digest, size) VALUES (?, ?)",
+                                    (digest, len(data))).rowcount:
+                    self._add_bytes(len(data))
+
+            old = self._db.execute("SELECT digest FROM entries WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(key, url, digest, etag, last_modified, content_type, encoding, stored_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, digest, etag, last_modified, content_type, encoding, now, now),
+            )
+            if old and old[0] != digest:
+                self._release_blob(old[0])
+            self._evict()
+            self._db.commit()
+
+    def touch(self, url):
+        """Marks a revalidated entry as fresh again."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE entries SET stored_at = ?, last_access = ? WHERE key = ?",
+                             (now, now, canonicalize(url)))
+            self._db.commit()
+
+    def _delete(self, key, digest):
+        self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._release_blob(digest)
+
+    def _release_blob(self, digest):
+        """Removes a body file once no entry points at it any more."""
+        if self._db.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+            return
+        row = self._db.execute("SELECT size FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            return
+        self._db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+        self._add_bytes(-row[0])
+        try:
+            os.remove(self._blob_path(digest))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Drops least-recently-used entries until the cache fits in max_bytes."""
+        while self.total_bytes > self.max_bytes:
+            victims = self._db.execute(
+                "SELECT key, digest FROM entries ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            if not victims:
+                break
+            for key, digest in victims:
+                self._delete(key, digest)
+                self.evictions += 1
+                if self.total_bytes <= self.max_bytes:
+                    break
+
+    def urls(self, prefix=""):
+        """Canonical URLs of all cached entries starting with `prefix` (e.g. to replay recorded pages)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key FROM entries WHERE key >= ? AND key < ? ORDER BY key",
+                (prefix, prefix + "\U0010ffff"),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self):
+        total = self.hits + self.revalidated + self.misses
+        with self._lock:
+            size = self.total_bytes
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.revalidated) / total if total else 0.0,
+            "size_bytes": size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class CachedSession(requests.Session):
+    """A requests.Session whose GETs go through an HttpCache with conditional revalidation."""
+
+    def __init__(self, cache=None, max_age=0):
+        super().__init__()
+        self.cache = cache if cache is not None else HttpCache()
+        self.max_age = max_age  # seconds an entry is trusted without asking the server
+
+    def request(self, method, url, *args, **kwargs):
+        if method.upper() != "GET" or kwargs.get("stream"):
+            return super().request(method, url, *args, **kwargs)
+
+        params = kwargs.pop("params", None)
+        if params:
+            url = requests.Request("GET", url, params=params).prepare().url
+
+        entry = self.cache.get(url)
+        if entry and self.max_age and time.time() - entry["stored_at"] < self.max_age:
+            self.cache.hits += 1
+            return self._from_entry(url, entry)
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        resp = super().request(method, url, *args, headers=headers, **kwargs)
+
+        if resp.status_code == 304 and entry:
+            self.cache.revalidated += 1
+            self.cache.touch(url)
+            return self._from_entry(url, entry)
+
+        self.cache.misses += 1
+        if resp.status_code == 200:
+            self.cache.put(
+                url, resp.content,
+                etag=resp.headers.get("ETag"),
+                last_modified=resp.headers.get("Last-Modified"),
+                content_type=resp.headers.get("Content-Type"),
+                encoding=resp.encoding,
+            )
+        return resp
+
+    @staticmethod
+    def _from_entry(url, entry):
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.reason = "OK"
+        resp.url = url
+        resp._content = entry["body"]
+        resp.encoding = entry["encoding"]
+        resp.headers = CaseInsensitiveDict({
+            k: v for k, v in (
+                ("Content-Type", entry["content_type"]),
+                ("ETag", entry["etag"]),
+                ("Last-Modified", entry["last_modified"]),
+            ) if v
+        })
+        resp.from_cache = True
+        return resp
+
+
+def make_cached_session(cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, max_age=0, pool_size=16):
+    """Creates a keep-alive CachedSession backed by the shared on-disk cache."""
+    session = CachedSession(HttpCache(cache_dir, max_bytes), max_age=max_age)
+    return make_session(pool_size=pool_size, session=session)
@@ -0,0 +1,214 @@
+"""
+Packed, training-resolution image shards written at download time.
+
+The fine-tuning notebook resizes every raw product image to 224x224 on every
+access, and the raw files are many times that size. ShardWriter decodes
+each image once, resizes it to the training resolution and appends it to
+WebDataset-style tar shards:
+
+    shards/shard-000000.tar    <key>.jpg members, ~SHARD_BYTES each
+    shards/index.tsv           key, shard, data offset, size, sha256 per image
+
+Training then reads a few large sequential files (any tar/WebDataset loader
+works), and ShardReader gives random access by key through the index. The
+index line of an image is written only after its bytes are flushed to the
+shard, and on reopen the last shard is cut back to the last indexed member,
+so an interrupted download resumes without duplicates or torn members.
+
+Usage:
+    writer = ShardWriter("shards")
+    writer.add("123_1", "images/123_1.jpg")
+    writer.close()
+
+    reader = ShardReader("shards")
+    image = reader.open_image("123_1")
+"""
+
+import io
+import os
+import tarfile
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+IMAGE_SIZE = (224, 224)  # the notebook's transforms.Resize(SIZE)
+JPEG_QUALITY = 95
+SHARD_BYTES = 128 * 1024 ** 2
+INDEX_FILE = "index.tsv"
+BLOCK = tarfile.BLOCKSIZE
+
+
+def shard_name(number):
+    return f"shard-{number:06d}.tar"
+
+
+def normalize_image(path, size=IMAGE_SIZE, quality=JPEG_QUALITY):
+    """Decodes an image, flattens transparency onto white, resizes it and returns JPEG bytes."""
+    if Image is None:
+        raise ImportError("Image shards need Pillow (pip install pillow)")
+    with Image.open(path) as img:
+        img.load()
+        if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+            rgba = img.convert("RGBA")
+            img = Image.new("RGB", rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.getchannel("A"))
+        else:
+            img = img.convert("RGB")
+        img = img.resize(size, Image.BILINEAR)
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=quality)
+    return out.getvalue()
+
+
+def read_index(directory):
+    """{key: (shard, offset, size, sha256)} from a shard directory's index."""
+    entries = {}
+    path = os.path.join(directory, INDEX_FILE)
+    if not os.path.exists(path):
+        return entries
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # partial line from a crash
+            key, shard, offset, size, digest = line[:-1].decode("utf-8").split("\t")
+            entries[key] = (shard, int(offset), int(size), digest or None)
+    return entries
+
+
+class ShardWriter:
+    def __init__(self, directory, size=IMAGE_SIZE, quality=JPEG_QUALITY, shard_bytes=SHARD_BYTES):
+        self.directory = directory
+        self.size = size
+        self.quality = quality
+        self.shard_bytes = shard_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self.entries = read_index(directory)
+        self._by_digest = {entry[3]: key for key, entry in self.entries.items() if entry[3]}
+        self._recover()
+        self._index = open(os.path.join(directory, INDEX_FILE), "ab")
+        self._tar = None
+
+    def _recover(self):
+        """Cuts the index and the last shard back to the last fully indexed member."""
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, "rb") as f:
+                data = f.read()
+            if data and not data.endswith(b"\n"):
+                with open(index_path, "r+b") as f:
+                    f.truncate(data.rfind(b"\n") + 1)
+
+        ends = {}
+        for shard, offset, size, _ in self.entries.values():
+            ends[shard] = max(ends.get(shard, 0), offset + -(-size // BLOCK) * BLOCK)
+        self._number = max((int(name[6:12]) for name in ends), default=0)
+        last = shard_name(self._number)
+        for name in os.listdir(self.directory):
+            if name.startswith("shard-") and name.endswith(".tar") and name not in ends:
+                os.remove(os.path.join(self.directory, name))  # started but nothing indexed
+        path = os.path.join(self.directory, last)
+        if last in ends:
+            with open(path, "r+b") as f:
+                f.truncate(ends[last])
+                # Restore the end-of-archive blocks (cut above, or never written by a crash),
+                # so the shard is a valid tar that "a" mode can reopen
+                f.seek(ends[last])
+                f.write(b"\0" * (2 * BLOCK))
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def _open_shard(self):
+        path = os.path.join(self.directory, shard_name(self._number))
+        if os.path.exists(path) and os.path.getsize(path) >= self.shard_bytes:
+            self._number += 1
+            path = os.path.join(self.directory, shard_name(self._number))
+        self._tar = tarfile.open(path, "a" if os.path.exists(path) else "w", format=tarfile.USTAR_FORMAT)
+
+    def add(self, key, path, digest=None):
+        """
+        Appends the normalized image at `path` under `key` (skipped if already present).
+        An image whose `digest` is already in the shards is copied without decoding it again.
+        """
+        if key in self.entries:
+            return False
+        if digest and digest in self._by_digest:
+            data = self.read(self._by_digest[digest])
+        else:
+            data = normalize_image(path, self.size, self.quality)
+
+        if self._tar is None:
+            self._open_shard()
+        elif self._tar.offset >= self.shard_bytes:
+            self._tar.close()
+            self._number += 1
+            self._open_shard()
+        info = tarfile.TarInfo(f"{key}.jpg")
+        info.size = len(data)
+        offset = self._tar.offset + BLOCK  # a USTAR header is a single block
+        self._tar.addfile(info, io.BytesIO(data))
+        self._tar.fileobj.flush()
+
+        shard = shard_name(self._number)
+        self.entries[key] = (shard, offset, info.size, digest)
+        if digest:
+            self._by_digest.setdefault(digest, key)
+        self._index.write(f"{key}\t{shard}\t{offset}\t{info.size}\t{digest or ''}\n".encode("utf-8"))
+        self._index.flush()
+        return True
+
+    def read(self, key):
+        shard, offset, size, _ = self.entries[key]
+        if self._tar is not None:
+            self._tar.fileobj.flush()
+        with open(os.path.join(self.directory, shard), "rb") as f:
+            f.seek(offset)
+            return f.read(size)
+
+    def close(self):
+        if self._tar is not None:
+            self._tar.close()  # writes the end-of-archive blocks
+            self._tar = None
+        self._index.close()
+
+
+class ShardReader:
+    """Random access to shard members by key, plus sequential iteration in shard order."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.entries = read_index(directory)
+        self._files = {}
+
+    def keys(self):
+        return self.entries.keys()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def read(self, key):
+        shard, offset, size, _ = self.entries[key]
+        f = self._files.get(shard)
+        if f is None:
+            f = self._files[shard] = open(os.path.join(self.directory, shard), "rb")
+        f.seek(offset)
+        return f.read(size)
+
+    def open_image(self, key):
+        return Image.open(io.BytesIO(self.read(key)))
+
+    def __iter__(self):
+        """Yields (key, JPEG bytes) reading each shard front to back."""
+        for key, _ in sorted(self.entries.items(), key=lambda item: (item[1][0], item[1][1])):
+            yield key, self.read(key)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
@@ -0,0 +1,196 @@
+"""
+Content-addressed image store shared by the Digikala and HW3 image downloaders.
+
+Every distinct image body is kept once, under its SHA-256, in
+`<root>/<first two hex digits>/<digest>`. The per-product names the rest of
+the pipeline uses (`images/123.jpg`, `product_images/123_0.jpg`, ...) are hard
+links to those objects, so the same placeholder or brand banner downloaded
+for a thousand products costs disk space once, and a training loader that
+decodes by digest decodes it once. Where hard links are not supported the
+file is left as a plain copy.
+
+An optional perceptual-hash pass (dHash, needs Pillow) flags near-duplicates
+-- re-encoded or resized copies of the same picture -- that the exact hash
+cannot catch. It only reports them; nothing is deleted.
+
+Usage:
+    python -m common.image_store DigikalaProject/images                 # dedup a folder
+    python -m common.image_store DigikalaProject/images --near-duplicates
+"""
+
+import csv
+import errno
+import hashlib
+import os
+import shutil
+import sys
+from collections import defaultdict
+from itertools import combinations
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+CHUNK_SIZE = 1024 * 1024
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif")
+# os.link errors meaning the filesystem (or this object) cannot take more hard links
+LINK_UNSUPPORTED = {errno.EXDEV, errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EMLINK}
+NEAR_DUPLICATE_DISTANCE = 4  # max differing dHash bits (of 64) to call two images near-duplicates
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ImageStore:
+    def __init__(self, root):
+        self.root = root
+        self.hardlinks = True  # switched off once os.link reports links as unsupported
+        os.makedirs(root, exist_ok=True)
+
+    def object_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def __contains__(self, digest):
+        return os.path.exists(self.object_path(digest))
+
+    def add(self, path):
+        """
+        Stores the file at `path` and turns `path` into a hard link to the stored
+        object. Returns (digest, bytes saved): the file's size if its content was
+        already in the store, else 0.
+        """
+        digest = sha256_file(path)
+        obj = self.object_path(digest)
+        if not os.path.exists(obj):
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+            try:
+                self._link_or_copy(path, obj)
+                return digest, 0
+            except FileExistsError:
+                pass  # stored by another writer meanwhile; link to theirs below
+        if os.path.samefile(obj, path):
+            return digest, 0
+        size = os.path.getsize(path)
+        return digest, size if self.link(digest, path) else 0
+
+    def link(self, digest, path):
+        """Makes `path` a hard link to the stored object; returns False if it had to be a copy."""
+        tmp = path + ".link"
+        if os.path.lexists(tmp):
+            os.remove(tmp)  # left behind by an interrupted run
+        linked = self._link_or_copy(self.object_path(digest), tmp)
+        os.replace(tmp, path)
+        return linked
+
+    def _link_or_copy(self, src, dst):
+        if self.hardlinks:
+            try:
+                os.link(src, dst)
+                return True
+            except OSError as e:
+                if e.errno not in LINK_UNSUPPORTED:
+                    raise
+                print(f"[WARN] Hard links unavailable in {self.root} ({e}); storing copies instead.")
+                self.hardlinks = False
+        shutil.copyfile(src, dst)
+        return False
+
+    def dedup_directory(self, directory):
+        """Adds every image in `directory`; returns {file name: digest} and prints the space saved."""
+        digests = {}
+        saved = 0
+        for name in sorted(os.listdir(directory)):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            digests[name], nbytes = self.add(os.path.join(directory, name))
+            saved += nbytes
+        unique = len(set(digests.values()))
+        print(f"[INFO] {directory}: {len(digests)} images, {unique} unique, {saved / 1e6:.1f} MB saved by linking.")
+        return digests
+
+
+# -------------------------
+# Near-duplicates (perceptual hash)
+# -------------------------
+def dhash(path, size=8):
+    """64-bit difference hash: brightness gradients of a size+1 x size grayscale thumbnail."""
+    if Image is None:
+        raise ImportError("Near-duplicate detection needs Pillow (pip install pillow)")
+    with Image.open(path) as img:
+        pixels = list(img.convert("L").resize((size + 1, size)).getdata())
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def near_duplicate_pairs(hashes, max_distance=NEAR_DUPLICATE_DISTANCE, bits=64):
+    """
+    (key_a, key_b, distance) for every pair of hashes at most `max_distance` bits apart.
+
+    The hash is split into max_distance + 1 bands; two hashes within the distance
+    must agree exactly on at least one band, so only keys sharing a band are compared.
+    """
+    bands = max_distance + 1
+    width = -(-bits // bands)
+    buckets = defaultdict(list)
+    for key, value in hashes.items():
+        for band in range(bands):
+            buckets[band, (value >> (band * width)) & ((1 << width) - 1)].append(key)
+
+    seen = set()
+    pairs = []
+    for keys in buckets.values():
+        for a, b in combinations(keys, 2):
+            if (a, b) in seen:
+                continue
+            seen.add((a, b))
+            distance = bin(hashes[a] ^ hashes[b]).count("1")
+            if distance <= max_distance:
+                pairs.append((a, b, distance))
+    return pairs
+
+
+def find_near_duplicates(store, digests, max_distance=NEAR_DUPLICATE_DISTANCE):
+    """Runs dHash once per unique object and returns near-duplicate (name_a, name_b, distance) rows."""
+    names = defaultdict(list)
+    for name, digest in digests.items():
+        names[digest].append(name)
+    hashes = {}
+    for digest in names:
+        try:
+            hashes[digest] = dhash(store.object_path(digest))
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Could not decode {names[digest][0]}: {e}")
+    return [(names[a][0], names[b][0], distance)
+            for a, b, distance in near_duplicate_pairs(hashes, max_distance)]
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python -m common.image_store <images_dir> [--near-duplicates]")
+        return
+    directory = sys.argv[1].rstrip("/\\")
+    store = ImageStore(os.path.join(os.path.dirname(directory) or ".", "image_store"))
+    digests = store.dedup_directory(directory)
+    if "--near-duplicates" in sys.argv:
+        rows = find_near_duplicates(store, digests)
+        report = directory + "_near_duplicates.csv"
+        with open(report, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["image_a", "image_b", "distance"])
+            writer.writerows(rows)
+        print(f"[INFO] {len(rows)} near-duplicate pairs written to {report}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Single-pass infobox indexing and the declarative field specs shared by the
+treaty and war extractors.
+
+`InfoboxIndex(page)` walks the page's <th> cells once and maps each label
+to its header cell; the matching <td> is looked up lazily and memoized. A
+field spec then says, for every output field, which labels to try (first
+one present wins) and how to parse that label's cell. Extraction costs one
+pass over the document plus a constant amount of work per field, instead of
+one full-document search per label.
+
+Field spec entries are `Field(target, sources, mode)`:
+    target   path into the record, e.g. ("period",) or ("location", "position")
+    sources  ((label, parser), ...); parser(td) returns the value or None
+    mode     "set" replaces the value, "merge" updates a dict, "extend" appends to a list
+"""
+
+from collections import namedtuple
+
+Field = namedtuple("Field", "target sources mode")
+
+
+class InfoboxIndex:
+    """label -> header cell map built in one pass over the page's <th> elements."""
+
+    def __init__(self, page):
+        self._headers = {}
+        for th in page.css("th"):
+            self._headers.setdefault(th.text(strip=True), th)
+        self._cells = {}
+
+    def __contains__(self, label):
+        return label in self._headers
+
+    def cell(self, label):
+        """The <td> that follows the `label` header (like th.find_next('td')), or None."""
+        if label not in self._cells:
+            th = self._headers.get(label)
+            self._cells[label] = th.find_next("td") if th else None
+        return self._cells[label]
+
+
+def apply_fields(data, index, fields):
+    """Fills `data` in place from the infobox according to a field spec."""
+    for field in fields:
+        for label, parse in field.sources:
+            if label not in index:
+                continue
+            try:
+                td = index.cell(label)
+                value = parse(td) if td else None
+                if value:
+                    _store(data, field.target, value, field.mode)
+            except Exception as e:
+                print(f"Error processing {'.'.join(field.target)}: {e}")
+            break
+    return data
+
+
+def _store(data, target, value, mode):
+    parent = data
+    for key in target[:-1]:
+        parent = parent[key]
+    key = target[-1]
+    if mode == "merge":
+        parent[key].update(value)
+    elif mode == "extend":
+        parent[key].extend(value)
+    else:
+        parent[key] = value
+
+
+# -------------------------
+# Cell parsers
+# -------------------------
+def cell_text(td):
+    return td.text(strip=True)
+
+
+def dashed_text(td):
+    return td.text(strip=True).replace('–', '-').replace('—', '-')
+
+
+def start_year(td):
+    return {"start_year": dashed_text(td)}
+
+
+def end_year(td):
+    return {"end_year": dashed_text(td)}
+
+
+def year_range(td):
+    """"1200 - 1210" -> both years; a single year fills start and end."""
+    years = [y.strip() for y in dashed_text(td).split('-') if y.strip()]
+    if len(years) == 2:
+        return {"start_year": years[0], "end_year": years[1]}
+    if len(years) == 1:
+        return {"start_year": years[0], "end_year": years[0]}
+    return None
+
+
+def lines_text(td):
+    """Cell text with <br> line breaks kept as ', '."""
+    for br in td.css("br"):
+        br.replace_with(", ")
+    return td.text(strip=True)
+
+
+def linked_names(td):
+    """One {"name"} per linked party, skipping file links (flags, seals)."""
+    for br in td.css('hr, br'):
+        br.replace_with('، ')
+    return [{"name": a.text(strip=True)} for a in td.css('a')
+            if a.has_attr('title') and not (a.get('href') or '').startswith('/wiki/پرونده:')]
+
+
+def split_names(td):
+    """One {"name"} per party in "A، B و C" style text."""
+    parts = td.text(strip=True).replace('،', 'و').split('و')
+    return [{"name": part.strip()} for part in parts if part.strip()]
+
+
+def list_items(td):
+    """The cell's first paragraph followed by each of its list items."""
+    items = []
+    p_tag = td.css_first('p')
+    if p_tag:
+        items.append(p_tag.text(strip=True))
+    items.extend(li.text(strip=True) for li in td.css('li'))
+    return [item for item in items if item]
+
+
+def first_two_parties(td):
+    """"A و B" -> "A - B" (the two sides of a war)."""
+    return " - ".join(part.strip() for part in td.text(strip=True).split('و')[:2] if part.strip())
+
+
+def first_two_lines(td):
+    """First two lines of a per-side cell (commanders, casualties) joined with " - "."""
+    return " - ".join(line.strip() for line in td.text(separator="|", strip=True).split('|')[:2])
+
+
+def joined_items(td):
+    return " - ".join(list_items(td))
+
+
+def casualties(td):
+    lines = [line.strip() for line in td.text(separator="|", strip=True).split('|')]
+    if len(lines) == 2:
+        return {"side_1": lines[0], "side_2": lines[1]}
+    return {"summary": " - ".join(lines)}
+
+
+# -------------------------
+# Field specs
+# -------------------------
+TREATY_FIELDS = [
+    Field(("period",), (("تاریخ امضا", start_year), ("تاریخ ایجاد", start_year), ("تاریخ", year_range)), "merge"),
+    Field(("period",), (("تاریخ اجرا", end_year),), "merge"),
+    Field(("belligerents",), (("امضاکنندگان", linked_names), ("طرف‌ها", split_names)), "extend"),
+    Field(("result",), (("نتیجه", cell_text),), "set"),
+    Field(("impact",), (("نتایج", list_items),), "extend"),
+    Field(("location", "position"), (("مکان امضا", lines_text), ("موقعیت", cell_text)), "set"),
+]
+
+WAR_FIELDS = [
+    Field(("period",), (("تاریخ", year_range),), "merge"),
+    Field(("position",), (("موقعیت", cell_text),), "set"),
+    Field(("belligerents", "names"), (("طرف‌ها", first_two_parties),), "set"),
+    Field(("belligerents", "leaders"), (("فرماندهان و رهبران", first_two_lines),), "set"),
+    Field(("result",), (("نتیجه", cell_text),), "set"),
+    Field(("impact",), (("نتایج", joined_items),), "set"),
+    Field(("casualties",), (("تلفات و خسارات", casualties),), "merge"),
+]
@@ -0,0 +1,102 @@
+"""
+Streaming JSONL output with resume-by-URL for the article crawlers.
+
+Records are appended to a `.jsonl` file as soon as they are produced, so
+memory no longer grows with the corpus and a crash loses at most the page
+being written. Every finished URL (with or without a record, e.g. pages
+skipped as "not a treaty") is logged in a `<output>.done` index next to it
+together with the JSONL size at that point. On reopen the writer:
+
+- loads the finished URLs so the crawler can skip them, and
+- truncates any JSONL bytes written after the last indexed URL (a record
+  whose index line never made it to disk), so nothing is duplicated.
+
+`export_json()` turns the JSONL into the pretty `json.dump(..., indent=2)`
+array the rest of the pipeline used to read, streaming one record at a time.
+"""
+
+import json
+import os
+import textwrap
+
+
+class JsonlWriter:
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + ".done"
+        self.done = set()
+        self.records = 0
+
+        offset = index_size = 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n") or b"\t" not in line:
+                        break  # partial line from a crash
+                    size, url = line[:-1].decode("utf-8").split("\t", 1)
+                    offset = int(size)
+                    index_size += len(line)
+                    self.done.add(url)
+            # Only trust (and trim) the JSONL when its index exists; never truncate an unindexed file
+            self._truncate(self.path, offset)
+            self._truncate(self.index_path, index_size)
+
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                self.records = sum(1 for _ in f)
+        self._out = open(self.path, "ab")
+        self._index = open(self.index_path, "ab")
+
+    @staticmethod
+    def _truncate(path, size):
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            with open(path, "r+b") as f:
+                f.truncate(size)
+
+    def __contains__(self, url):
+        return url in self.done
+
+    def write(self, url, record=None):
+        """Marks `url` as finished, appending `record` to the JSONL first if given."""
+        if record is not None:
+            self._out.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+            self._out.flush()
+            self.records += 1
+        self._index.write(f"{self._out.tell()}\t{url}\n".encode("utf-8"))
+        self._index.flush()
+        self.done.add(url)
+
+    def close(self):
+        self._out.close()
+        self._index.close()
+
+
+def iter_jsonl(path):
+    """Yields the records of a JSONL file one at a time."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_json_array(records, json_path, indent=2):
+    """
+    Writes `records` (any iterable) as a pretty JSON array, one record at a time, with the
+    same layout as json.dump(list(records), indent=indent). Returns the record count.
+    """
+    count = 0
+    tmp = json_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("[")
+        for record in records:
+            f.write(",\n" if count else "\n")
+            f.write(textwrap.indent(json.dumps(record, ensure_ascii=False, indent=indent), " " * indent))
+            count += 1
+        f.write("\n]" if count else "]")
+    os.replace(tmp, json_path)
+    return count
+
+
+def export_json(jsonl_path, json_path):
+    """Writes the records as a pretty JSON array (same layout as json.dump(records, indent=2))."""
+    return write_json_array(iter_jsonl(jsonl_path), json_path)
@@ -0,0 +1,160 @@
+"""
+MediaWiki action-API backend for the Wikipedia crawlers.
+
+Instead of downloading one rendered HTML page per round trip, this client
+talks to /w/api.php:
+- category_members() pages through list=categorymembers with continuation
+  tokens, so large categories are not cut off at 200 entries.
+- pages() asks for up to 50 titles per request and merges the extracts,
+  links and latest revision IDs across all continuation responses.
+
+Every response can be appended to a JSONL file (`record_to=...`) and served
+back later by common/replay_server.py, which lets the crawlers be exercised
+offline against real, recorded API answers.
+"""
+
+import json
+from urllib.parse import quote, unquote
+
+from common.async_fetch import make_session
+
+API_URL = "https://fa.wikipedia.org/w/api.php"
+BASE_URL = "https://fa.wikipedia.org"
+MAX_TITLES = 50  # MediaWiki's per-request limit for anonymous clients
+CATEGORY_PREFIX = "رده:"
+TITLE_SAFE_CHARS = ";@$!*(),/~:"  # left unescaped by MediaWiki's wfUrlencode
+MAXLAG = 5  # seconds of replica lag after which the API asks us to back off (see common/rate_limiter.py)
+
+
+def title_from_url(url):
+    """Turns a /wiki/ URL (raw or percent-encoded) into a page title."""
+    path = url.split("/wiki/", 1)[1] if "/wiki/" in url else url
+    return unquote(path.split("#", 1)[0]).replace("_", " ").strip()
+
+
+def url_from_title(title, base_url=BASE_URL):
+    """Builds the /wiki/ URL the HTML crawlers use for a page title."""
+    return f"{base_url}/wiki/{quote(title.replace(' ', '_'), safe=TITLE_SAFE_CHARS)}"
+
+
+def _batches(items, size=MAX_TITLES):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class MediaWikiClient:
+    """Thin wrapper around the action API with continuation and batching."""
+
+    def __init__(self, api_url=API_URL, session=None, timeout=30, record_to=None):
+        self.api_url = api_url
+        # Default: keep-alive, User-Agent and the host's rate limiter (maxlag / 429 back-off)
+        self.session = session or make_session()
+        self.timeout = timeout
+        self.record_to = record_to
+        self.requests_made = 0
+
+    def _get(self, params):
+        params = dict(params, action="query", format="json", formatversion=2, maxlag=MAXLAG)
+        resp = self.session.get(self.api_url, params=params, timeout=self.timeout)
+        resp.raise_for_status()
+        data = resp.json()
+        self.requests_made += 1
+        if self.record_to:
+            with open(self.record_to, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"params": params, "response": data}, ensure_ascii=False) + "\n")
+        if "error" in data:
+            raise RuntimeError(f"MediaWiki API error: {data['error'].get('info', data['error'])}")
+        return data
+
+    def query(self, params):
+        """Yields every response of a query, following `continue` tokens until exhausted."""
+        cont = {}
+        while True:
+            data = self._get({**params, **cont})
+            yield data
+            if "continue" not in data:
+                break
+            cont = data["continue"]
+
+    def category_members(self, category, namespace=0):
+        """Yields the titles of all pages in `category` (with or without the رده: prefix)."""
+        if not category.startswith(CATEGORY_PREFIX):
+            category = CATEGORY_PREFIX + category
+        params = {
+            "list": "categorymembers",
+            "cmtitle": category,
+            "cmnamespace": namespace,
+            "cmtype": "page",
+            "cmlimit": "max",
+        }
+        for data in self.query(params):
+            for member in data.get("query", {}).get("categorymembers", []):
+                yield member["title"]
+
+    def pages(self, titles, props=("extracts", "links", "revisions")):
+        """
+        Fetches page data for many titles at once, MAX_TITLES per request.
+
+        Args:
+            titles (list): Page titles; redirects and title normalization are followed.
+            props (tuple): Any of "extracts" (plain-text lead), "links" (article links)
+                and "revisions" (latest revision ID).
+
+        Returns:
+            dict: Requested title -> {"title", "pageid", "revid", "extract", "links"};
+                  titles that do not exist are left out.
+        """
+        results = {}
+        for batch in _batches(list(dict.fromkeys(titles))):
+            params = {"titles": "|".join(batch), "redirects": 1, "prop": "|".join(props)}
+            if "extracts" in props:
+                params.update({"exintro": 1, "explaintext": 1, "exlimit": "max"})
+            if "links" in props:
+                params.update({"plnamespace": 0, "pllimit": "max"})
+            if "revisions" in props:
+                params.update({"rvprop": "ids"})
+
+            aliases = {}
+            merged = {}
+            for data in self.query(params):
+                query = data.get("query", {})
+                for item in query.get("normalized", []) + query.get("redirects", []):
+                    aliases[item["from"]] = item["to"]
+                for page in query.get("pages", []):
+                    if page.get("missing") or page.get("invalid"):
+                        continue
+                    entry = merged.setdefault(page["title"], {
+                        "title": page["title"], "pageid": page.get("pageid"),
+                        "revid": None, "extract": None, "links": [],
+                    })
+                    if page.get("extract"):
+                        entry["extract"] = page["extract"]
+                    if page.get("revisions"):
+                        entry["revid"] = page["revisions"][0].get("revid")
+                    entry["links"].extend(link["title"] for link in page.get("links", []))
+
+            for title in batch:
+                resolved = title
+                seen = set()
+                while resolved in aliases and resolved not in seen:
+                    seen.add(resolved)
+                    resolved = aliases[resolved]
+                if resolved in merged:
+                    results[title] = merged[resolved]
+        return results
+
+    def links_for_urls(self, urls):
+        """Returns {url: set of linked article URLs}, expanding category URLs to their members."""
+        found = {}
+        titles = {}
+        for url in urls:
+            title = title_from_url(url)
+            if title.startswith(CATEGORY_PREFIX):
+                found[url] = {url_from_title(t) for t in self.category_members(title)}
+            else:
+                titles[url] = title
+        pages = self.pages(list(titles.values()), props=("links",))
+        for url, title in titles.items():
+            page = pages.get(title)
+            found[url] = {url_from_title(t) for t in page["links"]} if page else set()
+        return found
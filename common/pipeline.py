@@ -0,0 +1,75 @@
+"""
+Staged fetch -> parse/extract -> write pipeline for the article crawlers.
+
+    fetch_pages (asyncio + threads)  ->  ProcessPoolExecutor  ->  caller (single writer)
+          network-bound                  CPU-bound, all cores      in input order
+
+Downloads keep running while worker processes parse and extract earlier
+pages, and the caller consumes finished records one at a time. Both hand-offs
+are bounded: fetch_pages never runs more than `fetch_window` pages ahead, and
+at most `workers * window_per_worker` pages wait in or for the pool. When
+extraction falls behind, the caller blocks on the oldest record, stops pulling
+pages, and the fetchers pause, so memory stays flat whatever the crawl size.
+
+`extract` runs in another process and must be a module-level function
+(picklable); it receives the page from common.html_backend.parse_html.
+
+Usage:
+    for url, record, error in extract_pages(urls, extract_structured_data):
+        ...
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from common.async_fetch import fetch_pages
+from common.html_backend import parse_html
+
+WORKERS = os.cpu_count() or 2
+
+
+def _extract_html(extract, html, backend):
+    return extract(parse_html(html, backend))
+
+
+def _resolve(entry):
+    url, future, error = entry
+    if error is not None:
+        return url, None, error
+    try:
+        return url, future.result(), None
+    except Exception as e:
+        return url, None, e
+
+
+def extract_pages(urls, extract, backend=None, workers=WORKERS, window_per_worker=4, fetch_window=64,
+                  **fetch_kwargs):
+    """
+    Fetches `urls` and runs `extract(parse_html(html, backend))` for each page on a process pool.
+
+    Args:
+        urls (list): Absolute URLs to download.
+        extract (callable): Module-level function page -> record.
+        backend (str): HTML backend for parse_html (None = fastest installed).
+        workers (int): Extraction processes.
+        window_per_worker (int): Pages queued per worker before the pipeline applies backpressure.
+        fetch_window (int): Pages fetch_pages may download ahead of extraction.
+        **fetch_kwargs: Passed to fetch_pages (max_per_host, requests_per_second, session, ...).
+
+    Yields:
+        tuple: (url, record, error) in input order; exactly one of record/error is None.
+    """
+    window = max(1, workers * window_per_worker)
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for url, html, error in fetch_pages(urls, window=fetch_window, **fetch_kwargs):
+            if error is not None:
+                pending.append((url, None, error))
+            else:
+                pending.append((url, executor.submit(_extract_html, extract, html, backend), None))
+            # Hand over finished records right away; block on the oldest one once the pool is full
+            while pending and (len(pending) >= window or pending[0][1] is None or pending[0][1].done()):
+                yield _resolve(pending.popleft())
+        while pending:
+            yield _resolve(pending.popleft())
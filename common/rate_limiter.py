@@ -0,0 +1,153 @@
+"""
+Adaptive, server-aware rate limiting for every HTTP request the crawlers make.
+
+One `AdaptiveRateLimiter` (a token bucket) is shared per host by all threads
+of a process. Its rate follows the server's behaviour (AIMD):
+
+- every healthy response adds INCREASE_STEP requests/second, up to max_rate;
+- a 429 / 503, or a MediaWiki `maxlag` error, halves the rate (down to
+  min_rate) and pauses the host for the server's `Retry-After`, or for an
+  exponential backoff with jitter when the server gives no hint.
+
+`ThrottledAdapter` applies the limiter below the session layer: it takes a
+token before each request and retries throttled responses after the pause.
+make_session() mounts it, so crawler sessions, cached sessions (cache hits
+never reach the network and cost no token) and the MediaWiki client are all
+throttled the same way.
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+
+DEFAULT_RATE = 5.0      # requests/second a host starts at
+MIN_RATE = 0.2
+MAX_RATE = 50.0
+INCREASE_STEP = 0.1     # requests/second added per healthy response
+BACKOFF_BASE = 1.0      # seconds; doubled per consecutive throttled attempt
+BACKOFF_MAX = 120.0
+THROTTLE_RETRIES = 5
+THROTTLE_STATUSES = (429, 503)
+
+
+class AdaptiveRateLimiter:
+    """Thread-safe token bucket whose rate adapts to the server's responses."""
+
+    def __init__(self, rate=DEFAULT_RATE, min_rate=MIN_RATE, max_rate=MAX_RATE, burst=2):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.throttled = 0  # throttled responses seen
+
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def acquire(self):
+        """Blocks until the next request to this host may start."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve a token even if the bucket is empty; the deficit is the wait
+            self._tokens -= 1
+            wait = max(0.0, self._paused_until - now) + max(0.0, -self._tokens / self.rate)
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause_remaining(self):
+        return max(0.0, self._paused_until - time.monotonic())
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + INCREASE_STEP)
+
+    def on_throttle(self, retry_after=None, attempt=0):
+        """Halves the rate and pauses the host; returns the pause in seconds."""
+        if retry_after is None:
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.5)
+        else:
+            delay = retry_after + random.uniform(0, 1)
+        with self._lock:
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        return delay
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(host, rate=DEFAULT_RATE, max_rate=None):
+    """
+    The process-wide limiter for `host`. `rate` is the starting rate of a new limiter.
+    `max_rate` is a hard ceiling (MAX_RATE if never given): it also lowers the ceiling
+    and current rate of an existing limiter, whichever caller created it first.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            ceiling = MAX_RATE if max_rate is None else max_rate
+            limiter = _limiters[host] = AdaptiveRateLimiter(min(rate, ceiling), max_rate=ceiling)
+        elif max_rate is not None and max_rate < limiter.max_rate:
+            with limiter._lock:
+                limiter.max_rate = max_rate
+                limiter.rate = min(limiter.rate, max_rate)
+        return limiter
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def throttle_signal(resp):
+    """Returns (throttled, retry_after) for a response."""
+    maxlag = resp.headers.get("MediaWiki-API-Error") == "maxlag"
+    if resp.status_code in THROTTLE_STATUSES or maxlag:
+        return True, parse_retry_after(resp.headers.get("Retry-After"))
+    return False, None
+
+
+class ThrottledAdapter(HTTPAdapter):
+    """HTTPAdapter that waits for the host's limiter and retries throttled responses."""
+
+    __attrs__ = HTTPAdapter.__attrs__ + ["retries"]
+
+    def __init__(self, retries=THROTTLE_RETRIES, **kwargs):
+        self.retries = retries
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        limiter = get_limiter(urlsplit(request.url).netloc)
+        for attempt in range(self.retries + 1):
+            limiter.acquire()
+            resp = super().send(request, **kwargs)
+            throttled, retry_after = throttle_signal(resp)
+            if not throttled:
+                limiter.on_success()
+                return resp
+            delay = limiter.on_throttle(retry_after, attempt)
+            if attempt == self.retries:
+                return resp
+            reason = "maxlag" if resp.status_code not in THROTTLE_STATUSES else resp.status_code
+            print(f"[WARN] {reason} from {urlsplit(request.url).netloc}, "
+                  f"backing off {delay:.1f}s (rate now {limiter.rate:.2f}/s)")
+            resp.close()
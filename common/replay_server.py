@@ -0,0 +1,74 @@
+"""
+Local stand-in for /w/api.php that replays recorded MediaWiki responses.
+
+Record a session once against the real API:
+    client = MediaWikiClient(record_to="fawiki_api.jsonl")
+    ...
+
+Then point the crawlers at the replay server instead of fa.wikipedia.org:
+    server = ReplayServer("fawiki_api.jsonl").start()
+    client = MediaWikiClient(api_url=server.api_url)
+    ...
+    server.stop()
+
+Requests are matched on their full, order-independent parameter set. Unknown
+requests get a 404 so a missing recording is noticed instead of hitting the
+network.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+
+def _key(params):
+    return tuple(sorted((str(k), str(v)) for k, v in params.items()))
+
+
+class ReplayServer:
+    def __init__(self, fixture_path, host="127.0.0.1", port=0):
+        self.responses = {}
+        with open(fixture_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    self.responses[_key(item["params"])] = item["response"]
+        self.requests_served = 0
+
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                data = replay.responses.get(_key(dict(parse_qsl(parts.query, keep_blank_values=True))))
+                if parts.path != "/w/api.php" or data is None:
+                    self.send_error(404, "No recorded response for this request")
+                    return
+                replay.requests_served += 1
+                body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._thread = None
+
+    @property
+    def api_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/w/api.php"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
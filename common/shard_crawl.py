@@ -0,0 +1,238 @@
+"""
+Multi-process, hash-sharded BFS crawler built on Frontier and UrlHashSet.
+
+Each worker process owns one hash partition of the URL space
+(`url_hash(url) % num_shards`) together with that partition's Frontier and
+visited set. Workers never expand a URL they do not own: every discovered
+link is routed through a shared SQLite store into the owner's inbox, and
+the owner deduplicates it against its own visited set. Since every URL has
+exactly one owner, dedup is global without any shared set.
+
+The same store holds a per-host "next allowed request" time that workers
+reserve in a write transaction before each request, spaced by the worker's
+current adaptive rate for that host (common/rate_limiter.py), so politeness
+and server back-off hold per host across all workers. Several machines can run disjoint shard ids
+against one store on shared storage.
+
+Inbox rows are only deleted after the owner's frontier commit, output write
+and visited update, so a crash at any point re-delivers, never loses, links.
+"""
+
+import multiprocessing
+import os
+import sqlite3
+import time
+from urllib.parse import urlsplit
+
+from common.frontier import Frontier
+from common.rate_limiter import get_limiter
+from common.visited import UrlHashSet, url_hash
+
+POLL_INTERVAL = 0.5  # seconds an idle worker waits before checking its inbox again
+
+
+def shard_of(url, num_shards):
+    return url_hash(url) % num_shards
+
+
+class SharedStore:
+    """Inboxes, per-host politeness slots and worker status shared by all shards."""
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS inbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                shard INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                depth INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS inbox_shard ON inbox(shard, id);
+            CREATE TABLE IF NOT EXISTS hosts (host TEXT PRIMARY KEY, next_at REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS workers (shard INTEGER PRIMARY KEY, idle INTEGER NOT NULL);
+        """)
+
+    def register(self, shards):
+        self._db.executemany("INSERT OR REPLACE INTO workers (shard, idle) VALUES (?, 0)",
+                             [(s,) for s in shards])
+
+    def send(self, links, num_shards):
+        """Routes (url, depth) pairs to the inbox of the shard that owns each url."""
+        if links:
+            rows = [(shard_of(url, num_shards), url, depth) for url, depth in links]
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.executemany("INSERT INTO inbox (shard, url, depth) VALUES (?, ?, ?)", rows)
+            self._db.execute("COMMIT")
+
+    def receive(self, shard, after_id=0, limit=1000):
+        """Returns up to `limit` (id, url, depth) rows for `shard` newer than `after_id`, without removing them."""
+        return self._db.execute(
+            "SELECT id, url, depth FROM inbox WHERE shard = ? AND id > ? ORDER BY id LIMIT ?",
+            (shard, after_id, limit)
+        ).fetchall()
+
+    def ack(self, ids):
+        if ids:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.executemany("DELETE FROM inbox WHERE id = ?", [(i,) for i in ids])
+            self._db.execute("COMMIT")
+
+    def wait_for_host(self, host, delay, not_before=0.0):
+        """Reserves the next request slot for `host` across all workers and sleeps until it."""
+        self._db.execute("BEGIN IMMEDIATE")
+        row = self._db.execute("SELECT next_at FROM hosts WHERE host = ?", (host,)).fetchone()
+        now = time.time()
+        slot = max(now, not_before, row[0] if row else now)
+        self._db.execute("INSERT OR REPLACE INTO hosts (host, next_at) VALUES (?, ?)", (host, slot + delay))
+        self._db.execute("COMMIT")
+        if slot > now:
+            time.sleep(slot - now)
+
+    def set_idle(self, shard, idle):
+        self._db.execute("UPDATE workers SET idle = ? WHERE shard = ?", (int(idle), shard))
+
+    def all_done(self):
+        """True once every worker is idle and no link is waiting in any inbox."""
+        self._db.execute("BEGIN")
+        busy = self._db.execute("SELECT COUNT(*) FROM workers WHERE idle = 0").fetchone()[0]
+        queued = self._db.execute("SELECT COUNT(*) FROM inbox").fetchone()[0]
+        self._db.execute("COMMIT")
+        return busy == 0 and queued == 0
+
+    def close(self):
+        self._db.close()
+
+
+def shard_output_path(output_path, shard):
+    return f"{output_path}.shard{shard}"
+
+
+def run_worker(shard, num_shards, store_path, state_dir, output_path, fetch_links,
+               max_depth, batch_size=1, commit_every=500, on_finish=None):
+    """
+    Crawls one shard until the whole sharded crawl is finished.
+
+    Args:
+        fetch_links (callable): urls -> {url: set of linked urls}; must be picklable.
+        batch_size (int): Pages expanded per fetch_links call (e.g. 50 for the API backend).
+        on_finish (callable): Called with the shard id in the worker once it is done; must be picklable.
+    """
+    store = SharedStore(store_path)
+    frontier = Frontier(os.path.join(state_dir, f"frontier.shard{shard}.sqlite"), batch_size=commit_every)
+    visited = UrlHashSet(os.path.join(state_dir, f"visited.shard{shard}.bin"))
+    out_path = shard_output_path(output_path, shard)
+    new_links = {}
+    received = []
+    last_received = 0
+
+    def before_commit():
+        # Links reach the shard output before their pages are marked done
+        if new_links:
+            with open(out_path, "a", encoding="utf-8") as f:
+                f.write("".join(url + "\n" for url in new_links))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def on_commit():
+        for url in new_links:
+            visited.add(url)
+        new_links.clear()
+        store.ack(received)
+        received.clear()
+
+    frontier.before_commit = before_commit
+    frontier.on_commit = on_commit
+    expanded = 0
+
+    while True:
+        # 1. Dedup links routed to this shard against its own visited set
+        incoming = store.receive(shard, after_id=last_received)
+        for row_id, url, depth in incoming:
+            last_received = row_id
+            if url not in new_links and url not in visited:
+                new_links[url] = None
+                if depth < max_depth:
+                    frontier.push(url, depth)
+            received.append(row_id)
+        if incoming:
+            store.set_idle(shard, False)
+
+        # 2. Expand the next pages this shard owns
+        batch = frontier.pop_batch(batch_size, max_depth=max_depth)
+        if not batch:
+            frontier.commit()
+            if not incoming:
+                store.set_idle(shard, True)
+                if store.all_done():
+                    break
+                time.sleep(POLL_INTERVAL)
+            continue
+
+        store.set_idle(shard, False)
+        hosts = {urlsplit(url).netloc for url, _ in batch}
+        for host in sorted(hosts):
+            # A back-off seen by this worker pushes the shared slot out for every worker
+            limiter = get_limiter(host)
+            store.wait_for_host(host, 1.0 / limiter.rate, not_before=time.time() + limiter.pause_remaining())
+        found = fetch_links([url for url, _ in batch])
+
+        outgoing = []
+        for url, depth in batch:
+            outgoing.extend((link, depth + 1) for link in found.get(url, ()))
+        store.send(outgoing, num_shards)
+        for url, _ in batch:
+            frontier.mark_done(url)
+        expanded += len(batch)
+        print(f"[shard {shard}] expanded {expanded} pages, {len(visited) + len(new_links)} urls owned")
+
+    frontier.close()
+    visited.close()
+    store.close()
+    if on_finish is not None:
+        on_finish(shard)
+
+
+def run_sharded(start_urls, fetch_links, num_shards, store_path, state_dir, output_path,
+                max_depth, batch_size=1, local_shards=None, on_finish=None):
+    """
+    Seeds the shared store and runs one worker process per local shard.
+
+    `local_shards` selects which shard ids run on this machine (default: all),
+    so several hosts can split the crawl by pointing at the same store.
+    Shard outputs are appended to `output_path` once the crawl finishes.
+    `on_finish(shard)` runs inside each worker when it is done (e.g. to report
+    per-process stats); anything a worker opens lazily stays in that worker.
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    local_shards = list(range(num_shards)) if local_shards is None else list(local_shards)
+
+    store = SharedStore(store_path)
+    store.register(local_shards)
+    store.send([(url, 0) for url in start_urls], num_shards)
+    store.close()
+
+    workers = [
+        multiprocessing.Process(
+            target=run_worker,
+            args=(shard, num_shards, store_path, state_dir, output_path, fetch_links,
+                  max_depth, batch_size),
+            kwargs={"on_finish": on_finish},
+        )
+        for shard in local_shards
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    # Merge shard outputs into the single links file
+    with open(output_path, "a", encoding="utf-8") as out:
+        for shard in local_shards:
+            path = shard_output_path(output_path, shard)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        out.write(line)
+                os.remove(path)
@@ -0,0 +1,565 @@
+"""
+Offline ingestion of fawiki XML dumps.
+
+Builds treaty and war records straight from a pages-articles `.bz2` dump,
+without a single request to fa.wikipedia.org. The records follow the same
+schemas as `extract_structured_data` in HW1/Code/Treaties/FinalCrawler.py
+and HW1/Code/War/WarCrawlerv3.py (title, infobox fields, lead text, ...).
+
+Two modes, both with bounded memory:
+- Multistream dump + index (fawiki-*-pages-articles-multistream.xml.bz2 and
+  its -index.txt.bz2): the file is a series of independent bz2 streams of
+  ~100 pages each, so worker processes seek, decompress and parse their own
+  ranges in parallel.
+- Plain `.bz2` dump: one reader decompresses and iterparses the XML, clearing
+  every page after use, and ships batches of raw pages to worker processes
+  for wikitext parsing and record extraction.
+
+Usage (from the repository root):
+    python -m common.wiki_dump
+"""
+
+import bz2
+import html
+import json
+import os
+import re
+import sys
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from common.mediawiki_api import url_from_title
+
+# --- Configuration ---
+DUMP_FILE = "fawiki-latest-pages-articles-multistream.xml.bz2"
+INDEX_FILE = "fawiki-latest-pages-articles-multistream-index.txt.bz2"  # None for plain dumps
+OUTPUT_DIR = "."
+WORKERS = os.cpu_count() or 2
+STREAMS_PER_TASK = 20   # bz2 streams (~100 pages each) handed to a worker at once
+PAGES_PER_TASK = 500    # raw pages per task in plain-dump mode
+WINDOW_PER_WORKER = 2   # tasks in flight per worker; bounds memory
+
+# Categories the HTML treaty crawler walks (FinalCrawler.list_urls)
+TREATY_CATEGORIES = {
+    "معاهده‌های ایران",
+    "ائتلاف‌های نظامی ایران",
+    "پیمان‌نامه‌های شاهنشاهی ساسانی",
+    "پیمان‌های شاهنشاهی اشکانیان",
+    "معاهده‌های افشاریان",
+    "معاهده‌های دودمان پهلوی",
+    "معاهده‌های سلسله قاجاریان",
+    "معاهده‌های صفویان",
+    "معاهده‌های صلح ایران",
+    "معاهده‌های معاصر ایران",
+    "معاهده‌های هخامنشیان",
+}
+TREATY_KEYWORDS = ["معاهده", "پیمان", "توافق", "صلح", "قرارداد"]
+WAR_INFOBOXES = ("جعبه اطلاعات جنگ", "جعبه اطلاعات نبرد", "جعبه اطلاعات درگیری نظامی",
+                 "infobox military conflict", "infobox war", "infobox battle")
+WAR_CATEGORY_KEYWORD = "ایران"
+
+INFOBOX_PREFIXES = ("جعبه اطلاعات", "infobox")
+FILE_PREFIXES = ("پرونده:", "file:", "image:", "تصویر:")
+CATEGORY_PREFIXES = ("رده:", "category:")
+# Templates whose positional arguments are visible text in the rendered page
+INLINE_TEMPLATES = ("nowrap", "ubl", "unbulleted list", "plainlist", "flatlist", "hlist",
+                    "فهرست بی‌گلوله", "flagcountry", "flag", "پرچم", "lang")
+
+_COMMENT_RE = re.compile(r"<!--.*?-->", re.S)
+_REF_RE = re.compile(r"<ref[^>/]*/>|<ref[^>]*>.*?</ref>", re.S | re.I)
+_REF_BODY_RE = re.compile(r"<ref[^>/]*>(.*?)</ref>", re.S | re.I)
+_TAG_RE = re.compile(r"<[^>]+>")
+_BR_RE = re.compile(r"<br\s*/?>", re.I)
+_HR_RE = re.compile(r"<hr\s*/?>", re.I)
+_EXTLINK_RE = re.compile(r"\[(?:https?:)?//[^\s\]]+\s*([^\]]*)\]")
+_QUOTES_RE = re.compile(r"'{2,}")
+_HEADING_RE = re.compile(r"^(=+)\s*(.*?)\s*\1\s*$")
+_TOKEN_RE = re.compile(r"\{\{|\}\}|\[\[|\]\]|\|")
+_PAGE_RE = re.compile(rb"<page>.*?</page>", re.S)
+
+
+# -------------------------
+# Wikitext helpers
+# -------------------------
+def _template_spans(text):
+    """Yields (start, end) of every top-level {{...}} in `text`."""
+    depth = 0
+    start = 0
+    for m in re.finditer(r"\{\{|\}\}", text):
+        if m.group() == "{{":
+            if depth == 0:
+                start = m.start()
+            depth += 1
+        elif depth:
+            depth -= 1
+            if depth == 0:
+                yield start, m.end()
+
+
+def _link_spans(text):
+    """Yields (start, end) of every top-level [[...]] in `text`."""
+    depth = 0
+    start = 0
+    for m in re.finditer(r"\[\[|\]\]", text):
+        if m.group() == "[[":
+            if depth == 0:
+                start = m.start()
+            depth += 1
+        elif depth:
+            depth -= 1
+            if depth == 0:
+                yield start, m.end()
+
+
+def _split_top_level(body):
+    """Splits a template body on '|' that are not nested inside {{ }} or [[ ]]."""
+    parts = []
+    depth = 0
+    last = 0
+    for m in _TOKEN_RE.finditer(body):
+        tok = m.group()
+        if tok in ("{{", "[["):
+            depth += 1
+        elif tok in ("}}", "]]"):
+            depth = max(0, depth - 1)
+        elif depth == 0:
+            parts.append(body[last:m.start()])
+            last = m.end()
+    parts.append(body[last:])
+    return parts
+
+
+def parse_template(raw):
+    """Returns (name, params) for a '{{name|a=b|c}}' string; positional args get keys '1', '2', ..."""
+    parts = _split_top_level(raw[2:-2])
+    name = parts[0].strip()
+    params = {}
+    position = 0
+    for part in parts[1:]:
+        key, sep, value = part.partition("=")
+        if sep and "{{" not in key and "[[" not in key:
+            params[key.strip()] = value.strip()
+        else:
+            position += 1
+            params[str(position)] = part.strip()
+    return name, params
+
+
+def _replace_spans(text, spans, replace):
+    out = []
+    last = 0
+    for start, end in spans:
+        out.append(text[last:start])
+        out.append(replace(text[start:end]))
+        last = end
+    out.append(text[last:])
+    return "".join(out)
+
+
+def _render_template(raw):
+    name, params = parse_template(raw)
+    lowered = name.lower()
+    if lowered.startswith(INLINE_TEMPLATES):
+        args = [strip_markup(v) for k, v in params.items() if k.isdigit()]
+        if lowered.startswith(("flag", "پرچم", "lang")):
+            args = args[-1:]
+        return "\n".join(a for a in args if a)
+    return ""
+
+
+def _render_link(raw):
+    inner = raw[2:-2]
+    target, _, label = inner.partition("|")
+    lowered = target.strip().lower()
+    if lowered.startswith(FILE_PREFIXES) or lowered.startswith(CATEGORY_PREFIXES):
+        return ""
+    return strip_markup(label) if label else target.strip()
+
+
+def strip_markup(text):
+    """Converts a wikitext fragment to the plain text the rendered page shows."""
+    text = _COMMENT_RE.sub("", text)
+    text = _REF_RE.sub("", text)
+    text = _replace_spans(text, list(_template_spans(text)), _render_template)
+    text = _replace_spans(text, list(_link_spans(text)), _render_link)
+    text = _EXTLINK_RE.sub(r"\1", text)
+    text = _BR_RE.sub("\n", text)
+    text = _HR_RE.sub("\n", text)
+    text = _TAG_RE.sub("", text)
+    text = _QUOTES_RE.sub("", text)
+    return html.unescape(text).strip()
+
+
+def link_labels(text):
+    """Visible labels of the article links in a wikitext fragment (files and categories skipped)."""
+    text = _REF_RE.sub("", _COMMENT_RE.sub("", text))
+    labels = []
+    for start, end in _link_spans(text):
+        label = _render_link(text[start:end])
+        if label:
+            labels.append(label)
+    return labels
+
+
+def find_infobox(wikitext):
+    """Returns (template_name, params) of the first infobox template, or (None, {})."""
+    for start, end in _template_spans(wikitext):
+        name, params = parse_template(wikitext[start:end])
+        if name.lower().replace("_", " ").startswith(INFOBOX_PREFIXES):
+            return name, params
+    return None, {}
+
+
+def page_categories(wikitext):
+    cats = set()
+    for start, end in _link_spans(wikitext):
+        target = wikitext[start + 2:end - 2].partition("|")[0].strip()
+        if target.lower().startswith(CATEGORY_PREFIXES):
+            cats.add(target.split(":", 1)[1].replace("_", " ").strip())
+    return cats
+
+
+def paragraphs(wikitext):
+    """Splits an article into ('p' | 'h2' | 'h3', text) blocks with templates and files removed."""
+    blocks = []
+    buffer = []
+
+    def flush():
+        text = strip_markup("\n".join(buffer)).replace("\n", " ")
+        text = " ".join(text.split())
+        if text:
+            blocks.append(("p", text))
+        buffer.clear()
+
+    body = _replace_spans(wikitext, list(_template_spans(wikitext)), lambda raw: "")
+    for line in body.split("\n"):
+        heading = _HEADING_RE.match(line.strip())
+        if heading:
+            flush()
+            level = min(len(heading.group(1)), 3)
+            blocks.append((f"h{level}", strip_markup(heading.group(2))))
+        elif not line.strip() or line.lstrip().startswith(("*", "#", "{|", "|", "!")):
+            flush()
+        else:
+            buffer.append(line)
+    flush()
+    return blocks
+
+
+def references(wikitext, limit=5):
+    """Title/author pairs of the first `limit` references, like the crawlers' <cite> scan."""
+    refs = []
+    for body in _REF_BODY_RE.findall(wikitext):
+        title = ""
+        author = strip_markup(body)
+        for start, end in _template_spans(body):
+            _, params = parse_template(body[start:end])
+            title = strip_markup(params.get("title") or params.get("عنوان") or "")
+            if title:
+                # Citation templates render as their visible fields joined together
+                author = author or " ".join(
+                    strip_markup(v) for k, v in params.items()
+                    if v and not any(part in k.lower() for part in ("url", "نشانی", "access", "دسترسی"))
+                )
+                break
+        if title:
+            refs.append({"title": title, "author": author, "year": "Unknown"})
+        if len(refs) >= limit:
+            break
+    return refs
+
+
+def _param(params, *names):
+    for name in names:
+        value = params.get(name)
+        if value:
+            return value
+    return ""
+
+
+def _dash(text):
+    return text.replace('–', '-').replace('—', '-')
+
+
+# -------------------------
+# Record builders
+# -------------------------
+def treaty_record(title, wikitext, params):
+    """Builds a record in FinalCrawler.extract_structured_data's schema; returns (data, is_treaty)."""
+    data = {
+        "title": title,
+        "description": "<TBD>",
+        "period": {"start_year": "<TBD>", "end_year": "<TBD>"},
+        "location": {
+            "position": "<TBD>", "province": "<TBD>", "city": "<TBD>",
+            "coordinates": {"latitude": 0, "longitude": 0}
+        },
+        "causes": ["<TBD>"],
+        "belligerents": ["<TBD>"],
+        "result": "<TBD>",
+        "casualties": {},
+        "impact": ["<TBD>"],
+        "historical_significance": "<TBD>",
+        "references": ["<TBD>"],
+        "source": {"title": title, "author": "Wikipedia", "publication_date": "Unknown",
+                   "url": url_from_title(title)},
+        "text": "<TBD>",
+    }
+    blocks = paragraphs(wikitext)
+    lead = []
+    for kind, text in blocks:
+        if kind != "p":
+            break
+        lead.append(text)
+    full_text = "\n".join(text for kind, text in blocks if kind == "p")
+    data["text"] = full_text or "<TBD>"
+    data["description"] = " ".join(lead) or "<TBD>"
+
+    signed = strip_markup(_param(params, "date_signed", "تاریخ امضا", "date_created", "تاریخ ایجاد"))
+    if signed:
+        data["period"]["start_year"] = _dash(signed).replace("\n", "")
+    else:
+        date = _dash(strip_markup(_param(params, "date", "تاریخ"))).replace("\n", "")
+        years = [y.strip() for y in date.split('-') if y.strip()]
+        if len(years) == 2:
+            data["period"]["start_year"], data["period"]["end_year"] = years
+        elif len(years) == 1:
+            data["period"]["start_year"] = data["period"]["end_year"] = years[0]
+    effective = strip_markup(_param(params, "date_effective", "تاریخ اجرا"))
+    if effective:
+        data["period"]["end_year"] = _dash(effective).replace("\n", "")
+
+    signatories = _param(params, "signatories", "امضاکنندگان")
+    if signatories:
+        for name in link_labels(signatories):
+            data["belligerents"].append({"name": name.strip()})
+    else:
+        parties = strip_markup(_param(params, "parties", "طرف‌ها")).replace("\n", "")
+        for name in parties.replace('،', 'و').split('و'):
+            if name.strip():
+                data["belligerents"].append({"name": name.strip()})
+
+    result = strip_markup(_param(params, "result", "نتیجه")).replace("\n", "")
+    if result:
+        data["result"] = result
+
+    for line in strip_markup(_param(params, "results", "نتایج")).split("\n"):
+        if line.strip(" *#"):
+            data["impact"].append(line.strip(" *#"))
+
+    location = strip_markup(_param(params, "location_signed", "مکان امضا"))
+    if location:
+        data["location"]["position"] = location.replace("\n", ", ")
+    else:
+        place = strip_markup(_param(params, "place", "location", "موقعیت")).replace("\n", "")
+        if place:
+            data["location"]["position"] = place
+
+    data["references"].extend(references(wikitext))
+
+    is_treaty = any(keyword in title or keyword in full_text for keyword in TREATY_KEYWORDS)
+    return data, is_treaty
+
+
+def war_record(title, wikitext, params):
+    """Builds a record in WarCrawlerv3.extract_structured_data's schema (plus its 'text' field)."""
+    data = {
+        "title": title,
+        "description": "",
+        "period": {"start_year": "", "end_year": ""},
+        "position": "",
+        "causes": [],
+        "belligerents": {"names": "", "leaders": ""},
+        "result": "",
+        "casualties": {},
+        "impact": "",
+        "historical_significance": "",
+        "references": [],
+        "source": {"title": title, "author": "Wikipedia", "publication_date": "Unknown",
+                   "url": url_from_title(title)},
+    }
+    blocks = paragraphs(wikitext)
+    lead = []
+    for kind, text in blocks:
+        if kind != "p":
+            break
+        lead.append(text)
+    data["description"] = " ".join(lead)
+
+    date = _dash(strip_markup(_param(params, "date", "تاریخ"))).replace("\n", "")
+    years = [y.strip() for y in date.split('-') if y.strip()]
+    if len(years) == 2:
+        data["period"]["start_year"], data["period"]["end_year"] = years
+    elif len(years) == 1:
+        data["period"]["start_year"] = data["period"]["end_year"] = years[0]
+
+    data["position"] = strip_markup(_param(params, "place", "location", "موقعیت", "مکان")).replace("\n", "")
+
+    combatants = [strip_markup(_param(params, f"combatant{i}", f"طرف{i}")).replace("\n", "، ") for i in (1, 2)]
+    commanders = [strip_markup(_param(params, f"commander{i}", f"فرمانده{i}")).replace("\n", "، ") for i in (1, 2)]
+    data["belligerents"]["names"] = " - ".join(c for c in combatants if c)
+    data["belligerents"]["leaders"] = " - ".join(c for c in commanders if c)
+
+    data["result"] = strip_markup(_param(params, "result", "نتیجه")).replace("\n", "")
+
+    casualties = [strip_markup(_param(params, f"casualties{i}", f"تلفات{i}")).replace("\n", " ") for i in (1, 2)]
+    casualties = [c for c in casualties if c]
+    if len(casualties) == 2:
+        data["casualties"]["side_1"], data["casualties"]["side_2"] = casualties
+    elif casualties:
+        data["casualties"]["summary"] = " - ".join(casualties)
+
+    data["references"] = references(wikitext, limit=6)
+
+    for key, value in data.items():
+        if not value:
+            data[key] = [] if isinstance(value, list) else {} if isinstance(value, dict) else "نامشخص"
+
+    data["text"] = "\n".join(text for _, text in blocks if text)
+    return data
+
+
+def extract_page(title, wikitext):
+    """Returns a list of (kind, record) pairs for one article; most pages yield nothing."""
+    cats = page_categories(wikitext)
+    infobox_name, params = find_infobox(wikitext)
+    infobox_name = (infobox_name or "").lower().replace("_", " ")
+    out = []
+
+    if cats & TREATY_CATEGORIES:
+        data, is_treaty = treaty_record(title, wikitext, params)
+        if is_treaty:
+            out.append(("treaty", data))
+
+    if infobox_name.startswith(WAR_INFOBOXES) and any(WAR_CATEGORY_KEYWORD in c for c in cats):
+        out.append(("war", war_record(title, wikitext, params)))
+    return out
+
+
+# -------------------------
+# Dump readers
+# -------------------------
+def _page_fields(page):
+    ns = page.findtext("ns")
+    if ns != "0" or page.find("redirect") is not None:
+        return None
+    return page.findtext("title") or "", page.findtext("revision/text") or ""
+
+
+def _process_pages(pages):
+    records = []
+    for title, wikitext in pages:
+        try:
+            records.extend(extract_page(title, wikitext))
+        except Exception as e:
+            print(f"[WARN] Failed to parse {title!r}: {e}", file=sys.stderr)
+    return len(pages), records
+
+
+def _process_streams(dump_path, spans):
+    """Worker: decompresses a run of multistream bz2 blocks and extracts their pages."""
+    pages = []
+    with open(dump_path, "rb") as f:
+        for start, end in spans:
+            f.seek(start)
+            chunk = f.read(end - start) if end else f.read()
+            xml_bytes = bz2.decompress(chunk)
+            for raw in _PAGE_RE.findall(xml_bytes):
+                fields = _page_fields(ET.fromstring(raw))
+                if fields:
+                    pages.append(fields)
+    return _process_pages(pages)
+
+
+def read_stream_offsets(index_path):
+    """Unique block offsets from a multistream index (lines are 'offset:pageid:title')."""
+    offsets = set()
+    with bz2.open(index_path, "rt", encoding="utf-8") as f:
+        for line in f:
+            offset = line.split(":", 1)[0]
+            if offset.isdigit():
+                offsets.add(int(offset))
+    return sorted(offsets)
+
+
+def iter_raw_pages(dump_path):
+    """Streams (title, wikitext) of article pages from a plain .bz2 dump with constant memory."""
+    with bz2.open(dump_path, "rb") as f:
+        context = ET.iterparse(f, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event != "end" or not elem.tag.endswith("page"):
+                continue
+            # Dumps are namespaced; strip it so the same lookups work in both modes
+            for child in elem.iter():
+                child.tag = child.tag.rsplit("}", 1)[-1]
+            fields = _page_fields(elem)
+            root.clear()
+            if fields:
+                yield fields
+
+
+def _chunks(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _bounded_map(executor, fn, task_args, window):
+    """Like executor.map, but never has more than `window` tasks submitted at once."""
+    pending = deque()
+    for args in task_args:
+        pending.append(executor.submit(fn, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def iter_dump_records(dump_path, index_path=None, workers=WORKERS):
+    """Yields (kind, record) for every treaty/war article in the dump, in dump order."""
+    window = max(1, workers * WINDOW_PER_WORKER)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if index_path:
+            offsets = read_stream_offsets(index_path)
+            spans = list(zip(offsets, offsets[1:] + [None]))
+            tasks = ((dump_path, group) for group in _chunks(spans, STREAMS_PER_TASK))
+            results = _bounded_map(executor, _process_streams, tasks, window)
+        else:
+            tasks = ((batch,) for batch in _chunks(iter_raw_pages(dump_path), PAGES_PER_TASK))
+            results = _bounded_map(executor, _process_pages, tasks, window)
+
+        pages_seen = 0
+        for page_count, records in results:
+            pages_seen += page_count
+            yield from records
+            if pages_seen and pages_seen % 50000 < page_count:
+                print(f"[INFO] {pages_seen} articles scanned")
+
+
+def main():
+    outputs = {
+        "treaty": os.path.join(OUTPUT_DIR, "iran_treaties_from_dump.jsonl"),
+        "war": os.path.join(OUTPUT_DIR, "iran_wars_from_dump.jsonl"),
+    }
+    counts = {kind: 0 for kind in outputs}
+    files = {kind: open(path, "w", encoding="utf-8") for kind, path in outputs.items()}
+    try:
+        for kind, record in iter_dump_records(DUMP_FILE, INDEX_FILE, WORKERS):
+            files[kind].write(json.dumps(record, ensure_ascii=False) + "\n")
+            counts[kind] += 1
+    finally:
+        for f in files.values():
+            f.close()
+    for kind, path in outputs.items():
+        print(f"Wrote {counts[kind]} {kind} records to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the shared helpers the same way the scripts do: from the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
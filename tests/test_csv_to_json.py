@@ -0,0 +1,58 @@
+import csv
+import json
+
+import pytest
+
+from common.csv_to_json import convert_csv, infer_column_types
+
+
+def write_csv(path, header, rows):
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+def test_types_are_inferred_per_column(tmp_path):
+    path = write_csv(tmp_path / "in.csv", ["id", "score", "year", "count", "note"], [
+        ["1", "4.5", "۱۴۰۲", "1_000", " 12 "],
+        ["2", "3", "1401", "7", "x"],
+        ["3", "", "1400", "8", "5"],
+    ])
+    assert infer_column_types(path) == {"id": int, "score": float, "year": str, "count": str, "note": str}
+
+    out = str(tmp_path / "out.json")
+    assert convert_csv(path, out, typed=True) == 3
+    with open(out, encoding="utf-8") as f:
+        records = json.load(f)
+    assert records[0] == {"id": 1, "score": 4.5, "year": "۱۴۰۲", "count": "1_000", "note": " 12 "}
+    assert records[1]["score"] == 3.0 and isinstance(records[1]["score"], float)
+    assert records[1]["year"] == "1401"  # a column with Persian digits stays text throughout
+    assert records[2]["score"] is None
+
+
+def test_untyped_keeps_strings_and_filters_rows(tmp_path):
+    path = write_csv(tmp_path / "in.csv", ["id", "text"], [["1", "a"], ["2", "N/A"], ["3", "c"]])
+    out = str(tmp_path / "out.jsonl")
+    count = convert_csv(path, out, columns=["id", "text"], rename={"text": "summary"},
+                        where=lambda row: row["text"] != "N/A")
+    assert count == 2
+    with open(out, encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == [{"id": "1", "summary": "a"}, {"id": "3", "summary": "c"}]
+
+
+def test_json_array_matches_json_dump(tmp_path):
+    path = write_csv(tmp_path / "in.csv", ["id", "title"], [["1", "کتاب"], ["2", 'say "hi"']])
+    out = str(tmp_path / "out.json")
+    convert_csv(path, out, indent=4)
+    with open(out, encoding="utf-8") as f:
+        assert f.read() == json.dumps([{"id": "1", "title": "کتاب"}, {"id": "2", "title": 'say "hi"'}],
+                                      ensure_ascii=False, indent=4)
+
+
+def test_typed_rejects_transform(tmp_path):
+    path = write_csv(tmp_path / "in.csv", ["id"], [["1"]])
+    with pytest.raises(ValueError):
+        convert_csv(path, str(tmp_path / "out.json"), transform=dict, typed=True)
+    assert not (tmp_path / "out.json.tmp").exists()
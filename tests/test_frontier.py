@@ -0,0 +1,43 @@
+import sqlite3
+
+import pytest
+
+from common.frontier import Frontier
+
+
+def done_urls(path):
+    with sqlite3.connect(path) as db:
+        return {url for url, in db.execute("SELECT url FROM frontier WHERE done = 1")}
+
+
+def test_links_are_persisted_before_pages_are_marked_done(tmp_path):
+    path = str(tmp_path / "frontier.sqlite")
+    frontier = Frontier(path, batch_size=100)
+    frontier.push("https://fa.wikipedia.org/wiki/A", 0)
+    frontier.commit()
+    seen = []
+    frontier.before_commit = lambda: seen.append(("before", done_urls(path)))
+    frontier.on_commit = lambda: seen.append(("after", done_urls(path)))
+
+    frontier.mark_done("https://fa.wikipedia.org/wiki/A")
+    frontier.commit()
+    assert seen == [("before", set()), ("after", {"https://fa.wikipedia.org/wiki/A"})]
+    frontier.close()
+
+
+def test_failed_link_write_leaves_pages_pending(tmp_path):
+    path = str(tmp_path / "frontier.sqlite")
+    frontier = Frontier(path, batch_size=100)
+    frontier.push("https://fa.wikipedia.org/wiki/A", 0)
+    frontier.commit()
+    assert frontier.pop_batch(1) == [("https://fa.wikipedia.org/wiki/A", 0)]
+    frontier.mark_done("https://fa.wikipedia.org/wiki/A")
+
+    def crash():
+        raise OSError("disk full")
+
+    frontier.before_commit = crash
+    with pytest.raises(OSError):
+        frontier.commit()
+    assert done_urls(path) == set()
+    assert Frontier(path).pop_batch(1) == [("https://fa.wikipedia.org/wiki/A", 0)]
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "HW1", "Code"))
+import benchmark_html_backends as bench
+from common.html_backend import available_backends, parse_html
+
+PAGES = sorted(os.listdir(bench.FIXTURE_DIR))
+EXTRACTORS = dict(bench.EXTRACTORS, article=bench.WarCrawlerv3.extract_article)
+
+
+def extract(name, page, backend):
+    with open(os.path.join(bench.FIXTURE_DIR, page), encoding="utf-8") as f:
+        return EXTRACTORS[name](parse_html(f.read(), backend))
+
+
+def test_fixture_pages_are_present():
+    assert len(PAGES) >= 3
+
+
+@pytest.mark.parametrize("backend", ["selectolax", "lxml"])
+@pytest.mark.parametrize("name", sorted(EXTRACTORS))
+@pytest.mark.parametrize("page", PAGES)
+def test_backend_matches_bs4(backend, name, page, capsys):
+    if backend not in available_backends():
+        pytest.skip(f"{backend} is not installed")
+    assert extract(name, page, backend) == extract(name, page, "bs4")
+
+
+def test_fixture_exercises_the_infobox(capsys):
+    treaty, is_treaty = extract("treaty", "turkmenchay.html", "bs4")
+    assert is_treaty
+    assert treaty["period"]["start_year"] == "۲۱ فوریهٔ ۱۸۲۸"
+    assert {"name": "عباس میرزا"} in treaty["belligerents"]
+    assert treaty["historical_significance"] != "<TBD>"
+
+    war = extract("war", "chaldiran.html", "bs4")
+    assert war["belligerents"]["names"] and war["casualties"]
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_decompose_keeps_tail_separate(backend):
+    page = parse_html("<p>پایان داد.<sup class='reference'>[1]</sup> نماینده</p>", backend)
+    for ref in page.css("sup.reference"):
+        ref.decompose()
+    assert page.css_first("p").text(strip=True) == "پایان داد.نماینده"
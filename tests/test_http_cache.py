@@ -0,0 +1,41 @@
+import multiprocessing
+
+from common.http_cache import HttpCache
+
+
+def store_pages(directory, urls):
+    cache = HttpCache(directory)
+    for url in urls:
+        cache.put(url, url.encode("utf-8") * 50)
+    cache.close()
+
+
+def test_size_is_shared_between_processes(tmp_path):
+    directory = str(tmp_path / "cache")
+    cache = HttpCache(directory)
+    cache.put("https://fa.wikipedia.org/wiki/A", b"a" * 1000)
+    before = cache.total_bytes
+
+    worker = multiprocessing.Process(target=store_pages,
+                                     args=(directory, [f"https://fa.wikipedia.org/wiki/P{i}" for i in range(5)]))
+    worker.start()
+    worker.join()
+    assert worker.exitcode == 0
+
+    # This process sees the worker's bodies without reopening the cache
+    blobs = cache._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+    assert cache.total_bytes == blobs > before
+    cache.close()
+
+
+def test_eviction_counts_bodies_from_other_processes(tmp_path):
+    directory = str(tmp_path / "cache")
+    store_pages(directory, [f"https://fa.wikipedia.org/wiki/P{i}" for i in range(20)])
+    full = HttpCache(directory).total_bytes
+
+    cache = HttpCache(directory, max_bytes=full // 2)
+    cache.put("https://fa.wikipedia.org/wiki/New", b"new page")
+    assert cache.total_bytes <= full // 2
+    assert cache.get("https://fa.wikipedia.org/wiki/New") is not None
+    assert cache.total_bytes == cache._db.execute("SELECT SUM(size) FROM blobs").fetchone()[0]
+    cache.close()
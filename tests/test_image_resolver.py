@@ -0,0 +1,68 @@
+import os
+import sys
+
+import pytest
+
+for module in ("selenium", "tqdm", "webdriver_manager"):
+    pytest.importorskip(module)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "HW3"))
+import image_resolver
+from image_resolver import CompletedIndex, fetch_product_images
+
+
+class FakeStore:
+    def add(self, path):
+        return "digest", 0
+
+
+def fake_downloads(failing):
+    def download_files(jobs, **kwargs):
+        for product_id, url, path in jobs:
+            if url in failing:
+                yield product_id, url, path, OSError("connection reset")
+            else:
+                with open(path, "wb") as f:
+                    f.write(b"image")
+                yield product_id, url, path, None
+    return download_files
+
+
+def test_product_completes_only_when_every_image_is_saved(tmp_path, monkeypatch):
+    resolved = {"1": ["http://x/1a.jpg", "http://x/1b.jpg"], "2": ["http://x/2a.jpg", "http://x/2b.jpg"]}
+    monkeypatch.setattr(image_resolver, "resolve_images",
+                        lambda ids, pool, selectors, limit: ((pid, resolved[pid], "api") for pid in ids))
+    monkeypatch.setattr(image_resolver, "download_files", fake_downloads({"http://x/2b.jpg"}))
+
+    completed = CompletedIndex(str(tmp_path / "done.txt"))
+    counts = fetch_product_images(["1", "2"], str(tmp_path), [], 2,
+                                  lambda pid, index, ext: f"{pid}_{index}{ext}", FakeStore(), completed=completed)
+    completed.close()
+    assert counts["images"] == 3 and counts["failed downloads"] == 1
+    assert "1" in completed and "2" not in completed
+    assert CompletedIndex(str(tmp_path / "done.txt")).ids == {"1"}
+
+
+def test_products_are_resolved_in_input_order(monkeypatch):
+    import random
+    import time
+
+    from image_resolver import BrowserPool, resolve_images
+
+    def from_api(product_id, limit):
+        time.sleep(random.uniform(0, 0.02))
+        return [] if product_id % 3 == 0 else [f"http://api/{product_id}.jpg"]
+
+    def from_browser(product_id, browsers, selectors, limit):
+        time.sleep(random.uniform(0, 0.02))
+        return [] if product_id % 9 == 0 else [f"http://page/{product_id}.jpg"]
+
+    monkeypatch.setattr(image_resolver, "resolve_from_api", from_api)
+    monkeypatch.setattr(image_resolver, "resolve_from_browser", from_browser)
+    ids = list(range(1, 61))
+    results = list(resolve_images(ids, BrowserPool(2), [], 1, api_workers=8))
+    assert [product_id for product_id, _, _ in results] == ids
+    for product_id, urls, source in results:
+        expected = "api" if product_id % 3 else ("browser" if product_id % 9 else None)
+        assert source == expected
+        assert bool(urls) == (source is not None)
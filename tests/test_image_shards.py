@@ -0,0 +1,92 @@
+import os
+import tarfile
+
+import pytest
+
+pytest.importorskip("PIL")
+from PIL import Image
+
+from common.image_shards import INDEX_FILE, ShardReader, ShardWriter, shard_name
+
+
+@pytest.fixture
+def images(tmp_path):
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"{i}.png"
+        Image.new("RGB", (60, 40), (i * 60, 20, 200 - i * 40)).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def members(directory):
+    with tarfile.open(os.path.join(directory, shard_name(0))) as tar:
+        return tar.getnames()
+
+
+def assert_readable(directory, keys):
+    reader = ShardReader(directory)
+    assert sorted(reader.keys()) == sorted(keys)
+    for key in keys:
+        assert reader.read(key)[:2] == b"\xff\xd8"  # JPEG
+    reader.close()
+    assert members(directory) == [f"{key}.jpg" for key in keys]
+
+
+def test_reopen_after_clean_close_appends(tmp_path, images):
+    directory = str(tmp_path / "shards")
+    writer = ShardWriter(directory)
+    writer.add("a", images[0])
+    writer.add("b", images[1])
+    writer.close()
+
+    writer = ShardWriter(directory)
+    assert "a" in writer and writer.add("a", images[0]) is False
+    assert writer.add("c", images[2])
+    writer.close()
+    assert_readable(directory, ["a", "b", "c"])
+
+
+def test_reopen_after_torn_write_appends(tmp_path, images):
+    directory = str(tmp_path / "shards")
+    writer = ShardWriter(directory)
+    writer.add("a", images[0])
+    writer.add("b", images[1])
+    # Crash mid-add: half a member in the shard and half an index line, nothing closed
+    writer._tar.fileobj.write(b"x" * 700)
+    writer._tar.fileobj.flush()
+    writer._index.write(b"c\tshard-000000.tar\t15")
+    writer._index.flush()
+
+    writer = ShardWriter(directory)
+    assert sorted(writer.entries) == ["a", "b"]
+    writer.add("c", images[2])
+    writer.add("d", images[3])
+    writer.close()
+    assert_readable(directory, ["a", "b", "c", "d"])
+    with open(os.path.join(directory, INDEX_FILE), "rb") as f:
+        assert f.read().count(b"\n") == 4
+
+
+def test_reopen_after_crash_between_adds_appends(tmp_path, images):
+    directory = str(tmp_path / "shards")
+    writer = ShardWriter(directory)
+    writer.add("a", images[0])  # flushed and indexed, but the end-of-archive blocks are never written
+
+    writer = ShardWriter(directory)
+    writer.add("b", images[1])
+    writer.close()
+    assert_readable(directory, ["a", "b"])
+
+
+def test_rolls_over_to_a_new_shard(tmp_path, images):
+    directory = str(tmp_path / "shards")
+    writer = ShardWriter(directory, shard_bytes=1)
+    writer.add("a", images[0])
+    writer.close()
+    writer = ShardWriter(directory, shard_bytes=1)
+    writer.add("b", images[1])
+    writer.close()
+    assert ShardReader(directory).entries["b"][0] == shard_name(1)
+    assert members(directory) == ["a.jpg"]
+    assert sorted(ShardReader(directory).keys()) == ["a", "b"]
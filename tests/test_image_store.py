@@ -0,0 +1,65 @@
+import errno
+import os
+
+import pytest
+
+from common.image_store import ImageStore
+
+
+def write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_duplicates_become_hard_links(tmp_path):
+    store = ImageStore(str(tmp_path / "store"))
+    first = write(tmp_path / "1.jpg", b"same image")
+    second = write(tmp_path / "2.jpg", b"same image")
+    digest, saved = store.add(first)
+    assert saved == 0
+    assert store.add(second) == (digest, len(b"same image"))
+    assert os.path.samefile(first, second)
+    assert store.hardlinks
+
+
+def test_stale_link_file_does_not_disable_hard_links(tmp_path):
+    store = ImageStore(str(tmp_path / "store"))
+    digest, _ = store.add(write(tmp_path / "1.jpg", b"image"))
+    target = write(tmp_path / "2.jpg", b"image")
+    write(tmp_path / "2.jpg.link", b"left by a crash")
+
+    assert store.link(digest, target)
+    assert store.hardlinks
+    assert os.path.samefile(target, store.object_path(digest))
+    assert not os.path.exists(target + ".link")
+
+    later = write(tmp_path / "3.jpg", b"image")
+    store.add(later)
+    assert os.path.samefile(later, store.object_path(digest))
+
+
+def test_unsupported_links_fall_back_to_copies(tmp_path, monkeypatch):
+    store = ImageStore(str(tmp_path / "store"))
+
+    def no_links(src, dst):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(os, "link", no_links)
+    path = write(tmp_path / "1.jpg", b"image")
+    digest, _ = store.add(path)
+    assert not store.hardlinks
+    with open(store.object_path(digest), "rb") as f:
+        assert f.read() == b"image"
+
+
+def test_other_link_errors_are_raised(tmp_path, monkeypatch):
+    store = ImageStore(str(tmp_path / "store"))
+
+    def disk_full(src, dst):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(os, "link", disk_full)
+    with pytest.raises(OSError):
+        store.add(write(tmp_path / "1.jpg", b"image"))
+    assert store.hardlinks
@@ -0,0 +1,79 @@
+import os
+
+import pytest
+import requests
+
+from common.mediawiki_api import MAX_TITLES, MediaWikiClient, url_from_title
+from common.replay_server import ReplayServer
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "mediawiki_api.jsonl")
+CATEGORY = "معاهده‌های ایران"
+MEMBERS = [f"معاهده {n}" for n in range(1, 13)]
+ARTICLES = [f"جنگ {n}" for n in range(1, 61)]
+
+
+@pytest.fixture
+def server():
+    server = ReplayServer(FIXTURE).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def client(server):
+    return MediaWikiClient(api_url=server.api_url)
+
+
+def test_category_members_follow_continuation(client, server):
+    assert list(client.category_members(CATEGORY)) == MEMBERS
+    assert client.requests_made == server.requests_served == 3  # 5 + 5 + 2 members
+
+
+def test_category_prefix_is_optional(client):
+    assert list(client.category_members("رده:" + CATEGORY)) == MEMBERS
+
+
+def test_pages_are_batched_by_max_titles(client):
+    pages = client.pages(ARTICLES, props=("links",))
+    assert sorted(pages) == sorted(ARTICLES)
+    # 60 titles -> 2 batches of at most MAX_TITLES, each continued once for the remaining links
+    assert MAX_TITLES == 50
+    assert client.requests_made == 4
+    for title in ARTICLES:
+        assert pages[title]["links"] == [f"مقاله {title} {k}" for k in range(3)]
+
+
+def test_pages_follow_normalization_and_redirects(client):
+    pages = client.pages(["جنگ_چالدران", "نبرد چالدران", "صفحه ناموجود", "جنگ 1"])
+    assert set(pages) == {"جنگ_چالدران", "نبرد چالدران", "جنگ 1"}  # the missing page is left out
+    assert pages["جنگ_چالدران"] is pages["نبرد چالدران"]
+    page = pages["جنگ_چالدران"]
+    assert page["title"] == "جنگ چالدران"
+    assert page["revid"] and page["pageid"]
+    assert page["extract"].startswith("جنگ چالدران")
+    assert len(page["links"]) == 3
+    assert client.requests_made == 2  # one batch, continued once for the links
+
+
+def test_links_for_urls_expands_categories(client):
+    category_url = url_from_title("رده:" + CATEGORY)
+    article_url = "https://fa.wikipedia.org/wiki/جنگ_چالدران"
+    found = client.links_for_urls([category_url, article_url, "https://fa.wikipedia.org/wiki/جنگ_2"])
+    assert found[category_url] == {url_from_title(title) for title in MEMBERS}
+    assert found[article_url] == {url_from_title(f"مقاله جنگ چالدران {k}") for k in range(3)}
+    assert len(found["https://fa.wikipedia.org/wiki/جنگ_2"]) == 3
+
+
+def test_unrecorded_requests_are_not_served(client, server):
+    with pytest.raises(requests.HTTPError):
+        client.pages(["عنوانی که ضبط نشده"])
+    assert server.requests_served == 0
+
+
+def test_default_session_is_throttled():
+    from common.async_fetch import HEADERS
+    from common.rate_limiter import ThrottledAdapter
+
+    client = MediaWikiClient()
+    assert isinstance(client.session.get_adapter("https://fa.wikipedia.org/w/api.php"), ThrottledAdapter)
+    assert client.session.headers["User-Agent"] == HEADERS["User-Agent"]
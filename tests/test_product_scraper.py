@@ -0,0 +1,37 @@
+import csv
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "DigikalaProject"))
+from product_scraper import FIELDNAMES, build_row, listing_changed, load_stored_rows
+
+
+def stored_row(tmp_path, row):
+    path = str(tmp_path / "products.csv")
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerow(row)
+    return load_stored_rows(path)[str(row["id"])]
+
+
+def test_equal_listing_formatted_differently_is_unchanged(tmp_path):
+    # The detail API gave a float rate and an int count; the listing gives 4 and "12"
+    row, _ = build_row({"id": 7}, {"title_fa": "گوشی موبایل", "rating": {"rate": 4.0, "count": 12}})
+    row = stored_row(tmp_path, row)
+    listing = {"id": 7, "title_fa": " گوشی موبایل ", "rating": {"rate": 4, "count": "12"}}
+    assert not listing_changed(listing, row)
+
+
+def test_changed_listing_is_detected(tmp_path):
+    row = stored_row(tmp_path, {"id": 7, "title_fa": "گوشی", "Rate": "4.0", "Rate_cnt": "12"})
+    assert listing_changed({"rating": {"rate": 4.5}}, row)
+    assert listing_changed({"rating": {"count": 13}}, row)
+    assert listing_changed({"title_fa": "گوشی موبایل"}, row)
+    assert not listing_changed({}, row)
+
+
+def test_unparsable_values_compare_as_text(tmp_path):
+    row = stored_row(tmp_path, {"id": 7, "title_fa": "گوشی", "Rate": "N/A", "Rate_cnt": "0"})
+    assert not listing_changed({"rating": {"rate": "N/A", "count": 0}}, row)
+    assert listing_changed({"rating": {"rate": 3}}, row)
@@ -0,0 +1,32 @@
+from common import rate_limiter
+from common.async_fetch import fetch_pages
+from common.rate_limiter import MAX_RATE, get_limiter
+
+
+def test_max_rate_is_a_hard_ceiling(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_limiters", {})
+    limiter = get_limiter("fa.wikipedia.org", rate=10, max_rate=10)
+    for _ in range(500):
+        limiter.on_success()
+    assert limiter.rate == 10
+
+
+def test_ceiling_applies_to_a_limiter_created_earlier(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_limiters", {})
+    limiter = get_limiter("fa.wikipedia.org")  # e.g. created by ThrottledAdapter on the first request
+    assert limiter.max_rate == MAX_RATE
+    for _ in range(100):
+        limiter.on_success()
+    assert get_limiter("fa.wikipedia.org", rate=10, max_rate=10) is limiter
+    assert limiter.max_rate == 10 and limiter.rate <= 10
+    # A later, looser ceiling does not lift it again
+    get_limiter("fa.wikipedia.org", max_rate=MAX_RATE)
+    assert limiter.max_rate == 10
+
+
+def test_fetch_pages_caps_each_host(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_limiters", {})
+    get_limiter("127.0.0.1:9")
+    results = list(fetch_pages(["http://127.0.0.1:9/wiki/A"], requests_per_second=3, timeout=1))
+    assert results[0][2] is not None  # nothing listens on port 9
+    assert get_limiter("127.0.0.1:9").max_rate == 3